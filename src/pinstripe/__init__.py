@@ -1,9 +1,8 @@
+import importlib
+
 from .cli import cli
-from .context import Context
-from .hosts import add_hostgroup, add_default_hostgroup
-from .graph import Node
+from .hosts import add_hostgroup, add_default_hostgroup, add_inventory
 from .playbook import playbook
-from .result import Result
 
 __version__ = "0.0.1"
 
@@ -13,6 +12,27 @@ __all__ = [
     "Result",
     "add_hostgroup",
     "add_default_hostgroup",
+    "add_inventory",
     "cli",
     "playbook",
 ]
+
+_LAZY = {
+    "Context": ".context",
+    "Node": ".graph",
+    "Result": ".result",
+}
+"""
+Modules of the names which pull in the graph and ops, imported on first
+access so that importing pinstripe, e.g. to list playbooks, stays cheap.
+"""
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
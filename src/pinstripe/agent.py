@@ -0,0 +1,119 @@
+"""
+Resident helper which serves stat, entity convergence, command and fact
+requests on a host for AgentTransport. Requests and responses are JSON
+objects framed by a 4 byte big-endian length, read from stdin and written
+to stdout. Requests are served concurrently, so responses carry the id of
+their request and may arrive in any order.
+
+Like native, this module only depends on the standard library: it is sent
+to the host as source along with native, or can be run locally with
+`python -m pinstripe.agent`.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import json
+import os
+import signal
+import struct
+import subprocess
+import sys
+import threading
+
+try:
+    from . import native
+except ImportError:
+    # Sent to the host, where the bootstrap registers native as a module
+    import native
+
+HEADER = struct.Struct(">I")
+
+DEFAULT_WORKERS = 16
+
+
+def read_frame(stream):
+    """
+    Read one message from a binary stream, or return None at end of file.
+    """
+    header = stream.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    (size,) = HEADER.unpack(header)
+    payload = stream.read(size)
+    if len(payload) < size:
+        return None
+    return json.loads(payload)
+
+
+def write_frame(stream, message: dict):
+    payload = json.dumps(message).encode("utf-8")
+    stream.write(HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def run(argv: list, timeout=None) -> dict:
+    """
+    Run a command, killing it along with its children once it has run for
+    `timeout` seconds, in which case the response is marked as timed out.
+    """
+    timed_out = False
+    # In a session of its own, so that a timeout also reaches its children
+    with subprocess.Popen(
+        argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True,
+    ) as proc:
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            with contextlib.suppress(ProcessLookupError, PermissionError):
+                os.killpg(proc.pid, signal.SIGKILL)
+            stdout, stderr = proc.communicate()
+    return {
+        "rc": proc.returncode,
+        "stdout": stdout.decode("utf-8", errors="replace"),
+        "stderr": stderr.decode("utf-8", errors="replace"),
+        "timed_out": timed_out,
+    }
+
+
+OPERATIONS = {
+    "ping": lambda args: True,
+    "stat": lambda args: native.stat_paths(args["paths"]),
+    "ensure": lambda args: native.ensure(args),
+    "run": lambda args: run(args["argv"], args.get("timeout")),
+    "facts": lambda args: native.facts(),
+}
+
+
+def serve(reader, writer, workers: int = DEFAULT_WORKERS):
+    """
+    Serve requests from the reader until it is closed, then wait for the
+    requests in flight to be answered.
+    """
+    lock = threading.Lock()
+
+    def handle(request: dict):
+        try:
+            response = {"id": request["id"], "value": OPERATIONS[request["op"]](request.get("args"))}
+        except Exception as e:
+            response = {"id": request["id"], "error": f"{type(e).__name__}: {e}"}
+        with lock:
+            write_frame(writer, response)
+
+    with ThreadPoolExecutor(workers) as pool:
+        while True:
+            request = read_frame(reader)
+            if request is None:
+                return
+            pool.submit(handle, request)
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_WORKERS
+    # Keep stray output, e.g. from a site customization, out of the frames
+    writer = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    serve(sys.stdin.buffer, writer, workers)
+
+
+if __name__ == "__main__":
+    main()
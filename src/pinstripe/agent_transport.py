@@ -0,0 +1,318 @@
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+import asyncio
+import contextlib
+import io
+import itertools
+import subprocess
+import threading
+
+from . import agent, native
+from .result import Result
+from .transport import Transport, ensure_result, stat_infos
+from .types import CommandT
+
+if TYPE_CHECKING:
+    from .ops.stat import StatInfo
+
+BOOTSTRAP = """
+import sys, types
+def load(name):
+    module = types.ModuleType(name)
+    source = sys.stdin.buffer.read(int(sys.stdin.buffer.readline()))
+    exec(compile(source, name, "exec"), module.__dict__)
+    sys.modules[name] = module
+    return module
+load("native")
+load("pinstripe_agent").main()
+""".strip()
+"""
+Program run with `python -c` on the host, which reads the source of the
+native and agent modules from stdin, each preceded by its length, and
+starts the agent on the rest of stdin.
+"""
+
+
+class AgentError(OSError):
+    """
+    An error reported by the agent, or the loss of the agent.
+    """
+
+
+class _AgentProcess:
+    """
+    Stand-in for subprocess.Popen holding the response to a run request.
+    """
+
+    def __init__(self, args: list[str], rc: int, stdout: str, stderr: str, timed_out: bool = False) -> None:
+        self.args = args
+        self.returncode = rc
+        self.timed_out = timed_out
+        self.stdout = io.StringIO(stdout)
+        self.stderr = io.StringIO(stderr)
+
+    def poll(self) -> int:
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        return self.returncode
+
+
+class _AgentAsyncProcess:
+    """
+    Stand-in for asyncio.subprocess.Process holding the response to a run
+    request.
+    """
+
+    def __init__(self, rc: int, stdout: str, stderr: str, timed_out: bool = False) -> None:
+        self.returncode = rc
+        self.timed_out = timed_out
+        self.stdout = asyncio.StreamReader()
+        self.stdout.feed_data(stdout.encode("utf-8"))
+        self.stdout.feed_eof()
+        self.stderr = asyncio.StreamReader()
+        self.stderr.feed_data(stderr.encode("utf-8"))
+        self.stderr.feed_eof()
+
+    async def wait(self) -> int:
+        return self.returncode
+
+
+class AgentTransport(Transport):
+    """
+    Sends stats, entity convergence, commands and fact gathering to a
+    Python agent started on the host through another Transport, with any
+    number of requests in flight on the agent's stdin and stdout. Everything
+    goes through the other Transport instead if the agent cannot start,
+    e.g. because the host has no Python interpreter.
+    """
+
+    DEFAULT_CONNECT_TIMEOUT = 30
+
+    def __init__(
+        self,
+        inner: Transport,
+        python: str = "python3",
+        workers: int = agent.DEFAULT_WORKERS,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    ) -> None:
+        super().__init__(inner.host)
+        self.inner = inner
+        """
+        Transport used to start the agent, which remains owned by the caller.
+        """
+
+        self.python = python
+        """
+        Python interpreter on the host.
+        """
+
+        self.workers = workers
+        """
+        Number of requests the agent serves at once.
+        """
+
+        self.connect_timeout = connect_timeout
+        """
+        Seconds to wait for the agent to answer once started, after which
+        requests fall back to the other Transport.
+        """
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._started = False
+        self._process: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+        self._pending: dict[int, Future] = {}
+        self._lost = False
+        self._ids = itertools.count(1)
+
+    @property
+    def available(self) -> bool:
+        """
+        True if the agent is running and answering requests.
+        """
+        self.connect()
+        return self._process is not None
+
+    def connect(self):
+        """
+        Start the agent on the host. If it does not answer, requests fall
+        back to the other Transport.
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self.inner.connect()
+            argv = self.inner.argv([self.python, "-c", BOOTSTRAP, str(self.workers)])
+            try:
+                self._process = subprocess.Popen(
+                    argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+                )
+                for module in (native, agent):
+                    source = Path(module.__file__).read_bytes()
+                    self._process.stdin.write(b"%d\n" % len(source) + source)
+                self._process.stdin.flush()
+            except OSError:
+                self._stop()
+                return
+            self._reader = threading.Thread(target=self._read, daemon=True)
+            self._reader.start()
+            try:
+                self.call("ping", timeout=self.connect_timeout)
+            except AgentError:
+                self._kill()
+
+    def request(self, op: str, args=None) -> Future:
+        """
+        Send a request to the agent without waiting for its response.
+        """
+        future: Future = Future()
+        process = self._process
+        if process is None:
+            future.set_exception(AgentError("Agent is not running"))
+            return future
+        with self._write_lock:
+            request_id = next(self._ids)
+            with self._pending_lock:
+                if self._lost:
+                    future.set_exception(AgentError("Agent exited"))
+                    return future
+                self._pending[request_id] = future
+            try:
+                agent.write_frame(process.stdin, {"id": request_id, "op": op, "args": args})
+            except (OSError, ValueError) as e:
+                with self._pending_lock:
+                    self._pending.pop(request_id, None)
+                future.set_exception(AgentError(f"Agent connection lost: {e}"))
+        return future
+
+    def call(self, op: str, args=None, timeout: Optional[float] = None):
+        """
+        Send a request to the agent and return the value of its response,
+        raising AgentError if it failed or got no response within `timeout`
+        seconds.
+        """
+        try:
+            return self.request(op, args).result(timeout)
+        except FutureTimeoutError:
+            raise AgentError(f"Agent did not answer {op} within {timeout} seconds") from None
+
+    def _read(self):
+        process = self._process
+        while True:
+            try:
+                response = agent.read_frame(process.stdout)
+            except (OSError, ValueError):
+                response = None
+            if response is None:
+                break
+            with self._pending_lock:
+                future = self._pending.pop(response["id"], None)
+            if future is None:
+                continue
+            if "error" in response:
+                future.set_exception(AgentError(response["error"]))
+            else:
+                future.set_result(response["value"])
+        with self._pending_lock:
+            self._lost = True
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(AgentError("Agent exited"))
+
+    def _stop(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        with contextlib.suppress(OSError):
+            process.stdin.close()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        if self._reader and self._reader is not threading.current_thread():
+            self._reader.join()
+
+    def _kill(self):
+        # Whatever the agent is stuck on, it is not waited for
+        if self._process is not None:
+            with contextlib.suppress(OSError):
+                self._process.kill()
+        self._stop()
+
+    def argv(self, cmd: CommandT) -> list[str]:
+        return self.inner.argv(cmd)
+
+    def _run_args(self, cmd: CommandT, timeout: Optional[float]) -> dict:
+        # The command runs on the host, so only wrap it in a shell if needed
+        return {"argv": Transport.argv(self, cmd), "timeout": timeout}
+
+    def popen(self, cmd: CommandT, stdin: bool = False, timeout: Optional[float] = None):
+        # Requests carry no input, so commands reading stdin bypass the agent
+        if stdin or not self.available:
+            return self.inner.popen(cmd, stdin=stdin, timeout=timeout)
+        args = self._run_args(cmd, timeout)
+        try:
+            response = self.call("run", args)
+        except AgentError as e:
+            return _AgentProcess(args["argv"], 255, "", f"{e}\n")
+        return _AgentProcess(
+            args["argv"], response["rc"], response["stdout"], response["stderr"], response["timed_out"],
+        )
+
+    async def popen_async(self, cmd: CommandT, timeout: Optional[float] = None):
+        if not self.available:
+            return await self.inner.popen_async(cmd, timeout=timeout)
+        try:
+            response = await asyncio.wrap_future(self.request("run", self._run_args(cmd, timeout)))
+        except AgentError as e:
+            return _AgentAsyncProcess(255, "", f"{e}\n")
+        return _AgentAsyncProcess(response["rc"], response["stdout"], response["stderr"], response["timed_out"])
+
+    def kill(self, proc):
+        if isinstance(proc, (_AgentProcess, _AgentAsyncProcess)):
+            # The agent has already answered, having killed the command
+            # itself if it ran past the timeout it was sent with
+            return
+        self.inner.kill(proc)
+
+    @contextlib.asynccontextmanager
+    async def async_channel(self) -> AsyncIterator[None]:
+        if self._process is not None:
+            yield
+            return
+        async with self.inner.async_channel():
+            yield
+
+    def stat(self, paths: list[str]) -> Optional[dict[str, "StatInfo"]]:
+        if not self.available:
+            return self.inner.stat(paths)
+        try:
+            return stat_infos(self.call("stat", {"paths": paths}))
+        except AgentError:
+            return self.inner.stat(paths)
+
+    def ensure(self, spec: dict) -> Optional[Result]:
+        if not self.available:
+            return self.inner.ensure(spec)
+        return ensure_result(lambda spec: self.call("ensure", spec), spec)
+
+    def facts(self, names: list[str]) -> Optional[dict[str, str]]:
+        if not self.available:
+            return self.inner.facts(names)
+        try:
+            return self.call("facts")
+        except AgentError:
+            return self.inner.facts(names)
+
+    def close(self):
+        """
+        Stop the agent once it has answered the requests in flight.
+        """
+        with self._lock:
+            self._stop()
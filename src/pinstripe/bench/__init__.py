@@ -0,0 +1,14 @@
+"""
+Benchmarks of the scheduler and ops against synthetic playbooks, run with
+`python -m pinstripe.bench`.
+"""
+from .fake import FakeTransport
+from .graphs import GRAPHS
+from .runner import BenchmarkResult, run_benchmark
+
+__all__ = [
+    "BenchmarkResult",
+    "FakeTransport",
+    "GRAPHS",
+    "run_benchmark",
+]
@@ -0,0 +1,43 @@
+import argparse
+
+from ..scheduler import PoolScheduler
+from . import GRAPHS, BenchmarkResult, run_benchmark
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m pinstripe.bench")
+    parser.add_argument(
+        "graphs", nargs="*", metavar="graph",
+        help=f"Graph shapes to run: {', '.join(sorted(GRAPHS))} (default: all)",
+    )
+    parser.add_argument("-n", "--size", type=int, default=1000, help="Nodes per host in each graph")
+    parser.add_argument("--hosts", type=int, default=1, help="Number of fake hosts")
+    parser.add_argument("--scheduler", choices=["pool", "thread", "asyncio"], default="pool")
+    parser.add_argument("-j", "--workers", type=int, default=PoolScheduler.DEFAULT_WORKERS)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per command")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random seconds per command")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability a command fails")
+    parser.add_argument("--seed", type=int, help="Seed for latency jitter and failures")
+    args = parser.parse_args()
+    for name in args.graphs:
+        if name not in GRAPHS:
+            parser.error(f"Unknown graph: {name}")
+
+    print(BenchmarkResult.HEADER)
+    for name in args.graphs or sorted(GRAPHS):
+        result = run_benchmark(
+            name,
+            GRAPHS[name](args.size),
+            hosts=args.hosts,
+            scheduler=args.scheduler,
+            workers=args.workers,
+            latency=args.latency,
+            jitter=args.jitter,
+            failure_rate=args.failure_rate,
+            seed=args.seed,
+        )
+        print(result, flush=True)
+
+
+if __name__ == "__main__":
+    main()
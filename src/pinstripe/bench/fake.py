@@ -0,0 +1,105 @@
+from typing import Optional
+import asyncio
+import io
+import random
+import subprocess
+import threading
+import time
+
+from ..transport import Transport
+from ..types import CommandT
+
+
+class FakeProcess:
+    """
+    Stand-in for subprocess.Popen which produces canned output and exits
+    once the injected latency has elapsed.
+    """
+
+    def __init__(self, args: list[str], rc: int, stdout: str, latency: float) -> None:
+        self.args = args
+        self.stdout = io.StringIO(stdout)
+        self.stderr = io.StringIO("" if rc == 0 else "fake failure\n")
+        self.returncode: Optional[int] = None
+        self._rc = rc
+        self._deadline = time.monotonic() + latency
+
+    def poll(self) -> Optional[int]:
+        if self.returncode is None and time.monotonic() >= self._deadline:
+            self.returncode = self._rc
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        remaining = self._deadline - time.monotonic()
+        if timeout is not None and remaining > timeout:
+            time.sleep(timeout)
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        if remaining > 0:
+            time.sleep(remaining)
+        self.returncode = self._rc
+        return self.returncode
+
+
+class _FakeStream:
+    def __init__(self, data: str) -> None:
+        self._data = data.encode("utf-8")
+
+    async def read(self, n: int = -1) -> bytes:
+        data, self._data = self._data, b""
+        return data
+
+
+class FakeAsyncProcess:
+    """
+    Stand-in for asyncio.subprocess.Process with the same behaviour as
+    FakeProcess.
+    """
+
+    def __init__(self, process: FakeProcess) -> None:
+        self._process = process
+        self.stdout = _FakeStream(process.stdout.getvalue())
+        self.stderr = _FakeStream(process.stderr.getvalue())
+        self.returncode: Optional[int] = None
+
+    async def wait(self) -> int:
+        remaining = self._process._deadline - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        self.returncode = self._process._rc
+        return self.returncode
+
+
+class FakeTransport(Transport):
+    """
+    Transport which never spawns a process. Every command takes `latency`
+    seconds (plus up to `jitter` more), fails with probability
+    `failure_rate` and otherwise prints `stdout`.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        stdout: str = "fake\n",
+        seed: Optional[int] = None,
+    ) -> None:
+        super().__init__(host)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.stdout = stdout
+        self.commands = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def popen(self, cmd: CommandT, stdin: bool = False, timeout: Optional[float] = None) -> FakeProcess:
+        with self._lock:
+            self.commands += 1
+            failed = self._random.random() < self.failure_rate
+            latency = self.latency + self._random.random() * self.jitter
+        return FakeProcess(self.argv(cmd), 1 if failed else 0, self.stdout, latency)
+
+    async def popen_async(self, cmd: CommandT, timeout: Optional[float] = None) -> FakeAsyncProcess:
+        return FakeAsyncProcess(self.popen(cmd))
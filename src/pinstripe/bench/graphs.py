@@ -0,0 +1,67 @@
+"""
+Generators of synthetic playbooks with well known graph shapes.
+"""
+from pathlib import Path
+from typing import Callable
+
+from ..context import Context
+
+PlaybookT = Callable[[Context], None]
+
+
+def fanout(width: int) -> PlaybookT:
+    """
+    One command followed by `width` independent commands.
+    """
+    def playbook(ctx: Context):
+        head = ctx.run("fanout-head")
+        for i in range(width):
+            head.then(ctx.run(f"fanout-{i}"))
+    return playbook
+
+
+def chain(depth: int) -> PlaybookT:
+    """
+    `depth` commands which each depend on the previous one.
+    """
+    def playbook(ctx: Context):
+        cursor = ctx.run("chain-0")
+        for i in range(1, depth):
+            cursor = cursor.then(ctx.run(f"chain-{i}"))
+    return playbook
+
+
+def diamond(width: int, layers: int = 4) -> PlaybookT:
+    """
+    `layers` repetitions of a command fanning out to `width` commands which
+    all join into a single command.
+    """
+    def playbook(ctx: Context):
+        join = ctx.run("diamond-join-0")
+        for layer in range(1, layers + 1):
+            nodes = [join.then(ctx.run(f"diamond-{layer}-{i}")) for i in range(width)]
+            join = ctx.run(f"diamond-join-{layer}")
+            for node in nodes:
+                join.depends_on(node)
+    return playbook
+
+
+def entities(count: int) -> PlaybookT:
+    """
+    `count` independent File and Directory entities.
+    """
+    def playbook(ctx: Context):
+        for i in range(count):
+            if i % 2:
+                ctx.file(Path(f"/tmp/pinstripe-bench/file-{i}")).mode(0o644)
+            else:
+                ctx.directory(Path(f"/tmp/pinstripe-bench/dir-{i}")).mode(0o755)
+    return playbook
+
+
+GRAPHS: dict[str, Callable[[int], PlaybookT]] = {
+    "fanout": fanout,
+    "chain": chain,
+    "diamond": diamond,
+    "entities": entities,
+}
@@ -0,0 +1,152 @@
+from typing import Optional
+import resource
+import threading
+import time
+
+from ..compiler import compile_graph
+from ..context import Context
+from ..events import EventBus, NodeEvent, QUEUED, FINISHED
+from ..graph import Graph, Node
+from ..ops.facts.system import SystemProvider
+from ..scheduler import PoolScheduler, make_scheduler
+from .fake import FakeTransport
+from .graphs import PlaybookT
+
+
+class BenchmarkResult:
+    HEADER = (
+        f"{'benchmark':<20} {'hosts':>6} {'nodes':>8} {'commands':>9} {'seconds':>9} "
+        f"{'nodes/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'rss MiB':>8} {'threads':>8}"
+    )
+
+    def __init__(
+        self,
+        name: str,
+        hosts: int,
+        nodes: int,
+        commands: int,
+        elapsed: float,
+        latencies: list[float],
+        peak_rss_kb: int,
+        peak_threads: int,
+    ) -> None:
+        self.name = name
+        self.hosts = hosts
+        self.nodes = nodes
+        self.commands = commands
+        self.elapsed = elapsed
+        self.throughput = nodes / elapsed if elapsed else 0.0
+        self.p50 = percentile(latencies, 50)
+        self.p99 = percentile(latencies, 99)
+        self.peak_rss_kb = peak_rss_kb
+        self.peak_threads = peak_threads
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name:<20} {self.hosts:>6} {self.nodes:>8} {self.commands:>9} {self.elapsed:>9.3f} "
+            f"{self.throughput:>10.0f} {self.p50 * 1000:>9.2f} {self.p99 * 1000:>9.2f} "
+            f"{self.peak_rss_kb / 1024:>8.1f} {self.peak_threads:>8}"
+        )
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class _Collector:
+    """
+    Records the time from queueing to finishing of every Node, and signals
+    once all scheduled Nodes have finished.
+    """
+
+    def __init__(self) -> None:
+        self.queued: dict[Node, float] = {}
+        self.latencies: list[float] = []
+        self.finished = 0
+        self.peak_threads = threading.active_count()
+        self.done = threading.Event()
+        self._armed = False
+        self._lock = threading.Lock()
+
+    def __call__(self, event: NodeEvent):
+        with self._lock:
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            if event.state == QUEUED:
+                self.queued[event.node] = event.time
+            elif event.state == FINISHED:
+                self.finished += 1
+                self.latencies.append(event.time - self.queued.pop(event.node, event.time))
+                self._check()
+
+    def arm(self):
+        """
+        Start signalling completion, once every initial Node has been queued.
+        """
+        with self._lock:
+            self._armed = True
+            self._check()
+
+    def _check(self):
+        if self._armed and not self.queued:
+            self.done.set()
+
+
+def run_benchmark(
+    name: str,
+    playbook: PlaybookT,
+    hosts: int = 1,
+    scheduler: str = "pool",
+    workers: int = PoolScheduler.DEFAULT_WORKERS,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    failure_rate: float = 0.0,
+    seed: Optional[int] = None,
+) -> BenchmarkResult:
+    """
+    Build the playbook for `hosts` fake hosts and run it to completion with
+    every command going through a FakeTransport.
+    """
+    nodes = Graph()
+    events = EventBus()
+    collector = _Collector()
+    events.listen(collector)
+    run_scheduler = make_scheduler(scheduler, workers)
+    transports: list[FakeTransport] = []
+    for index in range(hosts):
+        transport = FakeTransport(
+            f"bench-{index}",
+            latency=latency,
+            jitter=jitter,
+            failure_rate=failure_rate,
+            seed=None if seed is None else seed + index,
+        )
+        transports.append(transport)
+        context = Context(
+            host=transport.host, scheduler=run_scheduler, transport=transport, events=events, graph=nodes,
+        )
+        SystemProvider(context).register(context.facts)
+        playbook(context)
+
+    graph = compile_graph(nodes.nodes)
+    graph.prioritize()
+    start = time.perf_counter()
+    for node in graph.start_order():
+        node.start()
+    collector.arm()
+    collector.done.wait()
+    elapsed = time.perf_counter() - start
+    run_scheduler.shutdown()
+
+    return BenchmarkResult(
+        name=name,
+        hosts=hosts,
+        nodes=collector.finished,
+        commands=sum(transport.commands for transport in transports),
+        elapsed=elapsed,
+        latencies=collector.latencies,
+        peak_rss_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        peak_threads=collector.peak_threads,
+    )
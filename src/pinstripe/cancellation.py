@@ -0,0 +1,109 @@
+from typing import Callable, Optional
+import heapq
+import itertools
+import threading
+import time
+
+
+class Cancellation:
+    """
+    Signal telling the Nodes of a run which have not started running to
+    finish as skipped instead. The event may be a multiprocessing Event
+    shared with the worker processes of the run.
+    """
+
+    def __init__(self, reason: str = "Cancelled", event=None) -> None:
+        self.reason = reason
+        """
+        Reason given by the Nodes skipped once cancelled.
+        """
+
+        self._event = event if event is not None else threading.Event()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+
+
+class Watchdog:
+    """
+    Calls functions once their deadline passes, from a single background
+    thread, so that enforcing the deadline of a command does not take a
+    thread of its own.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[list] = []
+        self._cancelled = 0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def call_at(self, deadline: float, fn: Callable[[], None]) -> list:
+        """
+        Call fn once time.monotonic() reaches the deadline, unless the
+        returned entry is cancelled first.
+        """
+        entry = [deadline, next(self._sequence), fn]
+        with self._condition:
+            heapq.heappush(self._heap, entry)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return entry
+
+    def cancel(self, entry: list) -> bool:
+        """
+        Cancel a call, returning False if it has already been made.
+        """
+        with self._condition:
+            if entry[2] is None:
+                return False
+            entry[2] = None
+            self._cancelled += 1
+            # Most commands finish before their deadline, so drop cancelled
+            # entries in bulk rather than letting them pile up
+            if self._cancelled > len(self._heap) // 2:
+                self._heap = [entry for entry in self._heap if entry[2] is not None]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+            return True
+
+    def _run(self):
+        with self._condition:
+            while True:
+                while self._heap and self._heap[0][2] is None:
+                    heapq.heappop(self._heap)
+                    self._cancelled -= 1
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                delay = self._heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                entry = heapq.heappop(self._heap)
+                fn, entry[2] = entry[2], None
+                self._condition.release()
+                try:
+                    fn()
+                except Exception:
+                    pass
+                finally:
+                    self._condition.acquire()
+
+
+_watchdog: Optional[Watchdog] = None
+_watchdog_lock = threading.Lock()
+
+
+def watchdog() -> Watchdog:
+    global _watchdog
+    with _watchdog_lock:
+        if _watchdog is None:
+            _watchdog = Watchdog()
+        return _watchdog
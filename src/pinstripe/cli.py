@@ -1,86 +1,259 @@
-import argparse
-from re import I
 import sys
-import time
+import threading
 
-from .context import Context
-from .hosts import HOST_GROUPS, DEFAULT_GROUP_NAME
-from .graph import Node
-from .playbook import PLAYBOOKS
-from .ops.facts.os import OsProvider
+from .hosts import HOST_GROUPS, HOST_GROUP_ROLLOUTS, DEFAULT_GROUP_NAME, add_inventory
+from .inventory import HostShard, parse_shard
+from .playbook import discover, load_playbook, playbook_names
+from .rollout import Rollout, parse_count
 
-def fatal(mesg: str, rc=1):
-    sys.stderr.write(mesg + "\n")
+def fatal(mesg: str, rc=1, err=None):
+    (err or sys.stderr).write(mesg + "\n")
     sys.exit(rc)
 
-def cli():
+def _parser():
+    # Imported here rather than at the top so that importing pinstripe
+    # does not pay for it
+    import argparse
+
     parser = argparse.ArgumentParser()
-    parser.add_argument("playbook")
+    parser.add_argument("playbook", nargs="?")
     parser.add_argument("-l", "--hostgroup")
+    parser.add_argument(
+        "-i", "--inventory", metavar="FILE",
+        help="Inventory file of hostgroups, each a `[name]` line followed by host patterns "
+        "such as web[001-500].dc1, one per line",
+    )
+    parser.add_argument(
+        "--shard", type=parse_shard, metavar="I/N",
+        help="Converge only the I-th of N equal shards of the hostgroup",
+    )
+    parser.add_argument("--list", action="store_true", help="List the available playbooks and exit")
+    parser.add_argument(
+        "--manifest", metavar="FILE",
+        help="Manifest declaring playbooks as `name = module:function` lines in a [playbooks] "
+        "section (default: ./pinstripe.cfg)",
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int,
+        help="Number of worker threads used to run nodes",
+    )
+    parser.add_argument(
+        "--scheduler", choices=["pool", "thread", "asyncio"], default="pool",
+        help="Run nodes on a bounded worker pool, one thread per node, or an asyncio event loop",
+    )
+    parser.add_argument(
+        "--ssh-idle-timeout", type=int,
+        help="Seconds to keep an idle ssh master connection open",
+    )
+    parser.add_argument(
+        "--ssh-max-channels", type=int,
+        help="Maximum number of concurrent commands per ssh connection",
+    )
+    parser.add_argument("--ssh-command", default="ssh", help="ssh client to run")
+    parser.add_argument(
+        "--agent", action="store_true",
+        help="Start a Python agent on each remote host and send it stats, file and directory "
+        "convergence, commands and fact gathering over a single ssh channel",
+    )
+    parser.add_argument(
+        "--agent-python", default="python3", help="Python interpreter used to run the agent"
+    )
+    parser.add_argument(
+        "--refresh-facts", action="store_true",
+        help="Gather every fact again instead of using the fact cache",
+    )
+    parser.add_argument("--fact-cache", metavar="FILE", help="Location of the persistent fact cache")
+    parser.add_argument(
+        "--trace", metavar="FILE",
+        help="Write a Chrome trace of the run to FILE, and its events as JSON lines to FILE.jsonl",
+    )
+    parser.add_argument(
+        "--node-timeout", type=float, metavar="SECONDS",
+        help="Kill the commands of a node and fail it once it has run for this long",
+    )
+    parser.add_argument(
+        "--host-timeout", type=float, metavar="SECONDS",
+        help="Fail the nodes of a host still running this long after the host started",
+    )
+    parser.add_argument(
+        "--fail-fast", type=int, nargs="?", const=1, metavar="N",
+        help="Skip the nodes and hosts not yet started once N nodes have failed (default: 1)",
+    )
+    parser.add_argument(
+        "--journal", action="store_true",
+        help="Record the nodes completing on each host in a journal, so that the run can be resumed "
+        "(default: off)",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Skip the nodes which completed in the previous journaled run of the playbook, "
+        "and keep journaling",
+    )
+    parser.add_argument(
+        "--journal-file", metavar="FILE",
+        help="Journal used by --journal and --resume "
+        "(default: $XDG_CACHE_HOME/pinstripe/journal/PLAYBOOK.jsonl)",
+    )
+    parser.add_argument(
+        "--retain", choices=["all", "summary", "failed"], default="all",
+        help="Keep the full result of every node in memory, reduce successful results to "
+        "summaries once their dependents have read them, or also drop the nodes of each "
+        "finished host except those which failed",
+    )
+    parser.add_argument(
+        "--results", metavar="FILE",
+        help="Record the full result of every node, output included, in a SQLite database",
+    )
+    parser.add_argument(
+        "--serve", action="store_true",
+        help="Run as a daemon accepting runs from --via-daemon clients, keeping ssh "
+        "connections, facts and playbooks loaded between runs",
+    )
+    parser.add_argument(
+        "--via-daemon", action="store_true",
+        help="Submit the run to the daemon started with --serve and stream its progress",
+    )
+    parser.add_argument(
+        "--socket", metavar="PATH",
+        help="Unix socket of the daemon (default: $XDG_RUNTIME_DIR/pinstripe.sock)",
+    )
+    parser.add_argument(
+        "-p", "--processes", type=int, default=1,
+        help="Split the hosts between this many worker processes",
+    )
+    parser.add_argument(
+        "--batch-size", type=parse_count, metavar="N|P%",
+        help="Converge the hosts in batches of this size, each finishing before the next starts",
+    )
+    parser.add_argument(
+        "--max-in-flight", type=parse_count, metavar="N|P%",
+        help="Maximum number of hosts running at once",
+    )
+    parser.add_argument(
+        "--max-failures", type=parse_count, metavar="N|P%",
+        help="Stop starting new hosts once more than this many hosts have failed",
+    )
+    return parser
+
+def cli():
+    parser = _parser()
     args = parser.parse_args()
+    if args.via_daemon:
+        if not args.playbook:
+            parser.error("a playbook is required with --via-daemon")
+        # The client never imports the graph, playbooks or ssh
+        from .daemon import submit
+        sys.exit(submit(args))
+    discover(args.manifest)
+    if args.serve:
+        from .daemon import Daemon
+        Daemon(args).serve()
+        return
+    if args.list:
+        for name in playbook_names():
+            print(name)
+        return
+    if not args.playbook:
+        parser.error("a playbook is required unless --list is given")
+    rc = run_playbook(args)
+    if rc:
+        sys.exit(rc)
+
+def run_playbook(
+    args, out=None, err=None, scheduler=None, ssh_pool=None, fact_cache=None, playbook_refs=None,
+) -> int:
+    """
+    Run the playbook named by the parsed command line options, writing its
+    progress to `out` and errors to `err` (stdout and stderr by default).
+    A daemon passes the scheduler, ssh connections and fact cache it keeps
+    between runs, and the playbooks discovered for this run. Returns the
+    exit code of the run.
+    """
+    err = err or sys.stderr
     hostgroup = args.hostgroup or DEFAULT_GROUP_NAME
     playbook = args.playbook
-    if playbook not in PLAYBOOKS:
-        pbdesc = ", ".join(PLAYBOOKS.keys())
-        fatal(f"Playbook not found: {playbook}. Available playbooks: {pbdesc}")
-    playbook_fn = PLAYBOOKS[playbook]
+    playbook_fn = load_playbook(playbook, playbook_refs)
+    if playbook_fn is None:
+        pbdesc = ", ".join(playbook_names(playbook_refs))
+        fatal(f"Playbook not found: {playbook}. Available playbooks: {pbdesc}", err=err)
 
-    for host in HOST_GROUPS[hostgroup]:
-        context = Context(host=host)
-        context.facts.register_provider("os", OsProvider(context))
-        playbook_fn(context)
-    for node in Node.all():
-        node.start()
+    # Imported once a playbook is about to run, keeping --list fast
+    from .events import EventBus
+    from .fanout import FanOut
+    from .journal import Journal, default_journal_path
+    from .reporter import ProgressReporter
+    from .run import PlaybookRun
+    from .scheduler import PoolScheduler
+    from .ssh import SshConnectionPool
+    from .store import ResultStore, new_run_id
+    from .trace import Tracer
 
-    node_statusline: dict[Node, str] = {}
-    def print_stats():
-        num_ok = 0
-        num_failed = 0
-        num_waiting = 0
-        num_running = 0
-        num_soft_failed = 0
-        num_changed = 0
-        num_skipped = 0
-        result = None
-        for node in Node.all():
-            if node.__class__.__name__ == "Noop":
-                continue
-            status = "UNKNOWN"
-            if node.is_finished:
-                result = node._result
-                if result.skipped:
-                    num_skipped += 1
-                    status = "SKIPPED"
-                    print(f"[SKIPPED] {node} {result}")
-                elif result.ok:
-                    num_ok += 1
-                    status = "OK"
-                elif node.can_fail:
-                    num_soft_failed += 1
-                    status = "SOFT-FAILED"
-                else:
-                    num_failed += 1
-                    status = "FAILED"
-                if result.changed:
-                    num_changed += 1
-                    status = "CHANGED"
-            elif node.is_waiting:
-                num_waiting += 1
-                status = "WAITING"
-            elif node.is_running:
-                num_running += 1
-                status = "RUNNING"
-            result_desc = ""
-            if node.is_finished:
-                result_desc = f" {node.wait()}"
-                statusline = f"[{status}] {node}{result_desc}"
-                if node not in node_statusline or node_statusline[node] != statusline:
-                    print(statusline)
-                    node_statusline[node] = statusline
-        print(f"Running: {num_running}, Waiting: {num_waiting}, Failed: {num_failed}, Soft Failed: {num_soft_failed}, OK: {num_ok}, Changed: {num_changed}, Skipped: {num_skipped}")
+    if args.workers is None:
+        args.workers = PoolScheduler.DEFAULT_WORKERS
+    if args.ssh_idle_timeout is None:
+        args.ssh_idle_timeout = SshConnectionPool.DEFAULT_IDLE_TIMEOUT
+    if args.ssh_max_channels is None:
+        args.ssh_max_channels = SshConnectionPool.DEFAULT_MAX_CHANNELS
+    if args.journal_file is None:
+        args.journal_file = str(default_journal_path(playbook))
+    # A resumed run is journaled too, so that it can be resumed in turn
+    args.journal = args.journal or args.resume
+    # Shared by the worker processes recording to the same store
+    args.run_id = new_run_id()
 
-    # Draw progress graph and status lines
-    while any([not n.is_finished for n in Node.all()]):
-        print_stats()
-        time.sleep(0.1)
-    print_stats()
+    events = EventBus()
+    reporter = ProgressReporter(events, out)
+    tracer = Tracer(events) if args.trace else None
+    # The inventory only adds to the hostgroups of this run, which may share
+    # the process with others in a daemon
+    groups, rollouts = dict(HOST_GROUPS), dict(HOST_GROUP_ROLLOUTS)
+    if args.inventory:
+        add_inventory(args.inventory, groups, rollouts)
+    if hostgroup not in groups:
+        fatal(f"Hostgroup not found: {hostgroup}. Available hostgroups: {', '.join(groups)}", err=err)
+    hosts = groups[hostgroup]
+    if args.shard:
+        hosts = HostShard(hosts, *args.shard)
+    rollout = rollouts.get(hostgroup, Rollout()).merged(
+        Rollout(args.batch_size, args.max_in_flight, args.max_failures)
+    )
+    journal = Journal(args.journal_file, playbook, resume=args.resume) if args.journal else None
+    if journal and not args.resume:
+        journal.clear()
+    if args.processes > 1:
+        try:
+            run = FanOut(playbook, hosts, args, events, reporter, rollout)
+        except ValueError as e:
+            fatal(f"Cannot split the rollout between {args.processes} processes: {e}", err=err)
+        run.start()
+        reporter.run()
+        run.join()
+    else:
+        results = ResultStore(args.results, playbook, args.run_id) if args.results else None
+        run = PlaybookRun(
+            playbook_fn, hosts, args, events, journal, results=results,
+            scheduler=scheduler, ssh_pool=ssh_pool, fact_cache=fact_cache,
+        )
+        run.start(rollout)
+        # Hosts are started in the background
+        reporter.expect(1)
+        threading.Thread(target=lambda: (run.wait(), reporter.producer_done()), daemon=True).start()
+        # Draw progress graph and status lines
+        reporter.run()
+        run.close()
+    for error in run.errors:
+        err.write(f"Failed to build playbook for {error}\n")
+    if run.cancellation.is_cancelled:
+        message = run.cancellation.reason
+        if run.not_started:
+            message += f", {len(run.not_started)} hosts not started: {', '.join(run.not_started)}"
+        err.write(message + "\n")
+    elif run.stopped:
+        err.write(
+            f"Stopped after {len(run.failed_hosts)} failed hosts, "
+            f"{len(run.not_started)} hosts not started: {', '.join(run.not_started)}\n"
+        )
+    if tracer:
+        tracer.write(args.trace)
+    failed = reporter.counts["FAILED"] or run.errors or run.stopped or run.cancellation.is_cancelled
+    return 1 if failed else 0
@@ -0,0 +1,187 @@
+from typing import Iterable
+
+from .graph import Node
+
+
+class GraphCycleError(Exception):
+    """
+    Raised when the dependencies between Nodes form a cycle.
+    """
+
+    def __init__(self, cycle: list[Node]) -> None:
+        self.cycle = cycle
+        path = " -> ".join(str(node) for node in cycle + cycle[:1])
+        super().__init__(f"Dependency cycle detected: {path}")
+
+
+def merge_duplicates(nodes: list[Node]) -> list[Node]:
+    """
+    Merge the Nodes declared identically in the same Context, as told by
+    Node.merge_key(), into the first of them. Edges to a duplicate are moved
+    to the Node it was merged into, and duplicates are left out of the
+    returned list and of the Nodes of their Context so that they never run.
+    """
+    first: dict[tuple, Node] = {}
+    merged: dict[Node, Node] = {}
+    for node in nodes:
+        # Dependencies are usually declared first, so that duplicates of
+        # duplicates end up with identical edges too
+        for edge in node._depends_on:
+            edge.right = merged.get(edge.right, edge.right)
+        key = node.merge_key()
+        if key is None:
+            continue
+        if key in first:
+            merged[node] = first[key]
+        else:
+            first[key] = node
+    if not merged:
+        return nodes
+    for node in nodes:
+        for edge in node._depends_on:
+            edge.right = merged.get(edge.right, edge.right)
+    # A skipped scope settles the Nodes of its Context, which must not
+    # include the duplicates
+    for context in {id(node._context): node._context for node in merged}.values():
+        context.nodes = [node for node in context.nodes if node not in merged]
+    return [node for node in nodes if node not in merged]
+
+
+class CompiledGraph:
+    """
+    Compact, index-based representation of a Node graph in topological
+    order, with the depth and critical path length of every Node.
+    """
+
+    def __init__(
+        self,
+        nodes: list[Node],
+        dependencies: list[list[int]],
+        dependents: list[list[int]],
+        order: list[int],
+    ) -> None:
+        self.nodes = nodes
+        """
+        All Nodes of the graph, including dependencies reachable through
+        edges but never registered directly.
+        """
+
+        self.dependencies = dependencies
+        """
+        Indexes of the dependencies of each Node.
+        """
+
+        self.dependents = dependents
+        """
+        Indexes of the Nodes depending on each Node.
+        """
+
+        self.order = order
+        """
+        Node indexes in topological order, dependencies first.
+        """
+
+        self.depth = [0] * len(nodes)
+        """
+        Length of the longest dependency chain leading to each Node.
+        """
+
+        self.height = [0] * len(nodes)
+        """
+        Length of the longest chain of dependents starting at each Node,
+        i.e. the critical path through the Node to the end of the run.
+        """
+
+        for index in order:
+            deps = dependencies[index]
+            self.depth[index] = 1 + max((self.depth[d] for d in deps), default=0)
+        for index in reversed(order):
+            after = dependents[index]
+            self.height[index] = 1 + max((self.height[d] for d in after), default=0)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def start_order(self) -> list[Node]:
+        """
+        Nodes sorted so that those heading the longest chains come first.
+        """
+        ranked = sorted(range(len(self.nodes)), key=lambda index: -self.height[index])
+        return [self.nodes[index] for index in ranked]
+
+    def critical_path(self) -> list[Node]:
+        """
+        The longest chain of dependent Nodes in the graph.
+        """
+        if not self.nodes:
+            return []
+        cursor = max(range(len(self.nodes)), key=lambda index: self.height[index])
+        path = [cursor]
+        while self.dependents[cursor]:
+            cursor = max(self.dependents[cursor], key=lambda index: self.height[index])
+            path.append(cursor)
+        return [self.nodes[index] for index in path]
+
+    def prioritize(self):
+        """
+        Record the critical path length of each Node as its scheduling
+        priority.
+        """
+        for node, height in zip(self.nodes, self.height):
+            node._priority = height
+
+
+def compile_graph(nodes: Iterable[Node]) -> CompiledGraph:
+    """
+    Build the CompiledGraph of the given Nodes and everything they depend
+    on, raising GraphCycleError if the dependencies contain a cycle.
+    """
+    index: dict[Node, int] = {}
+    ordered: list[Node] = []
+    stack = list(nodes)
+    stack.reverse()
+    while stack:
+        node = stack.pop()
+        if node in index:
+            continue
+        index[node] = len(ordered)
+        ordered.append(node)
+        for edge in node._depends_on:
+            stack.extend(edge.dependencies())
+
+    dependencies: list[list[int]] = [[] for _ in ordered]
+    dependents: list[list[int]] = [[] for _ in ordered]
+    for position, node in enumerate(ordered):
+        for edge in node._depends_on:
+            for dependency in edge.dependencies():
+                target = index[dependency]
+                dependencies[position].append(target)
+                dependents[target].append(position)
+
+    # Kahn's algorithm; anything left unvisited is part of, or behind, a cycle
+    pending = [len(deps) for deps in dependencies]
+    ready = [position for position, count in enumerate(pending) if not count]
+    order: list[int] = []
+    while ready:
+        position = ready.pop()
+        order.append(position)
+        for dependent in dependents[position]:
+            pending[dependent] -= 1
+            if not pending[dependent]:
+                ready.append(dependent)
+    if len(order) != len(ordered):
+        raise GraphCycleError(_find_cycle(ordered, dependencies, pending))
+    return CompiledGraph(ordered, dependencies, dependents, order)
+
+
+def _find_cycle(nodes: list[Node], dependencies: list[list[int]], pending: list[int]) -> list[Node]:
+    # Every unvisited node still has an unvisited dependency, so following
+    # them must eventually revisit a node
+    cursor = next(position for position, count in enumerate(pending) if count)
+    seen: dict[int, int] = {}
+    path: list[int] = []
+    while cursor not in seen:
+        seen[cursor] = len(path)
+        path.append(cursor)
+        cursor = next(d for d in dependencies[cursor] if pending[d])
+    return [nodes[position] for position in path[seen[cursor]:]]
@@ -1,15 +1,22 @@
 from typing import Optional, Union
 import subprocess
+import time
 
 from pinstripe.ops.noop import Noop
 
 from .ops.command import Command
 from .ops.file import File
 from .ops.directory import Directory
-from .ops.stat import Stat
+from .ops.stat import Stat, StatCache
+from .ops.tree import Tree
 from .ops.fact_registry import FactRegistry
-from .scoped_edge import ScopedEdge
-from . import graph
+from .scoped_edge import ScopeGate, ScopedEdge
+from .scheduler import Scheduler, default_scheduler
+from .transport import Transport, default_transport
+from .cancellation import Cancellation
+from .events import EventBus
+from .memo import Memo
+from .graph import Edge, Graph, Node, default_graph
 from .types import CommandT, PredicateT
 
 
@@ -24,23 +31,45 @@ class Context:
         parent: Optional["Context"] = None,
         host="localhost",
         scope: dict = {},
+        scheduler: Optional[Scheduler] = None,
+        transport: Optional[Transport] = None,
+        events: Optional[EventBus] = None,
+        graph: Optional[Graph] = None,
+        deadline: Optional[float] = None,
+        node_timeout: Optional[float] = None,
+        cancellation: Optional[Cancellation] = None,
     ) -> None:
-        self.nodes: list[graph.Node] = []
+        self.nodes: list[Node] = []
         self.parent = parent
         self.children: list["Context"] = []
         self.scope = scope
-        self.root_node = Noop(self)
+        self._scheduler = scheduler
+        self._transport = transport
+        self._events = events
+        self._graph = graph
+        self._deadline = deadline
+        self._node_timeout = node_timeout
+        self._cancellation = cancellation
         if parent:
             parent.children.append(self)
             self._facts = None
+            self._stat_cache = None
+            self._memo = None
         else:
             self._facts = FactRegistry(self)
+            self._stat_cache = StatCache(self)
+            self._memo = Memo()
         self.host = host
+        self.root_node: Node = ScopeGate(self) if parent else Noop(self)
+        """
+        Node every Node declared through the Context depends on, which
+        resolves the scope of a child Context.
+        """
 
-    def connect(self, left: graph.Node, right: graph.Node) -> graph.Edge:
-        if self.scope:
-            return ScopedEdge(self.facts, self.scope, left, right)
-        return graph.Edge(left, right)
+    def connect(self, left: Node, right: Node) -> Edge:
+        if self.parent and right is not self.root_node:
+            return ScopedEdge(self.root_node, left, right)
+        return Edge(left, right)
 
     @property
     def facts(self) -> FactRegistry:
@@ -48,6 +77,65 @@ class Context:
             return self._facts
         return self.root._facts
 
+    @property
+    def stat_cache(self) -> StatCache:
+        return self.root._stat_cache
+
+    @property
+    def memo(self) -> Memo:
+        """
+        Results of read-only operations shared by the Nodes of the host.
+        """
+        return self.root._memo
+
+    @property
+    def scheduler(self) -> Scheduler:
+        root = self.root
+        if not root._scheduler:
+            root._scheduler = default_scheduler()
+        return root._scheduler
+
+    @property
+    def transport(self) -> Transport:
+        root = self.root
+        if not root._transport:
+            root._transport = default_transport(root.host)
+        return root._transport
+
+    @property
+    def events(self) -> Optional[EventBus]:
+        return self.root._events
+
+    @property
+    def graph(self) -> Graph:
+        """
+        The Graph owning the Nodes of the Context tree.
+        """
+        root = self.root
+        if root._graph is None:
+            root._graph = default_graph()
+        return root._graph
+
+    @property
+    def cancellation(self) -> Optional[Cancellation]:
+        return self.root._cancellation
+
+    def deadline(self, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        time.monotonic() value by which a Node starting now with the given
+        timeout must finish: the earliest of the timeout, or the Node
+        timeout of the Context if not given, and the deadline of the host.
+        """
+        root = self.root
+        if timeout is None:
+            timeout = root._node_timeout
+        if timeout is None:
+            return root._deadline
+        deadline = time.monotonic() + timeout
+        if root._deadline is not None:
+            deadline = min(deadline, root._deadline)
+        return deadline
+
     @property
     def is_root(self) -> bool:
         return self.parent is None
@@ -59,6 +147,19 @@ class Context:
             cursor = cursor.parent
         return cursor
 
+    def detach_nodes(self):
+        """
+        Forget the Nodes declared through the Context tree of the host, once
+        they have all finished, so that the Nodes kept afterwards do not hold
+        the rest of its graph.
+        """
+        stack = [self.root]
+        while stack:
+            context = stack.pop()
+            stack.extend(context.children)
+            context.nodes = []
+            context.children = []
+
     def scoped(self, **facts) -> "Context":
         return Context(self, self.host, scope=facts)
 
@@ -88,11 +189,22 @@ class Context:
         node.depends_on(self.root_node)
         return node
 
-    def execute_sync(self, cmd: Union[str, list[str]]) -> subprocess.Popen:
-        if type(cmd) == str:
-            cmd = ["/bin/sh", "-c", cmd]
-        if self.host != "localhost":
-            cmd = ["ssh", self.host] + cmd
-        return subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding="utf-8"
-        )
+    def tree(self, local, remote, label: str = "") -> Tree:
+        """
+        Create and return a Tree node syncing the files of a local directory
+        to a directory of the host
+        """
+        node = Tree(context=self, local=local, remote=remote, label=label)
+        node.depends_on(self.root_node)
+        return node
+
+    def command_argv(self, cmd: CommandT) -> list[str]:
+        """
+        Build the argument vector used to run a command on the host.
+        """
+        return self.transport.argv(cmd)
+
+    def execute_sync(
+        self, cmd: Union[str, list[str]], stdin: bool = False, timeout: Optional[float] = None,
+    ) -> subprocess.Popen:
+        return self.transport.popen(cmd, stdin=stdin, timeout=timeout)
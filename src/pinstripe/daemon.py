@@ -0,0 +1,240 @@
+"""
+Daemon keeping ssh connections, facts, schedulers and imported playbooks
+between runs, and the thin client submitting runs to it over a Unix
+socket. The client only imports this module, so that a run submitted to a
+warm daemon costs little more than the commands it has to execute.
+"""
+from argparse import Namespace
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+import json
+import os
+import socket
+import sys
+import threading
+
+if TYPE_CHECKING:
+    from .scheduler import Scheduler
+
+_PATH_OPTIONS = ("inventory", "journal_file", "results", "trace", "manifest")
+"""
+Options naming files, resolved by the client since the daemon runs in a
+directory of its own.
+"""
+
+
+def default_socket_path() -> Path:
+    base = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("XDG_CACHE_HOME") or Path("~/.cache").expanduser()
+    return Path(base) / "pinstripe.sock"
+
+
+def submit(options: Namespace) -> int:
+    """
+    Send a run to the daemon and copy its progress and errors to stdout and
+    stderr as they arrive. Returns the exit code of the run.
+    """
+    from .playbook import MANIFEST_NAME
+
+    path = Path(options.socket or default_socket_path())
+    request = dict(vars(options))
+    if not request.get("manifest") and Path(MANIFEST_NAME).is_file():
+        # The default manifest is the one in the directory of the client
+        request["manifest"] = MANIFEST_NAME
+    for name in _PATH_OPTIONS:
+        if request.get(name):
+            request[name] = os.path.abspath(request[name])
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(str(path))
+    except OSError as e:
+        sys.stderr.write(f"Cannot connect to the pinstripe daemon at {path}: {e.strerror}\n")
+        return 1
+    with conn, conn.makefile("rb") as replies:
+        conn.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        for line in replies:
+            reply = json.loads(line)
+            if "rc" in reply:
+                return reply["rc"]
+            stream = sys.stdout if reply["stream"] == "out" else sys.stderr
+            stream.write(reply["text"])
+            stream.flush()
+    sys.stderr.write("The pinstripe daemon closed the connection before the run finished\n")
+    return 1
+
+
+class _Replies:
+    """
+    Sends the replies of a run to its client as JSON lines.
+    """
+
+    def __init__(self, conn: socket.socket) -> None:
+        self._conn = conn
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def send(self, reply: dict):
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                self._conn.sendall(json.dumps(reply).encode("utf-8") + b"\n")
+            except OSError:
+                # The client went away; the run still finishes
+                self._closed = True
+
+
+class _Stream:
+    """
+    Text stream writing each line to the client of a run as it is completed.
+    """
+
+    def __init__(self, replies: _Replies, name: str) -> None:
+        self._replies = replies
+        self._name = name
+        self._partial = ""
+
+    def write(self, text: str) -> int:
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        if lines:
+            self._replies.send({"stream": self._name, "text": "\n".join(lines) + "\n"})
+        return len(text)
+
+    def flush(self):
+        if self._partial:
+            self._replies.send({"stream": self._name, "text": self._partial})
+            self._partial = ""
+
+
+class Daemon:
+    """
+    Serves runs submitted by clients on a Unix socket, each on a thread of
+    its own. The ssh connections, fact cache and schedulers are shared by
+    every run, and playbooks stay imported, so that repeated runs against
+    the same hosts reuse open connections and cached facts.
+    """
+
+    DEFAULT_IDLE_TIMEOUT = 600
+    """
+    Seconds an idle ssh master connection is kept open, unless
+    --ssh-idle-timeout is given.
+    """
+
+    def __init__(self, options: Namespace) -> None:
+        from .ops.facts.cache import FactCache
+        from .ssh import SshConnectionPool
+
+        self.options = options
+        self.path = Path(options.socket or default_socket_path())
+        self.ssh_pool = SshConnectionPool(
+            idle_timeout=options.ssh_idle_timeout or self.DEFAULT_IDLE_TIMEOUT,
+            max_channels=options.ssh_max_channels or SshConnectionPool.DEFAULT_MAX_CHANNELS,
+            ssh_command=options.ssh_command,
+        )
+        self.fact_cache = FactCache(options.fact_cache)
+        self._schedulers: dict[tuple[str, int], "Scheduler"] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[socket.socket] = None
+
+    def serve(self):
+        """
+        Accept runs until the daemon is interrupted or terminated.
+        """
+        import signal
+        # Terminating the daemon closes its connections like an interrupt
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        self._bind()
+        sys.stderr.write(f"Serving on {self.path}\n")
+        try:
+            while True:
+                conn, _ = self._server.accept()
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def _bind(self):
+        if self.path.exists():
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(self.path))
+            except OSError:
+                # Left behind by a daemon which did not exit cleanly
+                self.path.unlink()
+            else:
+                probe.close()
+                raise SystemExit(f"A pinstripe daemon is already serving on {self.path}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Runs execute commands as this user, so only this user may submit them
+        umask = os.umask(0o177)
+        try:
+            self._server.bind(str(self.path))
+        finally:
+            os.umask(umask)
+        self._server.listen()
+
+    def _handle(self, conn: socket.socket):
+        replies = _Replies(conn)
+        out, err = _Stream(replies, "out"), _Stream(replies, "err")
+        with conn:
+            try:
+                with conn.makefile("rb") as requests:
+                    options = Namespace(**json.loads(requests.readline()))
+                rc = self.run(options, out, err)
+            except SystemExit as e:
+                rc = e.code if isinstance(e.code, int) else 1
+            except Exception as e:
+                err.write(f"Run failed: {e!r}\n")
+                rc = 1
+            out.flush()
+            err.flush()
+            replies.send({"rc": rc})
+
+    def run(self, options: Namespace, out, err) -> int:
+        """
+        Run a playbook with the options submitted by a client, sharing the
+        resources of the daemon.
+        """
+        from .cli import fatal, run_playbook
+        from .ops.facts.cache import FactCache
+        from .playbook import PLAYBOOK_REFS, discover
+        from .scheduler import PoolScheduler, make_scheduler
+
+        # Playbooks declared since the daemon started, or by the manifest of
+        # the run, in a registry of the run's own
+        playbook_refs = discover(options.manifest, dict(PLAYBOOK_REFS))
+        if options.processes > 1:
+            fatal("--processes is not supported by the daemon", err=err)
+        if options.shard:
+            options.shard = tuple(options.shard)
+        workers = options.workers or PoolScheduler.DEFAULT_WORKERS
+        with self._lock:
+            key = (options.scheduler, workers)
+            scheduler = self._schedulers.get(key)
+            if scheduler is None:
+                scheduler = self._schedulers[key] = make_scheduler(options.scheduler, workers)
+            fact_cache = self.fact_cache
+        if options.refresh_facts:
+            fact_cache = FactCache(self.fact_cache.path, refresh=True)
+        try:
+            return run_playbook(
+                options, out, err, scheduler=scheduler, ssh_pool=self.ssh_pool, fact_cache=fact_cache,
+                playbook_refs=playbook_refs,
+            )
+        finally:
+            if fact_cache is not self.fact_cache:
+                # Pick up the facts gathered again by the run
+                with self._lock:
+                    self.fact_cache = FactCache(self.fact_cache.path)
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            self.path.unlink(missing_ok=True)
+        for scheduler in self._schedulers.values():
+            scheduler.shutdown()
+        self.fact_cache.save()
+        self.ssh_pool.close()
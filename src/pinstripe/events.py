@@ -0,0 +1,60 @@
+from typing import TYPE_CHECKING, Callable
+import threading
+import time
+
+if TYPE_CHECKING:
+    from .graph import Node
+
+QUEUED = "queued"
+WAITING = "waiting"
+RUNNING = "running"
+FINISHED = "finished"
+SPAN_BEGIN = "begin"
+SPAN_END = "end"
+"""
+Events delimiting a span of work inside a running Node, such as a command
+or a stat lookup, described by the event detail.
+"""
+
+
+class NodeEvent:
+    """
+    A state transition of a Node.
+    """
+
+    def __init__(self, node: "Node", state: str, previous: str, detail: str = "") -> None:
+        self.node = node
+        self.state = state
+        self.previous = previous
+        self.detail = detail
+        self.time = time.perf_counter()
+
+    def __str__(self) -> str:
+        return f"{self.node}: {self.previous} -> {self.state}"
+
+
+ListenerT = Callable[[NodeEvent], None]
+
+
+class EventBus:
+    """
+    Fans out Node state transitions to listeners. Listeners are called on
+    the thread which published the event and should return quickly, e.g. by
+    handing the event to a queue.
+    """
+
+    def __init__(self) -> None:
+        self._listeners: list[ListenerT] = []
+        self._lock = threading.Lock()
+
+    def listen(self, listener: ListenerT):
+        with self._lock:
+            self._listeners = self._listeners + [listener]
+
+    def publish(self, node: "Node", state: str, previous: str, detail: str = ""):
+        listeners = self._listeners
+        if not listeners:
+            return
+        event = NodeEvent(node, state, previous, detail)
+        for listener in listeners:
+            listener(event)
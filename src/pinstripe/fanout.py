@@ -0,0 +1,282 @@
+from argparse import Namespace
+from types import SimpleNamespace
+from typing import Collection, Optional
+import multiprocessing
+import queue
+import threading
+
+from .inventory import HostShard
+from .events import EventBus, NodeEvent, FINISHED, SPAN_BEGIN, SPAN_END
+from .journal import Journal
+from .playbook import discover, load_playbook
+from .reporter import ProgressReporter, is_reported, node_outcome
+from .result import Result
+from .rollout import Rollout
+from .store import ResultStore
+from .cancellation import Cancellation
+from .run import FailFast, PlaybookRun, fail_fast_reason
+
+
+class RemoteNode:
+    """
+    Stand-in for a Node running in a worker process, holding what reporters
+    and tracers read from a Node.
+    """
+
+    def __init__(self, node_id: int, label: str, host: str, can_fail: bool, internal: bool) -> None:
+        self._id = node_id
+        self.label = label
+        self.can_fail = can_fail
+        self.INTERNAL = internal
+        self._context = SimpleNamespace(host=host)
+        self._result: Optional[Result] = None
+
+    def __str__(self) -> str:
+        return self.label
+
+
+def shard(hosts: Collection[str], count: int) -> list[HostShard]:
+    """
+    Split the hosts into at most count non-empty shards of similar size,
+    each expanding its own hosts in the worker it is sent to.
+    """
+    return [HostShard(hosts, i, count) for i in range(min(count, len(hosts)))]
+
+
+def _summary(result: Result) -> Result:
+    """
+    Copy of a Result which can be sent between processes: the value is
+    rendered as a string and the captured output is left behind.
+    """
+    return Result(
+        ok=result.ok,
+        changed=result.changed,
+        rc=result.rc,
+        reason=result.reason,
+        skipped=result.skipped,
+        value=None if result.value is None else str(result.value),
+    )
+
+
+class _Forwarder:
+    """
+    EventBus listener of a worker process, sending its events to the parent.
+    """
+
+    def __init__(self, index: int, messages: "multiprocessing.Queue", spans: bool) -> None:
+        self._index = index
+        self._queue = messages
+        self._spans = spans
+
+    def __call__(self, event: NodeEvent):
+        node = event.node
+        result = node._result if event.state == FINISHED else None
+        if not self._spans and not is_reported(node, result):
+            # Internal Nodes are only read by tracers, and by reporters once they fail
+            return
+        if event.state in (SPAN_BEGIN, SPAN_END) and not self._spans:
+            return
+        result = _summary(result) if result is not None else None
+        self._queue.put((
+            self._index, node._id, node.label, node._context.host, node.can_fail, node.INTERNAL,
+            event.state, event.previous, event.detail, result,
+        ))
+
+
+def _worker(
+    index: int,
+    playbook: str,
+    hosts: HostShard,
+    options: Namespace,
+    rollout: Optional[Rollout],
+    messages: "multiprocessing.Queue",
+    cancelled,
+    stopped,
+):
+    # Replaced once the run finishes, or with the error it raised
+    outcome: dict = {"error": "stopped before finishing"}
+    try:
+        events = EventBus()
+        events.listen(_Forwarder(index, messages, spans=bool(options.trace)))
+        playbook_fn = load_playbook(playbook)
+        if playbook_fn is None:
+            # Spawned rather than forked workers start without discovered playbooks
+            discover(options.manifest)
+            playbook_fn = load_playbook(playbook)
+        if playbook_fn is None:
+            raise LookupError(f"Playbook not found: {playbook}")
+        # Every worker appends to the journal the parent started or resumed
+        journal = Journal(options.journal_file, playbook, resume=options.resume) if options.journal else None
+        # Failures are counted by the parent, which sets the shared event
+        cancellation = Cancellation(fail_fast_reason(options.fail_fast), cancelled)
+        results = ResultStore(options.results, playbook, options.run_id) if options.results else None
+        # Failed hosts are counted by the parent too, which sets the other shared event
+        run = PlaybookRun(
+            playbook_fn, hosts, options, events, journal, cancellation, results, stop=Cancellation(event=stopped),
+        )
+        run.start(rollout)
+        run.wait()
+        run.close()
+        outcome = {
+            "failed_hosts": run.failed_hosts,
+            "not_started": run.not_started,
+            "stopped": run.stopped,
+            "errors": run.errors,
+        }
+    except Exception as e:
+        # Also exits the worker with an error, once the parent has been told
+        outcome = {"error": repr(e)}
+        raise
+    finally:
+        messages.put((index, None, outcome))
+
+
+class FanOut:
+    """
+    Runs a playbook in worker processes, each with its own shard of the
+    hosts, and publishes their events on the EventBus of this process.
+    """
+
+    def __init__(
+        self,
+        playbook: str,
+        hosts: Collection[str],
+        options: Namespace,
+        events: EventBus,
+        reporter: ProgressReporter,
+        rollout: Optional[Rollout] = None,
+    ) -> None:
+        self.playbook = playbook
+        self.shards = shard(hosts, options.processes)
+        self.options = options
+        self.events = events
+        self.reporter = reporter
+        # Outcome of the Rollout of every worker, as in PlaybookRun
+        self.failed_hosts: list[str] = []
+        self.not_started: list[str] = []
+        self.stopped = False
+        self.errors: list[str] = []
+
+        # Each worker applies its share of the limits to its own shard
+        rollouts = rollout.split(len(self.shards), len(hosts)) if rollout else [None] * len(self.shards)
+        self._failure_limit = rollout.failure_limit(len(hosts)) if rollout else None
+        self._failed: set[str] = set()
+        mp = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+        self._queue = mp.Queue()
+        self.cancellation = Cancellation(fail_fast_reason(options.fail_fast), mp.Event())
+        """
+        Cancels the Nodes and hosts not yet started in every worker once the
+        fail fast limit is reached across the workers.
+        """
+        self.stop = Cancellation(event=mp.Event())
+        """
+        Stops every worker from starting hosts once more hosts have failed
+        across the workers than the Rollout tolerates. Workers busy with
+        their own hosts may each start one more before they see it.
+        """
+        if options.fail_fast:
+            events.listen(FailFast(options.fail_fast, self.cancellation))
+        if self._failure_limit is not None:
+            events.listen(self._count_failure)
+        self._workers = [
+            mp.Process(
+                target=_worker,
+                args=(
+                    index, playbook, hosts, options, rollouts[index], self._queue,
+                    self.cancellation._event, self.stop._event,
+                ),
+                daemon=True,
+            )
+            for index, hosts in enumerate(self.shards)
+        ]
+        self._receiver = threading.Thread(target=self._receive, daemon=True)
+        self._seen: list[set[str]] = [set() for _ in self._workers]
+        """
+        Hosts each worker has sent events of, i.e. those it started.
+        """
+        self._failed_workers: set[int] = set()
+
+    def start(self):
+        self.reporter.expect(len(self._workers))
+        for worker in self._workers:
+            worker.start()
+        self._receiver.start()
+
+    def join(self):
+        """
+        Wait for every worker to exit and its events to be published.
+        """
+        for worker in self._workers:
+            worker.join()
+        self._receiver.join()
+        for index, worker in enumerate(self._workers):
+            if worker.exitcode and index not in self._failed_workers:
+                self._failed_workers.add(index)
+                self.errors.append(f"the hosts of worker {index}: exited with code {worker.exitcode}")
+
+    def _worker_done(self, index: int, outcome: Optional[dict]):
+        """
+        Record the outcome of a worker, or if it failed without one, the
+        hosts of its shard it never started as not started.
+        """
+        if outcome is None or "error" in outcome:
+            self._failed_workers.add(index)
+            seen = self._seen[index]
+            self.not_started.extend(host for host in self.shards[index] if host not in seen)
+            reason = outcome["error"] if outcome else f"exited with code {self._workers[index].exitcode}"
+            self.errors.append(f"the hosts of worker {index}: {reason}")
+        else:
+            # Hosts failed by a Node were counted as their events arrived
+            self.failed_hosts.extend(host for host in outcome.get("failed_hosts", []) if host not in self._failed)
+            self.not_started.extend(outcome.get("not_started", []))
+            self.errors.extend(outcome.get("errors", []))
+            self.stopped = self.stopped or outcome.get("stopped", False)
+        self.reporter.producer_done()
+
+    def _count_failure(self, event: NodeEvent):
+        """
+        EventBus listener counting the hosts with a failed Node, and
+        stopping the workers once there are more than the failure limit.
+        """
+        if event.state != FINISHED or node_outcome(event.node, event.node._result) != "FAILED":
+            return
+        host = event.node._context.host
+        if host in self._failed:
+            return
+        self._failed.add(host)
+        self.failed_hosts.append(host)
+        if len(self._failed) > self._failure_limit:
+            self.stopped = True
+            self.stop.cancel()
+
+    def _receive(self):
+        nodes: dict[tuple[int, int], RemoteNode] = {}
+        count = len(self._workers)
+        running = set(range(count))
+        while running:
+            try:
+                message = self._queue.get(timeout=1)
+            except queue.Empty:
+                # A worker killed by a signal never says it is done
+                for index in list(running):
+                    exitcode = self._workers[index].exitcode
+                    if exitcode is not None and exitcode != 0:
+                        running.discard(index)
+                        self._worker_done(index, None)
+                continue
+            if message[1] is None:
+                if message[0] in running:
+                    running.discard(message[0])
+                    self._worker_done(message[0], message[2])
+                continue
+            index, node_id, label, host, can_fail, internal, state, previous, detail, result = message
+            self._seen[index].add(host)
+            key = (index, node_id)
+            node = nodes.get(key)
+            if node is None:
+                # Node ids are only unique within a process
+                node = nodes[key] = RemoteNode(node_id * count + index, label, host, can_fail, internal)
+            if state == FINISHED:
+                node._result = result
+                del nodes[key]
+            self.events.publish(node, state, previous, detail)
@@ -1,18 +1,61 @@
-from typing import Generic, Optional, TypeVar
+from typing import TYPE_CHECKING, Generic, Iterator, Optional, TypeVar
+import contextlib
+import itertools
+import sys
 import threading
+import time
 
+from .cancellation import watchdog
 from .types import CommandT, PredicateT
+from .output import Capture, LineCallbackT, OutputBuffer
+from .events import QUEUED, WAITING, RUNNING, FINISHED, SPAN_BEGIN, SPAN_END
 from .result import Result
 
+if TYPE_CHECKING:
+    import asyncio
+
 ResultT = TypeVar("ResultT")
 NodeT = TypeVar("NodeT")
 
 DEFAULT_PREDICATE: PredicateT = lambda result: result.ok and not result.skipped
 
+DEFAULT_CAPTURE = Capture()
+"""
+Output capture settings shared by every Node which does not call capture().
+"""
+
+_STATE_LOCKS = [threading.Lock() for _ in range(64)]
+"""
+Locks guarding Node state, shared between Nodes by id so that a Node does
+not need a lock of its own. A Node never holds another Node's lock.
+"""
+
+def _describe(command: CommandT, limit: int = 120) -> str:
+    """
+    Short description of a command for traces.
+    """
+    text = command if type(command) == str else " ".join(command)
+    text = " ".join(text.split())
+    if len(text) > limit:
+        text = text[:limit - 3] + "..."
+    return f"command: {text}"
+
+def _feed(stdin, data: bytes):
+    """
+    Write data to the stdin of a process and close it, giving up if the
+    process exits without reading it all.
+    """
+    with contextlib.suppress(OSError):
+        with stdin:
+            stdin.buffer.write(data)
+
 class Edge:
     """
     An entity representing the edge between two Node objects.
     """
+
+    __slots__ = ("left", "right", "predicate", "predicate_failure_reason")
+
     def __init__(self, left: 'Node', right: 'Node', predicate: PredicateT = DEFAULT_PREDICATE, predicate_failure_reason: str = ""):
         self.left = left
         self.right = right
@@ -34,34 +77,63 @@ class Edge:
     def evaluate(self) -> bool:
         return self.predicate(self.wait())
 
+    def dependencies(self) -> list['Node']:
+        """
+        Nodes which must finish before the edge can be evaluated without
+        blocking.
+        """
+        return [self.right]
+
 class Node(Generic[NodeT, ResultT]):
     """
     Represents a single Node in the Pinstripe graph which is expected
     to execute some kind of action that produces a Result.
     """
 
-    _counter = 0
+    __slots__ = (
+        "_id", "label", "_context", "_depends_on", "_result", "_running", "_waiting",
+        "_scheduled", "_claimed", "_done", "_pending", "_dependents", "_priority",
+        "can_fail", "_capture", "_timeout", "_deadline",
+    )
 
-    _all: list['Node'] = []
+    _ids = itertools.count(1)
+    """
+    Counter for unique hashing/identity
+    """
 
-    @classmethod
-    def all(cls) -> list['Node']:
-        return cls._all
+    MERGEABLE = False
+    """
+    True if running identical declarations of the Node more than once has
+    no further effect, so that they can be merged into one.
+    """
 
-    def __init__(self, context, label: str = ""):
+    JOURNAL = False
+    """
+    True if a successful Result of the Node can be recorded in a Journal
+    and restored by a resumed run instead of running the Node again.
+    """
+
+    INTERNAL = False
+    """
+    True if the Node is part of the machinery of a run rather than declared
+    by a playbook, so that it is only reported if it fails.
+    """
 
-        Node._counter += 1
+    @classmethod
+    def all(cls) -> list['Node']:
         """
-        Increment a counter for unique hashing/identity
+        Nodes of the default Graph, which owns the Nodes of every Context
+        created without a Graph of its own.
         """
+        return default_graph().nodes
+
+    def __init__(self, context, label: str = ""):
 
-        self._id = Node._counter
+        self._id = next(Node._ids)
         """
         Local unique identifier for the Node.
         """
 
-        Node._all.append(self)
-
         self.label = label or (self.__class__.__name__ + ":" + str(self._id))
         """
         Short descriptor for the node.
@@ -71,11 +143,14 @@ class Node(Generic[NodeT, ResultT]):
         """
         Current playbook Context, used to execute commands.
         """
+        context.nodes.append(self)
+        context.graph.add(self)
 
-        self._depends_on: list[Edge] = []
+        self._depends_on: list[Edge] = ()
         """
         List of dependencies for the node, structured as an Edge between
-        this node and the dependency.
+        this node and the dependency. An empty tuple until the first
+        dependency is added.
         """
 
         self._result: Optional[Result] = None
@@ -93,14 +168,37 @@ class Node(Generic[NodeT, ResultT]):
         True if the Node is currently waiting on dependencies.
         """
 
-        self._thread = None
+        self._scheduled = False
         """
-        Thread execution object for the Node.
+        True once the Node has been handed to the Scheduler.
         """
 
-        self._joined = False
+        self._claimed = False
         """
-        True if the thread has been joined.
+        True once a thread has taken ownership of executing the Node.
+        """
+
+        self._done: Optional[threading.Event] = None
+        """
+        Set when the final Result is available, created only once a thread
+        has to block waiting for it.
+        """
+
+        self._pending = 0
+        """
+        Number of unfinished dependencies, maintained by the Scheduler.
+        """
+
+        self._dependents: list['Node'] = ()
+        """
+        Nodes waiting on this Node to finish, maintained by the Scheduler
+        through add_dependent().
+        """
+
+        self._priority = 0
+        """
+        Scheduling priority, set to the critical path length of the Node
+        when the graph is compiled. Higher values run first.
         """
 
         self.can_fail = False
@@ -108,17 +206,31 @@ class Node(Generic[NodeT, ResultT]):
         Marker set to True if the Node is allowed to fail.
         """
 
-        self._state_lock = threading.Lock()
+        self._capture = DEFAULT_CAPTURE
         """
-        Lock for manipulating state such as _running and _waiting that
-        is accessed on both the main thread and the Node execution thread.
+        Output capture settings for commands run by the Node.
         """
 
-        self._join_lock = threading.Lock()
+        self._timeout: Optional[float] = None
         """
-        Lock for joining the thread to get the final Result.
+        Seconds the Node may run for, or None for the Node timeout of the
+        Context.
         """
 
+        self._deadline: Optional[float] = None
+        """
+        time.monotonic() value at which commands of the running Node are
+        killed, or None for no deadline.
+        """
+
+    @property
+    def _state_lock(self) -> threading.Lock:
+        """
+        Lock for manipulating state such as _running and _waiting that
+        is accessed on both the main thread and the Node execution thread.
+        """
+        return _STATE_LOCKS[self._id % len(_STATE_LOCKS)]
+
     def __eq__(self, node):
         if self is node:
             return True
@@ -142,6 +254,53 @@ class Node(Generic[NodeT, ResultT]):
         with self._state_lock:
             return self._result and not self._running
 
+    @property
+    def is_done(self) -> bool:
+        """
+        True once the final Result has been published to waiters.
+        """
+        return self._result is not None
+
+    def identity(self) -> list:
+        """
+        The label of the Node and the arguments deciding what it does,
+        which identify it across runs of the same playbook.
+        """
+        label = self.label
+        if label == f"{self.__class__.__name__}:{self._id}":
+            # Generated labels hold the id, which depends on creation order
+            label = self.__class__.__name__
+        return [label]
+
+    def merge_key(self) -> Optional[tuple]:
+        """
+        Key shared by the Nodes declared identically in the same Context,
+        which are merged into one before the graph runs, or None if the
+        Node must run as declared.
+        """
+        return self._declaration() if self.MERGEABLE else None
+
+    def _declaration(self) -> tuple:
+        """
+        Everything deciding what the Node does and when, except its label.
+        """
+        edges = tuple((type(edge), edge.right, edge.predicate) for edge in self._depends_on)
+        return (
+            type(self), repr(self.identity()[1:]), self.can_fail, self._timeout, id(self._context), edges,
+        )
+
+    def encode_value(self, value: Optional[ResultT]):
+        """
+        Plain JSON form of a Result value, for the Journal.
+        """
+        return value
+
+    def decode_value(self, data) -> Optional[ResultT]:
+        """
+        Result value from its encode_value() form.
+        """
+        return data
+
     def labelled(self, label: str) -> NodeT:
         self.label = label
         return self
@@ -150,20 +309,134 @@ class Node(Generic[NodeT, ResultT]):
         self.can_fail = True
         return self
 
+    def timeout(self, seconds: float) -> NodeT:
+        """
+        Kill the commands of the Node and fail it if it runs for longer than
+        the given number of seconds.
+        """
+        self._timeout = seconds
+        return self
+
+    def capture(
+        self,
+        head: int = Capture.DEFAULT_HEAD,
+        tail: int = Capture.DEFAULT_TAIL,
+        spill: bool = False,
+        on_line: Optional[LineCallbackT] = None,
+    ) -> NodeT:
+        """
+        Keep only the first `head` and last `tail` lines of each output
+        stream in the Result, optionally writing the full output to temp
+        files (Result.stdout_path/stderr_path) or passing each line to
+        `on_line` as it arrives.
+        """
+        self._capture = Capture(head=head, tail=tail, spill=spill, on_line=on_line)
+        return self
+
     def execute(self, *dependency_results: Result) -> Result[ResultT]:
         """
         The main operation of a Node, to be overridden in subclasses.
         """
         return Result(ok=False, reason="Not implemented")
 
-    def execute_command(self, command: CommandT) -> Result:
-        proc = self._context.execute_sync(command)
-        proc.wait()
+    async def execute_async(self, *dependency_results: Result) -> Result[ResultT]:
+        """
+        Coroutine variant of execute() used by the asyncio scheduler. The
+        default adapter runs the blocking execute() on an executor thread so
+        that existing Nodes keep working unchanged.
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.execute(*dependency_results))
+
+    def execute_command(self, command: CommandT, input: Optional[bytes] = None) -> Result:
+        """
+        Run a command, draining stdout and stderr concurrently into bounded
+        buffers as configured by capture(), and writing `input` to its stdin
+        if given.
+        """
+        stdout = OutputBuffer("stdout", self._capture)
+        stderr = OutputBuffer("stderr", self._capture)
+        with self.span(_describe(command)):
+            proc = self._context.execute_sync(command, stdin=input is not None, timeout=self._remaining())
+            if input is not None:
+                threading.Thread(target=_feed, args=(proc.stdin, input), daemon=True).start()
+            alarm = None
+            if self._deadline is not None:
+                transport = self._context.transport
+                alarm = watchdog().call_at(self._deadline, lambda: transport.kill(proc))
+            drain = threading.Thread(target=stderr.extend, args=(proc.stderr,), daemon=True)
+            drain.start()
+            stdout.extend(proc.stdout)
+            drain.join()
+            proc.wait()
+        result = self._command_result(proc.returncode, stdout, stderr)
+        expired = alarm is not None and not watchdog().cancel(alarm)
+        if expired or getattr(proc, "timed_out", False):
+            self._expired(result)
+        return result
+
+    async def execute_command_async(self, command: CommandT) -> Result:
+        """
+        Run a command without blocking the event loop.
+        """
+        import asyncio
+        stdout = OutputBuffer("stdout", self._capture)
+        stderr = OutputBuffer("stderr", self._capture)
+        transport = self._context.transport
+        await asyncio.get_running_loop().run_in_executor(None, transport.connect)
+        async with transport.async_channel():
+            self._publish(SPAN_BEGIN, RUNNING, _describe(command))
+            proc = await transport.popen_async(command, timeout=self._remaining())
+            # Set by transports which run the command to completion before
+            # returning it, killing it themselves at the deadline
+            expired = getattr(proc, "timed_out", False)
+            try:
+                await asyncio.wait_for(asyncio.gather(
+                    self._drain_async(proc.stdout, stdout),
+                    self._drain_async(proc.stderr, stderr),
+                    proc.wait(),
+                ), None if expired else self._remaining())
+            except asyncio.TimeoutError:
+                expired = True
+                transport.kill(proc)
+                await proc.wait()
+            self._publish(SPAN_END, RUNNING, _describe(command))
+        result = self._command_result(proc.returncode, stdout, stderr)
+        if expired:
+            self._expired(result)
+        return result
+
+    async def _drain_async(self, stream: "asyncio.StreamReader", buffer: OutputBuffer):
+        while True:
+            chunk = await stream.read(65536)
+            buffer.feed(chunk)
+            if not chunk:
+                return
+
+    def _remaining(self) -> Optional[float]:
+        """
+        Seconds left before the deadline of the Node, or None if it has none.
+        """
+        return None if self._deadline is None else max(0, self._deadline - time.monotonic())
+
+    def _expired(self, result: Result):
+        result.ok = False
+        result.value = None
+        result.reason = "Deadline exceeded"
+
+    def _command_result(self, rc: int, stdout: OutputBuffer, stderr: OutputBuffer) -> Result:
+        stdout.close()
+        stderr.close()
         result = Result(
             ok=True,
-            rc=proc.returncode,
-            stdout=proc.stdout.readlines(),
-            stderr=proc.stderr.readlines(),
+            rc=rc,
+            stdout=stdout.lines,
+            stderr=stderr.lines,
+            stdout_dropped=stdout.dropped,
+            stderr_dropped=stderr.dropped,
+            stdout_path=stdout.path,
+            stderr_path=stderr.path,
         )
         if result.rc != 0:
             result.ok = False
@@ -172,30 +445,92 @@ class Node(Generic[NodeT, ResultT]):
         if result.stdout:
             result.value = result.stdout[0].strip()
         else:
-            result.value = str(proc.returncode)
+            result.value = str(rc)
         return result
 
     def wait(self) -> Result[ResultT]:
         """
-        Wait for a node to complete running, then return the Result.
+        Wait for a node to complete running, then return the Result. If no
+        thread has picked up the Node yet, it is executed on the calling
+        thread so that waiting never starves a bounded worker pool.
         """
-        if not self._thread:
-            self.start()
-        with self._join_lock:
-            if self._thread and not self._joined:
-                self._thread.join()
-                self._joined = True
+        self.start()
+        self.run()
+        with self._state_lock:
+            if self._result is not None:
+                return self._result
+            if self._done is None:
+                self._done = threading.Event()
+            done = self._done
+        done.wait()
         return self._result
 
     def __str__(self) -> str:
         return self.label
 
+    def run(self):
+        """
+        Execute the Node on the current thread unless another thread has
+        already claimed it.
+        """
+        if not self._claim():
+            return
+        try:
+            self._main()
+        except Exception as e:
+            self._fail(e)
+
+    async def run_async(self):
+        """
+        Execute the Node as a coroutine unless another thread has already
+        claimed it. Dependencies are expected to have finished.
+        """
+        if not self._claim():
+            return
+        try:
+            results = self._collect_dependencies()
+            if results is not None:
+                self._finish(await self.execute_async(*results))
+        except Exception as e:
+            self._fail(e)
+
+    def _fail(self, error: Exception):
+        """
+        Finish the Node as failed by an exception, unless the exception was
+        raised once it had finished, e.g. by a listener of its FINISHED
+        event, in which case it is only reported.
+        """
+        if self._result is not None:
+            self._report(error)
+            return
+        self._finish(Result(ok=False, rc=1, reason=f"Exception: {error!r}"))
+
+    def _report(self, error: Exception):
+        sys.stderr.write(f"Error after {self} finished: {error!r}\n")
+
+    def _claim(self) -> bool:
+        with self._state_lock:
+            if self._claimed:
+                return False
+            self._claimed = True
+            return True
+
     def _main(self):
         """
-        Main operation for the Node's thread.
+        Main operation for the Node, run once by whichever thread claims it.
+        """
+        results = self._collect_dependencies()
+        if results is not None:
+            self._finish(self.execute(*results))
+
+    def _collect_dependencies(self) -> Optional[list[Result]]:
+        """
+        Wait for the dependency edges and return their Results, or finish
+        the Node as skipped and return None if an edge predicate fails.
         """
         with self._state_lock:
             self._waiting = True
+        self._publish(WAITING, QUEUED)
 
         results: list[Result] = []
         # Wait for dependencies
@@ -203,45 +538,140 @@ class Node(Generic[NodeT, ResultT]):
             result = edge.wait()
             results.append(result)
             if not edge.evaluate():
-                reason = edge.predicate_failure_reason or "predicate returned False"
-                self._result = Result(
-                    ok=True,
-                    skipped=True,
-                    rc=result.rc,
-                    reason=f"Skipping for reason: {reason}"
-                )
-                return
+                self._finish(self._skipped(edge, result))
+                return None
+
+        cancellation = self._context.cancellation
+        if cancellation is not None and cancellation.is_cancelled:
+            self._finish(Result(ok=True, skipped=True, reason=f"Skipping for reason: {cancellation.reason}"))
+            return None
+        self._deadline = self._context.deadline(self._timeout)
+        if self._deadline is not None and self._deadline <= time.monotonic():
+            self._finish(Result(ok=False, rc=1, reason="Deadline exceeded"))
+            return None
 
         with self._state_lock:
             self._waiting = False
             self._running = True
+        self._publish(RUNNING, WAITING)
+        return results
+
+    def _skipped(self, edge: Edge, result: Result) -> Result:
+        reason = edge.predicate_failure_reason or "predicate returned False"
+        return Result(ok=True, skipped=True, rc=result.rc, reason=f"Skipping for reason: {reason}")
 
-        result = self.execute(*results)
+    def _skip(self, edge: Edge) -> bool:
+        """
+        Finish the Node as skipped without running it once the predicate of
+        a finished edge fails, unless another thread has claimed it.
+        Called by the Scheduler so that dependents of a failed Node are
+        skipped at once rather than after they are dequeued.
+        """
+        return self._settle(self._skipped(edge, edge.wait()))
+
+    def _settle(self, result: Result) -> bool:
+        """
+        Finish the Node with the given Result without running it, unless
+        another thread has claimed it. A Node settled before the Scheduler
+        took charge of it is never handed to the Scheduler.
+        """
+        with self._state_lock:
+            if self._claimed:
+                return False
+            self._claimed = True
+            queued = not self._scheduled
+            self._scheduled = True
+        if queued:
+            self._publish(QUEUED, "")
+        self._finish(result)
+        return True
+
+    def _finish(self, result: Result):
         with self._state_lock:
+            previous = RUNNING if self._running else WAITING if self._waiting else QUEUED
             self._result = result
             self._running = False
+            self._waiting = False
+            done = self._done
+        if done is not None:
+            done.set()
+        try:
+            self._publish(FINISHED, previous)
+        except Exception as e:
+            # The Node has settled, and so has whichever Node settled it
+            self._report(e)
+        self._context.scheduler.finished(self)
 
-    def start(self):
+    def _publish(self, state: str, previous: str, detail: str = ""):
+        events = self._context.events
+        if events:
+            events.publish(self, state, previous, detail)
+
+    @contextlib.contextmanager
+    def span(self, detail: str) -> Iterator[None]:
         """
-        Start running the thread executing the main operation of the Node,
-        which will wait for all of its dependent edges to complete
+        Publish the begin and end of a span of work within the running Node.
+        """
+        self._publish(SPAN_BEGIN, RUNNING, detail)
+        try:
+            yield
+        finally:
+            self._publish(SPAN_END, RUNNING, detail)
+
+    def _mark_scheduled(self) -> bool:
+        """
+        Called by the Scheduler when it takes charge of the Node. Returns
+        False if the Node has been settled in the meantime.
         """
         with self._state_lock:
-            if self._thread:
-                return
-            for node in self._depends_on:
-                node.start()
-            self._thread = threading.Thread(target=self._main)
-        self._thread.start()
+            if self._scheduled:
+                return False
+            self._scheduled = True
+        self._publish(QUEUED, "")
+        return True
+
+    def restore(self, result: Result) -> bool:
+        """
+        Finish the Node with a Result recorded by an earlier run instead of
+        running it. Returns False if the Node was already started.
+        """
+        with self._state_lock:
+            if self._scheduled or self._claimed:
+                return False
+            self._scheduled = True
+            self._claimed = True
+        self._publish(QUEUED, "")
+        self._finish(result)
+        return True
+
+    def start(self):
+        """
+        Hand the Node to the Context's Scheduler, which runs it once all of
+        its dependent edges have completed.
+        """
+        if not self._scheduled:
+            self._context.scheduler.start(self)
 
     def depends_on(self, node: NodeT) -> Edge:
         """
         Add a dependency between the current node and the given node.
         """
         edge = self._context.connect(self, node)
-        self._depends_on.append(edge)
+        if not self._depends_on:
+            self._depends_on = [edge]
+        else:
+            self._depends_on.append(edge)
         return edge
 
+    def add_dependent(self, node: 'Node'):
+        """
+        Record a Node waiting on this one, called by the Scheduler.
+        """
+        if not self._dependents:
+            self._dependents = [node]
+        else:
+            self._dependents.append(node)
+
     def then(self, node: NodeT, predicate: PredicateT = DEFAULT_PREDICATE) -> NodeT:
         """
         Creates a reverse dependency with optional Predicate to evaluate
@@ -261,3 +691,40 @@ class Node(Generic[NodeT, ResultT]):
         edge.predicate = lambda result: not result.ok
         edge.predicate_failure_reason = "No errors caught"
         return node
+
+
+class Graph:
+    """
+    Owns the Nodes created for a run, so that they are released together
+    with the run instead of living for the whole process.
+    """
+
+    __slots__ = ("nodes",)
+
+    def __init__(self) -> None:
+        self.nodes: list[Node] = []
+        """
+        Every Node of the run, in creation order.
+        """
+
+    def add(self, node: Node):
+        self.nodes.append(node)
+
+    def clear(self):
+        self.nodes.clear()
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __iter__(self) -> Iterator[Node]:
+        return iter(self.nodes)
+
+
+_default_graph: Optional[Graph] = None
+
+
+def default_graph() -> Graph:
+    global _default_graph
+    if _default_graph is None:
+        _default_graph = Graph()
+    return _default_graph
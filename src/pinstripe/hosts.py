@@ -1,17 +1,66 @@
+from pathlib import Path
+from typing import Collection, Optional
+
+from .inventory import HostFile, HostPatterns, is_pattern, load_inventory, parse_lines
+from .rollout import CountT, Rollout
+
 DEFAULT_GROUP_NAME = "__default__"
 
-HOST_GROUPS: dict[str, list[str]] = {}
+HOST_GROUPS: dict[str, Collection[str]] = {}
+"""
+Hosts of each group, as a list or as patterns expanded lazily.
+"""
+
+HOST_GROUP_ROLLOUTS: dict[str, Rollout] = {}
 
 def _parse_hostlist(hostlist: str) -> list[str]:
-    return [h for h in hostlist.splitlines() if h]
+    return parse_lines(hostlist)
 
-def add_hostgroup(name, hosts):
-    if type(hosts) == list:
-        HOST_GROUPS[name] = hosts
+def add_hostgroup(
+    name,
+    hosts,
+    batch_size: CountT = None,
+    max_in_flight: CountT = None,
+    max_failures: CountT = None,
+):
+    """
+    Register a group of hosts, given as a list, as a string with one host
+    per line, or as the Path of a file with one host per line. Hosts may be
+    patterns such as `web[001-500].dc1`, expanded as the group is iterated.
+
+    The hosts can be converged in batches of `batch_size`, with at most
+    `max_in_flight` of them running at once, and no new hosts started once
+    more than `max_failures` have failed. Each limit is a number of hosts or
+    a percentage of the group such as "10%".
+    """
+    if isinstance(hosts, Path):
+        HOST_GROUPS[name] = HostFile(hosts)
     else:
-        HOST_GROUPS[name] = _parse_hostlist(hosts)
+        if type(hosts) != list:
+            hosts = _parse_hostlist(hosts)
+        HOST_GROUPS[name] = HostPatterns(hosts) if any(is_pattern(host) for host in hosts) else hosts
+    HOST_GROUP_ROLLOUTS[name] = Rollout(batch_size, max_in_flight, max_failures)
+
+def add_default_hostgroup(hosts, **limits):
+    add_hostgroup(DEFAULT_GROUP_NAME, hosts, **limits)
 
-def add_default_hostgroup(hosts):
-    add_hostgroup(DEFAULT_GROUP_NAME, hosts)
+def add_inventory(
+    path,
+    groups: Optional[dict[str, Collection[str]]] = None,
+    rollouts: Optional[dict[str, Rollout]] = None,
+):
+    """
+    Register the hostgroups of an inventory file, in which each `[name]`
+    line starts a group followed by its hosts, one per line. They are added
+    to `groups` and `rollouts`, HOST_GROUPS and HOST_GROUP_ROLLOUTS by
+    default; a run passes copies of its own.
+    """
+    if groups is None:
+        groups = HOST_GROUPS
+    if rollouts is None:
+        rollouts = HOST_GROUP_ROLLOUTS
+    for name, hosts in load_inventory(path).items():
+        groups[name] = hosts
+        rollouts.setdefault(name, Rollout())
 
-add_default_hostgroup(["localhost"])
\ No newline at end of file
+add_default_hostgroup(["localhost"])
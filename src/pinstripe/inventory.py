@@ -0,0 +1,204 @@
+"""
+Hosts named by patterns such as `web[001-500].dc1`, read from inventory
+files and split into shards, all expanded lazily as they are iterated so
+that the first hosts of a large group start without waiting for the rest.
+"""
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+import itertools
+import re
+
+_RANGE = re.compile(r"\[([^\[\]]+)\]")
+
+_ITEM = re.compile(r"^(\w+)(?:-(\w+))?$")
+
+
+def _expand_item(item: str) -> Optional[range]:
+    """
+    Values of one comma separated item of a range, such as "001-500" or
+    "a-f", as a range of ints or characters, or None if it is not a range.
+    """
+    match = _ITEM.match(item)
+    if not match:
+        return None
+    start, end = match.group(1), match.group(2) or match.group(1)
+    if start.isdigit() and end.isdigit():
+        return range(int(start), int(end) + 1)
+    if len(start) == len(end) == 1 and start.isalpha() and end.isalpha():
+        return range(ord(start), ord(end) + 1)
+    return None
+
+
+def _ranges(pattern: str) -> Optional[list[list[tuple[str, range]]]]:
+    """
+    The items of each bracketed range of the pattern, or None if one of
+    them is not a range, e.g. an IPv6 address in brackets.
+    """
+    ranges = []
+    for match in _RANGE.finditer(pattern):
+        items = []
+        for item in match.group(1).split(","):
+            values = _expand_item(item.strip())
+            if values is None:
+                return None
+            items.append((item.strip(), values))
+        ranges.append(items)
+    return ranges
+
+
+def _format(item: str, value: int) -> str:
+    start = item.split("-")[0]
+    if start.isdigit():
+        # Keep the zero padding of the start of the range
+        return str(value).zfill(len(start)) if start.startswith("0") else str(value)
+    return chr(value)
+
+
+def expand(pattern: str) -> Iterator[str]:
+    """
+    Expand the bracketed ranges of a host pattern, such as
+    `web[001-500].dc1` or `db[1-3,7][a-b]`, in order.
+    """
+    ranges = _ranges(pattern)
+    if not ranges:
+        yield pattern
+        return
+    literals = _RANGE.split(pattern)[0::2]
+
+    # Unlike itertools.product, which lists every value of each range
+    # before yielding the first host, each range is walked as it goes
+    def hosts(index: int, prefix: str) -> Iterator[str]:
+        if index == len(ranges):
+            yield prefix + literals[-1]
+            return
+        for item, values in ranges[index]:
+            for value in values:
+                yield from hosts(index + 1, prefix + literals[index] + _format(item, value))
+
+    yield from hosts(0, "")
+
+
+def count(pattern: str) -> int:
+    """
+    Number of hosts a pattern expands to, without expanding it.
+    """
+    ranges = _ranges(pattern)
+    total = 1
+    for items in ranges or ():
+        total *= sum(len(values) for _, values in items)
+    return total
+
+
+def is_pattern(host: str) -> bool:
+    return bool(_ranges(host))
+
+
+def parse_lines(text: str) -> list[str]:
+    """
+    Host patterns of a list with one per line, ignoring blank lines and
+    comments starting with #.
+    """
+    patterns = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            patterns.append(line)
+    return patterns
+
+
+class HostPatterns:
+    """
+    Hosts named by a list of patterns, expanded as they are iterated.
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self._patterns = list(patterns)
+        self._len: Optional[int] = None
+
+    @property
+    def patterns(self) -> list[str]:
+        return self._patterns
+
+    def __iter__(self) -> Iterator[str]:
+        for pattern in self.patterns:
+            yield from expand(pattern)
+
+    def __len__(self) -> int:
+        if self._len is None:
+            self._len = sum(count(pattern) for pattern in self.patterns)
+        return self._len
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.patterns!r})"
+
+
+class HostFile(HostPatterns):
+    """
+    Hosts named by the patterns of a file with one per line, read once the
+    hosts are first needed.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        super().__init__(())
+        self.path = Path(path)
+        self._loaded = False
+
+    @property
+    def patterns(self) -> list[str]:
+        if not self._loaded:
+            self._patterns = parse_lines(self.path.read_text())
+            self._loaded = True
+        return self._patterns
+
+    def __repr__(self) -> str:
+        return f"HostFile({str(self.path)!r})"
+
+
+class HostShard:
+    """
+    Every `count`th host of a group, starting with the host at `index`.
+    """
+
+    def __init__(self, hosts: Iterable[str], index: int, count: int) -> None:
+        self.hosts = hosts
+        self.index = index
+        self.count = count
+
+    def __iter__(self) -> Iterator[str]:
+        return itertools.islice(iter(self.hosts), self.index, None, self.count)
+
+    def __len__(self) -> int:
+        return len(range(self.index, len(self.hosts), self.count))
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """
+    Parse a shard given as "i/n", the i-th of n shards counting from 1, into
+    a 0-based index and a count, raising ValueError if it is invalid.
+    """
+    index, sep, total = value.partition("/")
+    if not sep:
+        raise ValueError(f"Shard must be given as i/n: {value}")
+    index, total = int(index), int(total)
+    if not 1 <= index <= total:
+        raise ValueError(f"Shard must be between 1/{total} and {total}/{total}: {value}")
+    return index - 1, total
+
+
+def load_inventory(path: Union[str, Path]) -> dict[str, HostPatterns]:
+    """
+    Read the hostgroups of an inventory file, in which each `[name]` line
+    starts a group followed by its host patterns, one per line. Patterns
+    before the first group belong to the default group.
+    """
+    from .hosts import DEFAULT_GROUP_NAME
+
+    groups: dict[str, list[str]] = {}
+    name = DEFAULT_GROUP_NAME
+    for line in parse_lines(Path(path).read_text()):
+        if line.startswith("[") and line.endswith("]") and line.count("[") == 1:
+            name = line[1:-1].strip()
+            groups.setdefault(name, [])
+        else:
+            groups.setdefault(name, []).append(line)
+    return {name: HostPatterns(patterns) for name, patterns in groups.items()}
@@ -0,0 +1,159 @@
+from pathlib import Path
+from typing import Optional, Union
+import hashlib
+import json
+import os
+import threading
+
+from .events import NodeEvent, FINISHED
+from .graph import Node
+from .result import Result
+
+
+def default_journal_path(playbook: str) -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path("~/.cache").expanduser()
+    return Path(base) / "pinstripe" / "journal" / f"{playbook}.jsonl"
+
+
+def node_key(node: Node) -> str:
+    """
+    Key of the Node which stays the same across runs of a playbook, derived
+    from its identity and the scopes of its Context. Nodes with the same key
+    on a host are told apart by Journal.restore().
+    """
+    scopes = []
+    context = node._context
+    while context is not None:
+        scopes.append(context.scope)
+        context = context.parent
+    text = json.dumps([node.identity(), scopes], sort_keys=True, default=str)
+    return f"{type(node).__name__}:{hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]}"
+
+
+class Journal:
+    """
+    Append-only record of the Nodes of a playbook which finished
+    successfully on each host, with their Results, as JSON lines. A later
+    run loading the journal restores those Nodes instead of running them
+    again, so that only the unfinished part of the graph runs.
+    """
+
+    def __init__(self, path: Union[str, Path], playbook: str, resume: bool = False) -> None:
+        self.path = Path(path)
+        """
+        JSON lines file holding the journal, shared by every process of a run.
+        """
+
+        self.playbook = playbook
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._keys: dict[Node, str] = {}
+        self._counts: dict[tuple[str, str], int] = {}
+        self._completed: dict[tuple[str, str], dict] = {}
+        if resume:
+            self.load()
+
+    def load(self):
+        """
+        Read the Results recorded for the playbook by earlier runs. A line
+        cut short by a run which died while writing it is ignored.
+        """
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("playbook") == self.playbook:
+                self._completed[(entry["host"], entry["key"])] = entry["result"]
+
+    def clear(self):
+        """
+        Forget every recorded Result, starting a new journal.
+        """
+        with self._lock:
+            self._completed.clear()
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def restore(self, nodes: list[Node]) -> int:
+        """
+        Key the journaled Nodes of a host, in the order the playbook created
+        them, and finish those recorded by an earlier run with their
+        recorded Result. Returns the number of restored Nodes.
+        """
+        restored = 0
+        for node in nodes:
+            if not node.JOURNAL:
+                continue
+            host = node._context.host
+            key = node_key(node)
+            count = self._counts.get((host, key), 0)
+            self._counts[(host, key)] = count + 1
+            if count:
+                key = f"{key}#{count}"
+            recorded = self._completed.get((host, key))
+            if recorded is None:
+                with self._lock:
+                    self._keys[node] = key
+                continue
+            result = Result(
+                ok=recorded["ok"],
+                changed=recorded["changed"],
+                rc=recorded["rc"],
+                reason=recorded["reason"],
+                value=node.decode_value(recorded["value"]),
+            )
+            if node.restore(result):
+                restored += 1
+        return restored
+
+    def record(self, event: NodeEvent):
+        """
+        EventBus listener appending each successful Result of a keyed Node.
+        """
+        if event.state != FINISHED:
+            return
+        node: Node = event.node
+        with self._lock:
+            key = self._keys.pop(node, None)
+        result: Optional[Result] = node._result
+        if key is None or not result.ok or result.skipped:
+            return
+        try:
+            line = json.dumps({
+                "host": node._context.host,
+                "playbook": self.playbook,
+                "key": key,
+                "label": node.label,
+                "result": {
+                    "ok": result.ok,
+                    "changed": result.changed,
+                    "rc": result.rc,
+                    "reason": result.reason,
+                    "value": node.encode_value(result.value),
+                },
+            })
+        except (TypeError, ValueError):
+            # The value cannot be restored, so the Node runs again on resume
+            return
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "ab", buffering=0)
+            # One unbuffered append per line, so that processes sharing the
+            # file do not interleave their lines
+            self._file.write(line.encode("utf-8") + b"\n")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
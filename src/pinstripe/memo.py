@@ -0,0 +1,88 @@
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Hashable, Optional
+import threading
+
+from .result import Result
+
+
+class Memo:
+    """
+    Results of the read-only operations run on a host, such as stats, fact
+    probes and pure commands, shared by identical requests including those
+    still in flight. Entries tied to a path are dropped when a Node changes
+    the path, and every entry is dropped when a command which may change
+    anything on the host finishes.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[Hashable, tuple[Future, Optional[str]]] = {}
+
+    def _claim(self, key: Hashable, path: Optional[str]) -> tuple[Future, bool]:
+        """
+        Return the Future of the entry for the key, and True if the caller
+        created it and must compute its Result.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0], False
+            future: Future = Future()
+            self._entries[key] = (future, path)
+            return future, True
+
+    def _failed(self, key: Hashable, future: Future, error: BaseException):
+        with self._lock:
+            if self._entries.get(key, (None,))[0] is future:
+                del self._entries[key]
+        future.set_exception(error)
+
+    def get(self, key: Hashable, compute: Callable[[], Result], path: Optional[str] = None) -> Result:
+        """
+        Return the Result of the first request for the key, calling compute
+        if there was none. An exception raised by compute is raised to every
+        request in flight, and the next request computes the Result again.
+        """
+        future, owner = self._claim(key, path)
+        if owner:
+            try:
+                future.set_result(compute())
+            except BaseException as e:
+                self._failed(key, future, e)
+                raise
+        return future.result()
+
+    async def get_async(
+        self, key: Hashable, compute: Callable[[], Awaitable[Result]], path: Optional[str] = None
+    ) -> Result:
+        """
+        Coroutine variant of get(), awaiting the coroutine returned by compute.
+        """
+        import asyncio
+        future, owner = self._claim(key, path)
+        if owner:
+            try:
+                future.set_result(await compute())
+            except BaseException as e:
+                self._failed(key, future, e)
+                raise
+            return future.result()
+        return await asyncio.wrap_future(future)
+
+    def invalidate(self, path):
+        """
+        Drop the entries for the path and anything below it.
+        """
+        path = str(path)
+        prefix = path.rstrip("/") + "/"
+        with self._lock:
+            for key, (_, entry_path) in list(self._entries.items()):
+                if entry_path is not None and (entry_path == path or entry_path.startswith(prefix)):
+                    del self._entries[key]
+
+    def clear(self):
+        """
+        Drop every entry. Requests in flight still share their Result.
+        """
+        with self._lock:
+            self._entries.clear()
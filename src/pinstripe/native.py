@@ -0,0 +1,100 @@
+"""
+Native implementations of the stat, entity convergence and fact operations,
+equivalent to the shell programs used by the ops. This module only depends
+on the standard library so that it can also run outside of pinstripe.
+"""
+import os
+import pwd
+import shutil
+import stat
+
+
+def stat_path(path: str):
+    """
+    Return (is_link, mode, owner, size) for the path without following
+    symlinks, or None if it does not exist.
+    """
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return None
+    try:
+        owner = pwd.getpwuid(st.st_uid).pw_name
+    except KeyError:
+        owner = "UNKNOWN"
+    return (stat.S_ISLNK(st.st_mode), format(stat.S_IMODE(st.st_mode), "o"), owner, st.st_size)
+
+
+def stat_paths(paths):
+    return {path: stat_path(path) for path in paths}
+
+
+def is_octal_mode(mode) -> bool:
+    return bool(mode) and all(c in "01234567" for c in mode)
+
+
+def ensure(spec: dict) -> dict:
+    """
+    Converge a path to the state described by the spec, which has the keys
+    kind ("file" or "directory"), path, state ("exists" or "absent"), owner,
+    mode and contents. Returns the list of changes along with the mode and
+    owner before and after. Raises OSError if an operation fails.
+    """
+    path = spec["path"]
+    changes = []
+    before = stat_path(path)
+    if spec["state"] == "absent":
+        if before is not None:
+            if spec["kind"] == "directory" and os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            changes.append("removed")
+    else:
+        if before is None:
+            if spec["kind"] == "directory":
+                os.makedirs(path, exist_ok=True)
+            else:
+                open(path, "a").close()
+            changes.append("created")
+        contents = spec.get("contents")
+        if contents and os.path.getsize(path) == 0:
+            with open(path, "w") as f:
+                f.write(str(contents) + "\n")
+            changes.append("contents")
+        owner = spec.get("owner")
+        if owner and stat_path(path)[2] != owner:
+            user, _, group = owner.partition(":")
+            shutil.chown(path, user or None, group or None)
+            changes.append("owner")
+        mode = spec.get("mode")
+        if mode and stat_path(path)[1] != (mode.lstrip("0") or "0"):
+            os.chmod(path, int(mode, 8))
+            changes.append("mode")
+    after = stat_path(path)
+    return {
+        "changes": changes,
+        "mode_before": before[1] if before else None,
+        "owner_before": before[2] if before else None,
+        "mode_after": after[1] if after else None,
+        "owner_after": after[2] if after else None,
+    }
+
+
+def facts() -> dict:
+    """
+    Return the facts gathered by the system fact provider: os, kernel, arch
+    and, when it can be determined, distro.
+    """
+    uname = os.uname()
+    facts = {"os": uname.sysname, "kernel": uname.release, "arch": uname.machine}
+    try:
+        with open("/etc/os-release") as f:
+            for line in f:
+                name, _, value = line.strip().partition("=")
+                if name == "ID":
+                    facts["distro"] = value.strip("\"'")
+    except OSError:
+        if shutil.which("sw_vers"):
+            facts["distro"] = "macos"
+    return facts
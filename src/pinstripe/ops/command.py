@@ -1,4 +1,4 @@
-from typing import Callable, Union
+from typing import Callable, Optional, Union
 
 from .. import graph
 from ..result import Result
@@ -12,6 +12,11 @@ class Command(graph.Node["Command", str]):
     """
     A Node which runs a subprocess and returns the Result of its execution.
     """
+
+    __slots__ = ("command", "_pure")
+
+    JOURNAL = True
+
     def __init__(
         self,
         context,
@@ -22,6 +27,42 @@ class Command(graph.Node["Command", str]):
         label = label or f"Command: {command}"
         super().__init__(context, label=label)
         self.command = command
+        self._pure = False
+
+    def pure(self) -> "Command":
+        """
+        Declare that the command only reads the state of the host, so that
+        identical pure commands of the host run once and share the Result.
+        """
+        self._pure = True
+        return self
+
+    def merge_key(self) -> Optional[tuple]:
+        # Only pure commands can run once for several declarations
+        return self._declaration() if self._pure else None
+
+    def _memo_key(self) -> tuple:
+        command = self.command
+        return ("run", command if type(command) == str else tuple(command))
+
+    def identity(self) -> list:
+        return super().identity() + [self.command]
 
     def execute(self, *dependency_results: Result) -> Result[str]:
-        return self.execute_command(self.command)
+        if self._pure:
+            return self._context.memo.get(self._memo_key(), lambda: self.execute_command(self.command))
+        try:
+            return self.execute_command(self.command)
+        finally:
+            # The command may have changed whatever the memo holds
+            self._context.memo.clear()
+
+    async def execute_async(self, *dependency_results: Result) -> Result[str]:
+        if self._pure:
+            return await self._context.memo.get_async(
+                self._memo_key(), lambda: self.execute_command_async(self.command)
+            )
+        try:
+            return await self.execute_command_async(self.command)
+        finally:
+            self._context.memo.clear()
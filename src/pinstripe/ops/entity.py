@@ -1,11 +1,84 @@
-from functools import cached_property
-from typing import Union
+from typing import Optional, Union
 from pathlib import Path
+import shlex
 
-from .stat import StatInfo
+from .stat import StatInfo, stat_path
 from ..graph import Node, Result
 
+STAT_SCRIPT = """
+_stat() {
+    stat -c '%a %U %s' "$p" 2>/dev/null || stat -f '%Lp %Su %z' "$p" 2>/dev/null
+}
+"""
+"""
+Shell function printing the mode, owner and size of $p with GNU or BSD stat,
+or nothing if the path does not exist.
+"""
+
+class Convergence:
+    """
+    Structured outcome of converging an Entity: the list of changes made,
+    and the mode and owner of the path before and after.
+    """
+    def __init__(
+        self,
+        changes: list[str],
+        mode_before: Optional[str] = None,
+        owner_before: Optional[str] = None,
+        mode_after: Optional[str] = None,
+        owner_after: Optional[str] = None,
+    ):
+        self.changes = changes
+        self.mode_before = mode_before
+        self.owner_before = owner_before
+        self.mode_after = mode_after
+        self.owner_after = owner_after
+
+    @classmethod
+    def parse(cls, lines: list[str]) -> 'Convergence':
+        state: dict[str, list[str]] = {}
+        for line in lines:
+            tokens = line.split()
+            if tokens:
+                state[tokens[0]] = tokens[1:]
+        before = state.get("before", []) + [None, None]
+        after = state.get("after", []) + [None, None]
+        return cls(
+            changes=state.get("changed", []),
+            mode_before=before[0],
+            owner_before=before[1],
+            mode_after=after[0],
+            owner_after=after[1],
+        )
+
+    def __str__(self) -> str:
+        return (
+            f"Convergence(changes={self.changes}, mode={self.mode_before}->{self.mode_after}, "
+            f"owner={self.owner_before}->{self.owner_after})"
+        )
+
 class Entity(Node['Entity', str]):
+    __slots__ = ("_path", "_state", "_owner", "_mode", "_contents_if_empty", "_stat")
+
+    MERGEABLE = True
+
+    JOURNAL = True
+
+    KIND = ""
+    """
+    Kind of entity, as understood by native transports.
+    """
+
+    CREATE_COMMAND = "touch"
+    """
+    Command run with the quoted path to create the entity.
+    """
+
+    REMOVE_COMMAND = "rm -f"
+    """
+    Command run with the quoted path to remove the entity.
+    """
+
     def __init__(self, context, *, path: Path, label=None):
         label = label or f"Entity: {path}"
         super().__init__(context=context, label=label)
@@ -13,6 +86,8 @@ class Entity(Node['Entity', str]):
         self._state = "exists"
         self._owner = None
         self._mode = None
+        self._contents_if_empty = None
+        self._stat: Optional[Result[StatInfo]] = None
 
     def exists(self) -> 'Entity':
         self._state = "exists"
@@ -26,6 +101,7 @@ class Entity(Node['Entity', str]):
         if type(mode) == int:
             mode = oct(mode).replace('o', '')
         self._mode = mode
+        return self
 
     def absent(self) -> 'Entity':
         self._state = "absent"
@@ -35,6 +111,123 @@ class Entity(Node['Entity', str]):
         self._contents_if_empty = contents
         return self
 
-    @cached_property
+    @property
     def stat(self) -> Result[StatInfo]:
-        return self._context.stat(self._path).ignore_failures().wait()
\ No newline at end of file
+        if self._stat is None:
+            self._stat = stat_path(self, self._path)
+        return self._stat
+
+    def identity(self) -> list:
+        return super().identity() + [self.spec()]
+
+    def encode_value(self, value: Optional[Convergence]):
+        return vars(value) if isinstance(value, Convergence) else value
+
+    def decode_value(self, data) -> Optional[Convergence]:
+        return Convergence(**data) if isinstance(data, dict) else data
+
+    def execute(self, *results: Result) -> Result[Convergence]:
+        with self.span(f"stat: {self._path}"):
+            cached = self._context.stat_cache.lookup(self._path, self)
+        if cached and self.is_converged(cached):
+            return self._unchanged(cached)
+        result = self._context.transport.ensure(self.spec())
+        if result is None:
+            result = self.execute_command(self.converge_script())
+        return self._converged(result)
+
+    async def execute_async(self, *results: Result) -> Result[Convergence]:
+        import asyncio
+        loop = asyncio.get_running_loop()
+        with self.span(f"stat: {self._path}"):
+            cached = await loop.run_in_executor(None, self._context.stat_cache.lookup, self._path, self)
+        if cached and self.is_converged(cached):
+            return self._unchanged(cached)
+        result = await loop.run_in_executor(None, self._context.transport.ensure, self.spec())
+        if result is None:
+            result = await self.execute_command_async(self.converge_script())
+        return self._converged(result)
+
+    def is_converged(self, stat: Result[StatInfo]) -> bool:
+        """
+        True if the stat of the path shows that converging would not change
+        anything, in which case no command needs to run.
+        """
+        if self._state == "absent":
+            return not stat.ok
+        if not stat.ok:
+            return False
+        if self._contents_if_empty and stat.value.size == 0:
+            return False
+        if self._owner and self._owner != stat.value.owner:
+            return False
+        if self._mode and self._mode.lstrip("0") != stat.value.mode.lstrip("0"):
+            return False
+        return True
+
+    def _unchanged(self, stat: Result[StatInfo]) -> Result[Convergence]:
+        mode = owner = None
+        if stat.ok:
+            mode = stat.value.mode.lstrip("0") or "0"
+            owner = stat.value.owner
+        return Result(ok=True, value=Convergence([], mode, owner, mode, owner))
+
+    def _converged(self, result: Result) -> Result[Convergence]:
+        self._context.stat_cache.invalidate(self._path)
+        self._context.memo.invalidate(self._path)
+        if not result.ok:
+            return result
+        if not isinstance(result.value, Convergence):
+            result.value = Convergence.parse(result.stdout)
+        result.changed = bool(result.value.changes)
+        return result
+
+    def spec(self) -> dict:
+        """
+        Plain description of the declared state, used by transports which
+        converge entities natively.
+        """
+        return {
+            "kind": self.KIND,
+            "path": str(self._path),
+            "state": self._state,
+            "owner": self._owner,
+            "mode": self._mode,
+            "contents": self._contents_if_empty,
+        }
+
+    def converge_script(self) -> str:
+        """
+        Build a single idempotent shell program which inspects the path,
+        converges it to the declared state and reports what changed.
+        """
+        lines = [f"p={shlex.quote(str(self._path))}", "changed=''", STAT_SCRIPT]
+        lines.append('before=$(_stat)')
+        if self._state == "absent":
+            lines.append(
+                f'if [ -n "$before" ]; then {self.REMOVE_COMMAND} "$p" || exit $?; changed=removed; fi'
+            )
+        else:
+            lines.append(
+                f'if [ -z "$before" ]; then {self.CREATE_COMMAND} "$p" || exit $?; changed=created; fi'
+            )
+            lines.extend(self._converge_contents())
+            if self._owner:
+                owner = shlex.quote(self._owner)
+                lines.append(
+                    f'if [ "$(_stat | cut -d" " -f2)" != {owner} ]; then '
+                    f'chown {owner} "$p" || exit $?; changed="$changed owner"; fi'
+                )
+            if self._mode:
+                mode = shlex.quote(self._mode.lstrip("0") or "0")
+                lines.append(
+                    f'if [ "$(_stat | cut -d" " -f1)" != {mode} ]; then '
+                    f'chmod {shlex.quote(self._mode)} "$p" || exit $?; changed="$changed mode"; fi'
+                )
+        lines.append('echo "before $before"')
+        lines.append('echo "after $(_stat)"')
+        lines.append('echo "changed $changed"')
+        return "\n".join(lines)
+
+    def _converge_contents(self) -> list[str]:
+        return []
\ No newline at end of file
@@ -1,8 +1,11 @@
-from typing import Mapping
+from typing import TYPE_CHECKING, Mapping, Optional
 
 from ..graph import Node
 from ..result import Result
 
+if TYPE_CHECKING:
+    from .facts.cache import FactCache
+
 class FactRegistry(Node['FactRegistry', dict[str, str]]):
     def __init__(self, context):
         super().__init__(context, label="FactRegistry")
@@ -10,6 +13,7 @@ class FactRegistry(Node['FactRegistry', dict[str, str]]):
         self._result_cache: Mapping[str, Result] = {}
         self._needs_facts: set[str] = set()
         self._label = "FactRegistry"
+        self._cache: Optional["FactCache"] = None
 
     def register_provider(self, name: str, provider: Node):
         self._fact_providers[name] = provider
@@ -20,12 +24,19 @@ class FactRegistry(Node['FactRegistry', dict[str, str]]):
     def needs_fact(self, name: str):
         self._needs_facts.add(name)
 
+    def use_cache(self, cache: "FactCache"):
+        """
+        Serve facts from, and record them in, a persistent FactCache.
+        """
+        self._cache = cache
+
     def execute(self) -> Result[dict[str,str]]:
         for name in self._needs_facts:
             if not self.has_provider(name):
                 return Result(ok=False, rc=1, reason=f"No provider found for {name}")
         for name in self._needs_facts:
-            self._fact_providers[name].start()
+            if self.cached(name) is None:
+                self._fact_providers[name].start()
         facts: dict[str, str] = {}
         for name in self._needs_facts:
             value = self.get(name)
@@ -33,12 +44,32 @@ class FactRegistry(Node['FactRegistry', dict[str, str]]):
 
         return Result(ok=True, value=facts)
 
+    def cached(self, name: str) -> Optional[str]:
+        """
+        Return the value of the fact from the persistent cache, if fresh.
+        """
+        if not self._cache:
+            return None
+        return self._cache.get(self._context.host, name)
+
+    def remember(self, name: str, value: str, ttl: int):
+        """
+        Record a freshly gathered fact in the persistent cache.
+        """
+        if self._cache:
+            self._cache.put(self._context.host, name, value, ttl)
+
     def get(self, name: str) -> str:
         if not self.has_provider(name):
             return ""
+        cached = self.cached(name)
+        if cached is not None:
+            return cached
         if name not in self._result_cache:
             self._result_cache[name] = self._fact_providers[name].wait()
         value = self._result_cache[name].value
+        if isinstance(value, dict):
+            value = value.get(name)
         if value is None:
             return ""
         return str(value)
@@ -0,0 +1,81 @@
+from pathlib import Path
+from typing import Optional, Union
+import json
+import os
+import threading
+import time
+
+
+def default_cache_path() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path("~/.cache").expanduser()
+    return Path(base) / "pinstripe" / "facts.json"
+
+
+class FactCache:
+    """
+    Fact values persisted on disk between runs, keyed by host and fact
+    name, each with its own expiry time.
+    """
+
+    def __init__(self, path: Union[str, Path, None] = None, refresh: bool = False) -> None:
+        self.path = Path(path) if path else default_cache_path()
+        """
+        JSON file holding the cache.
+        """
+
+        self.refresh = refresh
+        """
+        True to ignore cached values, which are still replaced by fresh ones.
+        """
+
+        self._lock = threading.Lock()
+        self._dirty: set[str] = set()
+        self._hosts: dict[str, dict[str, dict]] = {}
+        try:
+            with open(self.path) as f:
+                self._hosts = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def get(self, host: str, name: str) -> Optional[str]:
+        """
+        Return the cached value of the fact, or None if it is missing,
+        expired or being refreshed.
+        """
+        if self.refresh:
+            return None
+        with self._lock:
+            entry = self._hosts.get(host, {}).get(name)
+        if not entry or entry["expires"] < time.time():
+            return None
+        return entry["value"]
+
+    def put(self, host: str, name: str, value: str, ttl: float):
+        with self._lock:
+            self._hosts.setdefault(host, {})[name] = {
+                "value": value,
+                "expires": time.time() + ttl,
+            }
+            self._dirty.add(host)
+
+    def save(self):
+        """
+        Write the hosts which changed back to disk, keeping the entries other
+        processes saved for the remaining hosts since the cache was loaded.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                with open(self.path) as f:
+                    hosts = json.load(f)
+            except (OSError, ValueError):
+                hosts = {}
+            for host in self._dirty:
+                hosts[host] = self._hosts[host]
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            staging = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(staging, "w") as f:
+                json.dump(hosts, f)
+            os.replace(staging, self.path)
+            self._dirty.clear()
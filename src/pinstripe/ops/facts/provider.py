@@ -1,28 +1,123 @@
+from typing import Optional, Union
+
 from ..fact_registry import FactRegistry
 from ...graph import Node
 from ...result import Result
 
 class Provider(Node):
+    JOURNAL = True
+
     NAME = ""
     """
     Name of the provider variable to register.
     """
 
+    NAMES: list[str] = []
+    """
+    Names of the facts provided by a single command. When set, the command
+    must print one `name=value` line per fact, and the value of the returned
+    result is a dict of the lowercased values.
+    """
+
     COMMAND = []
     """
     Command arguments to execute. The value of the returned result will be set
     to the first line of output lowercased with whitespace stripped.
     """
 
+    TTL = 86400
+    """
+    Seconds a fact value may be served from the persistent fact cache.
+    """
+
+    TTLS: dict[str, int] = {}
+    """
+    Per-fact overrides of TTL.
+    """
+
     def __init__(self, context, label: str = ""):
-        label = label or f"Provider: {self.NAME} via {self.COMMAND}"
+        label = label or f"Provider: {', '.join(self.names)} via {self.COMMAND}"
         super().__init__(context, label)
+        self._facts: Optional[FactRegistry] = None
+
+    @property
+    def names(self) -> list[str]:
+        return self.NAMES or [self.NAME]
+
+    def identity(self) -> list:
+        return super().identity() + [self.names, self.COMMAND]
+
+    def ttl(self, name: str) -> int:
+        return self.TTLS.get(name, self.TTL)
 
     def register(self, facts: FactRegistry):
-        facts.register_provider(self.NAME, self)
+        self._facts = facts
+        for name in self.names:
+            facts.register_provider(name, self)
+
+    def execute(self) -> Result[Union[str, dict[str, str]]]:
+        return (
+            self._from_cache()
+            or self._from_transport()
+            or self._context.memo.get(self._memo_key(), lambda: self._parse(self.execute_command(self.COMMAND)))
+        )
+
+    async def execute_async(self) -> Result[Union[str, dict[str, str]]]:
+        import asyncio
+        loop = asyncio.get_running_loop()
+
+        async def probe():
+            return self._parse(await self.execute_command_async(self.COMMAND))
+
+        return (
+            self._from_cache()
+            or await loop.run_in_executor(None, self._from_transport)
+            or await self._context.memo.get_async(self._memo_key(), probe)
+        )
+
+    def _memo_key(self) -> tuple:
+        # Providers registered more than once on a host share one probe
+        return ("facts", tuple(self.names), tuple(self.COMMAND))
+
+    def _from_cache(self) -> Optional[Result[Union[str, dict[str, str]]]]:
+        """
+        Return the facts from the persistent cache if all of them are fresh.
+        """
+        if not self._facts:
+            return None
+        facts = {name: self._facts.cached(name) for name in self.names}
+        if None in facts.values():
+            return None
+        return Result(ok=True, reason="cached", value=facts if self.NAMES else facts[self.NAME])
+
+    def _from_transport(self) -> Optional[Result[Union[str, dict[str, str]]]]:
+        """
+        Return the facts gathered natively by the Transport, if it knows
+        all of them.
+        """
+        gathered = self._context.transport.facts(self.names)
+        if gathered is None or any(name not in gathered for name in self.names):
+            return None
+        facts = {name: str(gathered[name]).lower().strip() for name in self.names}
+        self._remember(facts)
+        return Result(ok=True, reason="native", value=facts if self.NAMES else facts[self.NAME])
+
+    def _remember(self, facts: dict[str, str]):
+        if self._facts:
+            for name, value in facts.items():
+                self._facts.remember(name, value, self.ttl(name))
 
-    def execute(self) -> Result[str]:
-        result = self.execute_command(self.COMMAND)
-        if result.ok:
-            result.value = result.stdout[0].lower().strip()
+    def _parse(self, result: Result) -> Result[Union[str, dict[str, str]]]:
+        if not result.ok:
+            return result
+        facts: dict[str, str] = {}
+        if not self.NAMES:
+            result.value = facts[self.NAME] = result.stdout[0].lower().strip()
+        else:
+            for line in result.stdout:
+                name, sep, value = line.partition("=")
+                if sep and name.strip() in self.NAMES:
+                    facts[name.strip()] = value.lower().strip()
+            result.value = facts
+        self._remember(facts)
         return result
@@ -0,0 +1,18 @@
+from .provider import Provider
+
+class SystemProvider(Provider):
+    NAMES = ["os", "kernel", "arch", "distro"]
+    COMMAND = """
+echo "os=$(uname -s)"
+echo "kernel=$(uname -r)"
+echo "arch=$(uname -m)"
+if [ -r /etc/os-release ]; then
+    echo "distro=$(. /etc/os-release && echo "$ID")"
+elif command -v sw_vers >/dev/null 2>&1; then
+    echo "distro=macos"
+fi
+""".strip()
+    TTLS = {"kernel": 3600}
+
+    def __init__(self, context, label: str = ""):
+        super().__init__(context, label or f"Provider: {', '.join(self.NAMES)} via uname")
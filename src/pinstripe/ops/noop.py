@@ -2,5 +2,9 @@ from ..graph import Node
 from ..result import Result
 
 class Noop(Node['Noop', bool]):
+    __slots__ = ()
+
+    INTERNAL = True
+
     def execute(self, *dependency_results: Result) -> Result[bool]:
         return Result(ok=True, value=True, reason="noop")
\ No newline at end of file
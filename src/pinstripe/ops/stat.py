@@ -1,9 +1,30 @@
 from pathlib import Path
+from typing import Iterable, Optional
+import threading
 
 from ..graph import Node
 from ..result import Result
 
 
+STAT_SCRIPT = r"""
+if stat -c %n / >/dev/null 2>&1; then
+    stat --printf '%F\t%a\t%U\t%s\t%n\n' -- "$@"
+else
+    stat -f '%HT%t%Lp%t%Su%t%z%t%N' -- "$@"
+fi
+exit 0
+"""
+"""
+Shell program printing one tab separated line of file type, octal mode,
+owner, size and path for each existing path argument, using GNU or BSD stat.
+"""
+
+STAT_BATCH_SIZE = 1000
+"""
+Maximum number of paths passed to a single stat invocation.
+"""
+
+
 class StatInfo:
     def __init__(self, is_link: bool, mode: str, owner: str, path: str, size: int):
         self.is_link = is_link
@@ -16,45 +37,178 @@ class StatInfo:
         return f"Stat(path={self.path}, size={self.size}, is_link={self.is_link})"
 
 
+def stat_command(paths: Iterable[str]) -> list[str]:
+    return ["/bin/sh", "-c", STAT_SCRIPT, "pinstripe-stat", *paths]
+
+
+def parse_stat(lines: Iterable[str]) -> dict[str, StatInfo]:
+    """
+    Parse the output of STAT_SCRIPT into StatInfo keyed by path.
+    """
+    infos: dict[str, StatInfo] = {}
+    for line in lines:
+        tokens = line.rstrip("\n").split("\t", 4)
+        if len(tokens) != 5:
+            continue
+        filetype, mode, owner, size, path = tokens
+        try:
+            size = int(size)
+        except ValueError:
+            size = -1
+        infos[path] = StatInfo(
+            is_link="symbolic link" in filetype.lower(),
+            mode=mode.zfill(4),
+            owner=owner,
+            path=path,
+            size=size,
+        )
+    return infos
+
+
+def stat_result(path: str, info: Optional[StatInfo]) -> Result[StatInfo]:
+    if info is None:
+        return Result(
+            ok=False,
+            rc=1,
+            reason="Execution failed",
+            value=StatInfo(is_link=False, mode="", owner="", path=path, size=-1),
+        )
+    return Result(ok=True, value=info)
+
+
+def is_unordered(node: Node) -> bool:
+    """
+    True if the Node depends on nothing but the root Node of its Context,
+    so that nothing it waits on can change the host before it runs.
+    """
+    return all(edge.right is node._context.root_node for edge in node._depends_on)
+
+
+def stat_path(node: Node, path) -> Result[StatInfo]:
+    """
+    Stat a path on the host of the Node, sharing the Result with the other
+    requests for the path until a Node changes it.
+    """
+    path = str(path)
+    return node._context.memo.get(("stat", path), lambda: _stat(node, path), path)
+
+
+def _stat(node: Node, path: str) -> Result[StatInfo]:
+    with node.span(f"stat: {path}"):
+        cached = node._context.stat_cache.lookup(path, node)
+    if cached:
+        return cached
+    infos = node._context.transport.stat([path])
+    if infos is not None:
+        return stat_result(path, infos.get(path))
+    stat = node.execute_command(stat_command([path]))
+    info = parse_stat(stat.stdout).get(path)
+    if info is None:
+        stat.ok = False
+        stat.reason = "Execution failed"
+    stat.value = info or stat_result(path, None).value
+    return stat
+
+
+class StatCache(Node['StatCache', int]):
+    """
+    Per-host cache of StatInfo, prefetched with a single batched stat of
+    every path referenced by the File, Directory and Stat nodes of the host
+    which depend on nothing but the root Node. Nodes which run after others
+    may see the effects of those, so they stat their path when they run.
+    """
+
+    INTERNAL = True
+
+    def __init__(self, context):
+        super().__init__(context, label="StatCache")
+        self._entries: dict[str, Optional[StatInfo]] = {}
+        self._invalidated: set[str] = set()
+        self._lock = threading.Lock()
+
+    def paths(self) -> list[str]:
+        """
+        Paths referenced by the nodes of the Context tree which have not
+        finished, e.g. by being restored from a Journal.
+        """
+        paths: dict[str, None] = {}
+        stack = [self._context.root]
+        while stack:
+            context = stack.pop()
+            stack.extend(context.children)
+            for node in context.nodes:
+                path = getattr(node, "_path", None)
+                if path is not None and not node.is_done and is_unordered(node):
+                    paths[str(path)] = None
+        return list(paths)
+
+    def execute(self, *results: Result) -> Result[int]:
+        paths = self.paths()
+        if not paths:
+            return Result(ok=True, value=0)
+        infos = self._context.transport.stat(paths)
+        if infos is None:
+            infos = {}
+            # Paths are batched to stay well below the argument size limit
+            for offset in range(0, len(paths), STAT_BATCH_SIZE):
+                result = self.execute_command(stat_command(paths[offset:offset + STAT_BATCH_SIZE]))
+                if not result.ok:
+                    return result
+                infos.update(parse_stat(result.stdout))
+        with self._lock:
+            for path in paths:
+                if path not in self._invalidated:
+                    self._entries[path] = infos.get(path)
+        return Result(ok=True, value=len(infos))
+
+    def lookup(self, path, node: Node) -> Optional[Result[StatInfo]]:
+        """
+        Return the prefetched stat Result for the path, or None if the path
+        was not prefetched or has since been invalidated, or if the Node
+        asking for it depends on other Nodes, which ran after the prefetch.
+        """
+        if not is_unordered(node):
+            return None
+        self.wait()
+        path = str(path)
+        with self._lock:
+            if path not in self._entries:
+                return None
+            return stat_result(path, self._entries[path])
+
+    def invalidate(self, path):
+        """
+        Drop the cached entries for the path and anything below it.
+        """
+        path = str(path)
+        prefix = path.rstrip("/") + "/"
+        with self._lock:
+            self._invalidated.add(path)
+            for cached in list(self._entries):
+                if cached == path or cached.startswith(prefix):
+                    del self._entries[cached]
+
+
 class Stat(Node['Stat', StatInfo]):
+    __slots__ = ("_path",)
+
+    MERGEABLE = True
+
+    JOURNAL = True
+
     def __init__(self, context, *, path: Path, label: str = ""):
         label = label or f'Stat: {path}'
         super().__init__(context, label=label)
         self._path = path
 
+    def identity(self) -> list:
+        return super().identity() + [str(self._path)]
+
+    def encode_value(self, value: Optional[StatInfo]):
+        return vars(value) if isinstance(value, StatInfo) else value
+
+    def decode_value(self, data) -> Optional[StatInfo]:
+        return StatInfo(**data) if isinstance(data, dict) else data
+
     def execute(self, *results: Result) -> Result[StatInfo]:
-        path = self._path
-        stat = self.execute_command(
-            f"""
-if [ $(uname -s) == "Darwin" ]; then
-    stat -x '{path}';
-else
-    stat '{path}';
-fi
-"""
-        )
-        size = -1
-        is_link = False
-        owner = ""
-        mode = ""
-        for line in stat.stdout:
-            stripped = line.strip()
-            if stripped.startswith("Size:"):
-                try:
-                    size = int(stripped.split()[1])
-                except ValueError:
-                    pass
-            if "FileType: Symbolic Link" in line:
-                is_link = True
-            if stripped.startswith("Mode:") or stripped.startswith("Access:"):
-                tokens = stripped.split()[1]
-                mode = tokens.split("/")[0].lstrip("(")
-            if "Uid: (" in stripped:
-                uidgid = stripped.split("Uid: (")[1].strip()
-                uid = uidgid.split(")")[0].strip()
-                owner = uid.split("/")[1]
-
-        stat.value = StatInfo(
-            is_link=is_link, owner=owner, mode=mode, path=path, size=size
-        )
-        return stat
+        return stat_path(self, self._path)
@@ -0,0 +1,176 @@
+from pathlib import Path
+from typing import Optional
+import hashlib
+import io
+import os
+import shlex
+import sys
+import tarfile
+
+from ..graph import Node, Result
+
+CHECKSUM_SCRIPT = """
+cd {remote} 2>/dev/null || exit 0
+if printf '' | sha256sum -z >/dev/null 2>&1; then
+    xargs -0 sha256sum -z 2>/dev/null
+else
+    if command -v sha256sum >/dev/null 2>&1; then sum=sha256sum; else sum="shasum -a 256"; fi
+    xargs -0 sh -c '
+        for f; do
+            [ -f "$f" ] && d=$($0 < "$f") && printf "%s  %s\\0" "${{d%% *}}" "$f"
+        done
+    ' "$sum" 2>/dev/null
+fi
+exit 0
+"""
+"""
+Shell program printing the SHA-256 checksum and path of each file named on
+its stdin, relative to the remote directory, skipping files which do not
+exist. Paths are read and printed NUL-terminated and unescaped, so that
+they may contain any character. Without `sha256sum -z`, which GNU
+coreutils has, each file is summed from its own stdin and printed by the
+shell.
+"""
+
+EXTRACT_SCRIPT = """
+mkdir -p {remote} && tar -xzf - --no-same-owner -C {remote}
+"""
+"""
+Shell program extracting the compressed tar stream on its stdin into the
+remote directory.
+"""
+
+
+class TreeSync:
+    """
+    Outcome of syncing a tree: the state of each file before the sync,
+    "created", "updated" or "unchanged", keyed by its path relative to
+    the tree.
+    """
+
+    def __init__(self, files: dict[str, str]) -> None:
+        self.files = files
+
+    def paths(self, state: str) -> list[str]:
+        return sorted(path for path, file_state in self.files.items() if file_state == state)
+
+    @property
+    def changed(self) -> list[str]:
+        """
+        Paths of the files which were created or updated.
+        """
+        return sorted(path for path, state in self.files.items() if state != "unchanged")
+
+    def __str__(self) -> str:
+        counts = {state: len(self.paths(state)) for state in ("created", "updated", "unchanged")}
+        return "TreeSync(" + ", ".join(f"{state}={count}" for state, count in counts.items()) + ")"
+
+
+def checksum(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def local_files(root: Path) -> dict[str, Path]:
+    """
+    Regular files below the local root, keyed by their path relative to it
+    with "/" separators, following symbolic links.
+    """
+    files = {}
+    for directory, _, names in os.walk(root, followlinks=True):
+        for name in names:
+            path = Path(directory, name)
+            if path.is_file():
+                files[path.relative_to(root).as_posix()] = path
+    return files
+
+
+def parse_checksums(output: str) -> dict[str, str]:
+    """
+    Checksums printed by CHECKSUM_SCRIPT, keyed by path.
+    """
+    checksums = {}
+    for line in output.split("\0"):
+        digest, sep, rest = line.partition(" ")
+        if sep and rest:
+            # The path follows a space in text mode, or an asterisk in binary mode
+            checksums[rest[1:]] = digest
+    return checksums
+
+
+class Tree(Node['Tree', TreeSync]):
+    """
+    Syncs the files of a local directory to a directory of the host. The
+    checksums of every file on the host are read with one command, and the
+    files which differ are sent together in one compressed tar stream.
+    Files on the host which are not in the local directory are left alone.
+    """
+
+    __slots__ = ("_local", "_remote")
+
+    MERGEABLE = True
+
+    def __init__(self, context, local, remote, label: str = ""):
+        label = label or f"Tree: {local} -> {remote}"
+        super().__init__(context, label=label)
+        self._local = Path(local)
+        self._remote = str(remote)
+        # Every checksum line is needed to tell which files differ
+        self.capture(head=sys.maxsize, tail=0)
+
+    def identity(self) -> list:
+        return super().identity() + [str(self._local), self._remote]
+
+    def encode_value(self, value: Optional[TreeSync]):
+        return value.files if isinstance(value, TreeSync) else value
+
+    def decode_value(self, data) -> Optional[TreeSync]:
+        return TreeSync(data) if isinstance(data, dict) else data
+
+    def execute(self, *results: Result) -> Result[TreeSync]:
+        files = local_files(self._local)
+        if not files:
+            return Result(ok=True, value=TreeSync({}))
+        remote = shlex.quote(self._remote)
+        names = "".join(f"{name}\0" for name in files).encode("utf-8")
+        found = self.execute_command(CHECKSUM_SCRIPT.format(remote=remote), input=names)
+        if not found.ok:
+            return found
+        # Paths may contain newlines, which split the captured lines
+        remote_checksums = parse_checksums("".join(found.stdout))
+        states = {}
+        for name, path in files.items():
+            remote_checksum = remote_checksums.get(name)
+            if remote_checksum is None:
+                states[name] = "created"
+            elif remote_checksum != checksum(path):
+                states[name] = "updated"
+            else:
+                states[name] = "unchanged"
+        sync = TreeSync(states)
+        if not sync.changed:
+            return Result(ok=True, value=sync)
+        archive = self._archive(files, sync.changed)
+        result = self.execute_command(EXTRACT_SCRIPT.format(remote=remote), input=archive)
+        self._context.stat_cache.invalidate(self._remote)
+        self._context.memo.invalidate(self._remote)
+        if not result.ok:
+            return result
+        result.value = sync
+        result.changed = True
+        return result
+
+    def _archive(self, files: dict[str, Path], names: list[str]) -> bytes:
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for name in names:
+                with open(files[name], "rb") as f:
+                    info = archive.gettarinfo(arcname=name, fileobj=f)
+                    # Owned by whoever extracts the stream on the host
+                    info.uid = info.gid = 0
+                    info.uname = info.gname = ""
+                    archive.addfile(info, f)
+        return buffer.getvalue()
@@ -0,0 +1,112 @@
+from collections import deque
+from typing import IO, Callable, Iterable, Optional
+import codecs
+import tempfile
+
+LineCallbackT = Callable[[str, str], None]
+"""
+Callback receiving the stream name ("stdout" or "stderr") and each line.
+"""
+
+
+class Capture:
+    """
+    Settings controlling how much of a command's output is kept in its
+    Result, and where the rest goes.
+    """
+
+    DEFAULT_HEAD = 1000
+    DEFAULT_TAIL = 1000
+
+    def __init__(
+        self,
+        head: int = DEFAULT_HEAD,
+        tail: int = DEFAULT_TAIL,
+        spill: bool = False,
+        on_line: Optional[LineCallbackT] = None,
+    ) -> None:
+        self.head = head
+        """
+        Number of lines kept from the start of each stream.
+        """
+
+        self.tail = tail
+        """
+        Number of lines kept from the end of each stream.
+        """
+
+        self.spill = spill
+        """
+        True to write the full output of each stream to a temp file.
+        """
+
+        self.on_line = on_line
+        """
+        Optional callback invoked for every line as it is read.
+        """
+
+
+class OutputBuffer:
+    """
+    Bounded record of one output stream: the first `head` lines, a ring
+    buffer of the last `tail` lines, and a count of the lines dropped
+    in between.
+    """
+
+    def __init__(self, name: str, capture: Capture) -> None:
+        self.name = name
+        self._capture = capture
+        self._head: list[str] = []
+        self._tail: deque[str] = deque(maxlen=max(0, capture.tail))
+        self.dropped = 0
+        self.path: Optional[str] = None
+        self._spill: Optional[IO[str]] = None
+        if capture.spill:
+            self._spill = tempfile.NamedTemporaryFile(
+                "w", prefix="pinstripe-", suffix=f".{name}", delete=False, encoding="utf-8"
+            )
+            self.path = self._spill.name
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._partial = ""
+
+    def append(self, line: str):
+        if self._spill:
+            self._spill.write(line)
+        if self._capture.on_line:
+            self._capture.on_line(self.name, line)
+        if len(self._head) < self._capture.head:
+            self._head.append(line)
+            return
+        if self._tail.maxlen and len(self._tail) == self._tail.maxlen:
+            self.dropped += 1
+        elif not self._tail.maxlen:
+            self.dropped += 1
+            return
+        self._tail.append(line)
+
+    def extend(self, lines: Iterable[str]):
+        for line in lines:
+            self.append(line)
+
+    def feed(self, chunk: bytes):
+        """
+        Append raw bytes, splitting them into lines.
+        """
+        text = self._partial + self._decoder.decode(chunk, final=not chunk)
+        lines = text.splitlines(keepends=True)
+        self._partial = ""
+        if lines and not lines[-1].endswith(("\n", "\r")) and chunk:
+            self._partial = lines.pop()
+        self.extend(lines)
+
+    def close(self):
+        if self._partial:
+            self.append(self._partial)
+            self._partial = ""
+        if self._spill:
+            self._spill.close()
+            self._spill = None
+
+    @property
+    def lines(self) -> list[str]:
+        return self._head + list(self._tail)
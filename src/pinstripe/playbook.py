@@ -1,4 +1,104 @@
+from pathlib import Path
+from typing import Callable, Optional, Union
+import configparser
+import importlib
+import sys
+
 PLAYBOOKS = {}
 
+PlaybookRefs = dict[str, tuple[str, Optional[str]]]
+
+PLAYBOOK_REFS: PlaybookRefs = {}
+"""
+Playbooks found by discover(), as a "module:function" reference and the
+directory to import the module from, loaded only when they are run.
+"""
+
+_LOADED: dict[tuple[str, Optional[str]], Callable] = {}
+"""
+Playbook functions imported by load_playbook(), keyed by their reference
+and directory rather than their name, which each manifest may map to a
+different function.
+"""
+
+ENTRY_POINT_GROUP = "pinstripe.playbooks"
+
+MANIFEST_NAME = "pinstripe.cfg"
+
 def playbook(name, fn):
-    PLAYBOOKS[name] = fn
\ No newline at end of file
+    PLAYBOOKS[name] = fn
+
+def discover(manifest: Union[str, Path, None] = None, refs: Optional[PlaybookRefs] = None) -> PlaybookRefs:
+    """
+    Find the playbooks declared by installed packages in the
+    "pinstripe.playbooks" entry point group, and in the [playbooks]
+    section of a manifest (pinstripe.cfg in the current directory by
+    default) as `name = module:function` lines, where modules are imported
+    relative to the manifest. Nothing is imported until a playbook is run.
+
+    The playbooks are added to `refs`, PLAYBOOK_REFS by default, which is
+    returned; a daemon passes a registry of each run's own.
+    """
+    if refs is None:
+        refs = PLAYBOOK_REFS
+    for name, ref in _entry_points(ENTRY_POINT_GROUP):
+        refs.setdefault(name, (ref, None))
+
+    path = Path(manifest) if manifest else Path(MANIFEST_NAME)
+    if not path.is_file():
+        return refs
+    parser = configparser.ConfigParser()
+    parser.read(path)
+    if parser.has_section("playbooks"):
+        directory = str(path.resolve().parent)
+        for name, ref in parser.items("playbooks"):
+            refs[name] = (ref, directory)
+    return refs
+
+def _entry_points(group: str) -> list[tuple[str, str]]:
+    """
+    Entry points of the group declared by the distributions on sys.path.
+    The metadata files are read directly, as importing importlib.metadata
+    takes longer than listing playbooks otherwise does.
+    """
+    found = []
+    for entry in sys.path:
+        directory = Path(entry or ".")
+        if not directory.is_dir():
+            continue
+        for metadata in ("*.dist-info", "*.egg-info"):
+            for path in directory.glob(f"{metadata}/entry_points.txt"):
+                parser = configparser.ConfigParser(delimiters=("=",), interpolation=None)
+                parser.optionxform = str
+                try:
+                    parser.read(path)
+                except configparser.Error:
+                    continue
+                if parser.has_section(group):
+                    found.extend(parser.items(group))
+    return found
+
+def playbook_names(refs: Optional[PlaybookRefs] = None) -> list[str]:
+    return sorted(set(PLAYBOOKS) | set(PLAYBOOK_REFS if refs is None else refs))
+
+def load_playbook(name: str, refs: Optional[PlaybookRefs] = None) -> Optional[Callable]:
+    """
+    Return the playbook function registered under the name, or discovered
+    under it in `refs` (PLAYBOOK_REFS by default), importing its module if
+    needed.
+    """
+    if refs is None:
+        refs = PLAYBOOK_REFS
+    if name in PLAYBOOKS or name not in refs:
+        return PLAYBOOKS.get(name)
+    key = refs[name]
+    if key not in _LOADED:
+        ref, directory = key
+        module_name, _, attr = ref.partition(":")
+        if directory and directory not in sys.path:
+            sys.path.insert(0, directory)
+        fn = importlib.import_module(module_name.strip())
+        for part in attr.strip().split("."):
+            fn = getattr(fn, part)
+        _LOADED[key] = fn
+    return _LOADED[key]
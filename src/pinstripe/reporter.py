@@ -0,0 +1,122 @@
+from typing import IO, Optional
+import queue
+import sys
+
+from .events import EventBus, NodeEvent, QUEUED, WAITING, RUNNING, FINISHED, SPAN_BEGIN, SPAN_END
+from .graph import Node
+from .result import Result
+
+_PRODUCER_DONE = object()
+
+
+def node_outcome(node: Node, result: Result) -> str:
+    if result.skipped:
+        return "SKIPPED"
+    if result.ok:
+        return "OK"
+    if node.can_fail:
+        return "SOFT-FAILED"
+    return "FAILED"
+
+
+def is_reported(node: Node, result: Optional[Result] = None) -> bool:
+    """
+    True if the Node is shown to the user, given its Result once finished:
+    internal Nodes only once they have failed.
+    """
+    if not node.INTERNAL:
+        return True
+    return result is not None and node_outcome(node, result) == "FAILED"
+
+
+class ProgressReporter:
+    """
+    Prints a status line for each finished Node and a summary of the run,
+    keeping counters up to date from the state transitions published on an
+    EventBus rather than by polling every Node.
+    """
+
+    def __init__(self, events: EventBus, out: Optional[IO[str]] = None) -> None:
+        self.out = out or sys.stdout
+        self._queue: "queue.SimpleQueue[NodeEvent]" = queue.SimpleQueue()
+        events.listen(self._queue.put)
+        self.num_scheduled = 0
+        self.num_finished = 0
+        self._producers = 0
+        self.counts = {
+            WAITING: 0,
+            RUNNING: 0,
+            "FAILED": 0,
+            "SOFT-FAILED": 0,
+            "OK": 0,
+            "CHANGED": 0,
+            "SKIPPED": 0,
+        }
+
+    @property
+    def is_finished(self) -> bool:
+        return not self._producers and self.num_finished >= self.num_scheduled
+
+    def expect(self, producers: int):
+        """
+        Keep reporting until producer_done has been called for each of the
+        given number of producers, such as worker processes, which publish
+        events from elsewhere.
+        """
+        self._producers += producers
+
+    def producer_done(self):
+        self._queue.put(_PRODUCER_DONE)
+
+    def run(self):
+        """
+        Report events until every scheduled Node has finished.
+        """
+        self._drain()
+        while not self.is_finished:
+            self.print_stats()
+            self.handle(self._queue.get())
+            self._drain()
+        self.print_stats()
+
+    def _drain(self):
+        while True:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self.handle(event)
+
+    def handle(self, event: NodeEvent):
+        if event is _PRODUCER_DONE:
+            self._producers -= 1
+            return
+        if event.state in (SPAN_BEGIN, SPAN_END):
+            return
+        if event.state == QUEUED:
+            self.num_scheduled += 1
+        elif event.state == FINISHED:
+            self.num_finished += 1
+        if not is_reported(event.node, event.node._result if event.state == FINISHED else None):
+            return
+        if event.previous in (WAITING, RUNNING) and not event.node.INTERNAL:
+            self.counts[event.previous] -= 1
+        if event.state in (WAITING, RUNNING):
+            self.counts[event.state] += 1
+        elif event.state == FINISHED:
+            result = event.node._result
+            status = node_outcome(event.node, result)
+            self.counts[status] += 1
+            if result.changed:
+                status = "CHANGED"
+                self.counts[status] += 1
+            print(f"[{status}] {event.node} {result}", file=self.out)
+
+    def print_stats(self):
+        counts = self.counts
+        print(
+            f"Running: {counts[RUNNING]}, Waiting: {counts[WAITING]}, Failed: {counts['FAILED']}, "
+            f"Soft Failed: {counts['SOFT-FAILED']}, OK: {counts['OK']}, Changed: {counts['CHANGED']}, "
+            f"Skipped: {counts['SKIPPED']}",
+            file=self.out,
+        )
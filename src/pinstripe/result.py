@@ -2,6 +2,11 @@ from typing import Optional, TypeVar, Generic
 T = TypeVar("T")
 
 class Result(Generic[T]):
+    __slots__ = (
+        "ok", "rc", "changed", "skipped", "reason", "stdout", "stderr", "value",
+        "stdout_dropped", "stderr_dropped", "stdout_path", "stderr_path",
+    )
+
     def __init__(
         self,
         ok: bool,
@@ -11,7 +16,11 @@ class Result(Generic[T]):
         skipped: bool = False,
         stdout: Optional[list[str]] = None,
         stderr: Optional[list[str]] = None,
-        value: Optional[T] = None
+        value: Optional[T] = None,
+        stdout_dropped: int = 0,
+        stderr_dropped: int = 0,
+        stdout_path: Optional[str] = None,
+        stderr_path: Optional[str] = None,
     ) -> None:
         self.ok = ok
         self.rc = rc
@@ -21,6 +30,28 @@ class Result(Generic[T]):
         self.stdout = stdout or []
         self.stderr = stderr or []
         self.value = value
+        self.stdout_dropped = stdout_dropped
+        self.stderr_dropped = stderr_dropped
+        self.stdout_path = stdout_path
+        self.stderr_path = stderr_path
 
     def __str__(self) -> str:
         return f"(ok={self.ok}, changed={self.changed}, value={self.value})"
+
+    def summary(self) -> "Result[T]":
+        """
+        Copy of the Result without its captured output, counting the lines
+        left out as dropped.
+        """
+        return Result(
+            ok=self.ok,
+            changed=self.changed,
+            rc=self.rc,
+            reason=self.reason,
+            skipped=self.skipped,
+            value=self.value,
+            stdout_dropped=self.stdout_dropped + len(self.stdout),
+            stderr_dropped=self.stderr_dropped + len(self.stderr),
+            stdout_path=self.stdout_path,
+            stderr_path=self.stderr_path,
+        )
@@ -0,0 +1,139 @@
+from typing import Collection, Iterable, Iterator, Optional, Union
+import itertools
+import math
+
+CountT = Union[int, str, None]
+"""
+A number of hosts, or a percentage of the hosts of a group such as "10%".
+"""
+
+
+def parse_count(value: CountT) -> CountT:
+    """
+    Validate a count given as an int, a digit string or a percentage,
+    raising ValueError otherwise.
+    """
+    if value is None or type(value) == int:
+        if value is not None and value < 0:
+            raise ValueError(f"Count must not be negative: {value}")
+        return value
+    text = str(value).strip()
+    if text.endswith("%"):
+        percent = float(text[:-1])
+        if not 0 <= percent <= 100:
+            raise ValueError(f"Percentage must be between 0% and 100%: {value}")
+        return text
+    return parse_count(int(text))
+
+
+def resolve_count(value: CountT, total: int) -> Optional[int]:
+    """
+    Number of hosts a count stands for in a group of `total` hosts.
+    """
+    if value is None:
+        return None
+    if type(value) == str:
+        return math.floor(total * float(value[:-1]) / 100)
+    return value
+
+
+class Rollout:
+    """
+    Limits on how the hosts of a group are converged: in batches which each
+    finish before the next one starts, with at most `max_in_flight` hosts
+    running at once, and no new hosts started once more than
+    `max_failures` hosts have failed.
+    """
+
+    def __init__(
+        self,
+        batch_size: CountT = None,
+        max_in_flight: CountT = None,
+        max_failures: CountT = None,
+    ) -> None:
+        self.batch_size = parse_count(batch_size)
+        """
+        Hosts per batch, or None for a single batch.
+        """
+
+        self.max_in_flight = parse_count(max_in_flight)
+        """
+        Maximum number of hosts running at once, or None for no limit.
+        """
+
+        self.max_failures = parse_count(max_failures)
+        """
+        Number of failed hosts tolerated before no more hosts are started,
+        or None to always start every host.
+        """
+
+    @property
+    def is_limited(self) -> bool:
+        return (self.batch_size, self.max_in_flight, self.max_failures) != (None, None, None)
+
+    def merged(self, other: "Rollout") -> "Rollout":
+        """
+        Copy of this Rollout with the limits set on the other one replacing
+        its own.
+        """
+        return Rollout(
+            batch_size=self.batch_size if other.batch_size is None else other.batch_size,
+            max_in_flight=self.max_in_flight if other.max_in_flight is None else other.max_in_flight,
+            max_failures=self.max_failures if other.max_failures is None else other.max_failures,
+        )
+
+    def split(self, parts: int, total: int) -> list["Rollout"]:
+        """
+        Rollouts applied to each of `parts` shards of a group of `total`
+        hosts, the first shards being the largest, so that the batch size
+        and hosts in flight of the shards add up to those of the group.
+        Counts are shared out with the remainder going to the first shards,
+        and percentages already scale with the size of each shard. Raises
+        ValueError if a count is lower than `parts`, which would leave shards
+        without any.
+
+        Failures cannot be shared out, so every shard gets the failure limit
+        of the whole group, which a shard exceeds on its own only if the
+        group does; the caller counts the failed hosts of every shard to
+        stop them all.
+        """
+        def shares(name: str, value: CountT) -> list[CountT]:
+            if type(value) != int:
+                return [value] * parts
+            if value < parts:
+                raise ValueError(f"{name} of {value} is lower than the number of shards ({parts})")
+            return [value // parts + (index < value % parts) for index in range(parts)]
+        failure_limit = self.failure_limit(total)
+        return [
+            Rollout(batch_size, max_in_flight, failure_limit)
+            for batch_size, max_in_flight in zip(
+                shares("Batch size", self.batch_size), shares("Hosts in flight", self.max_in_flight)
+            )
+        ]
+
+    def batches(self, hosts: Collection[str]) -> Iterator[Iterable[str]]:
+        """
+        Batches of the hosts, taken from the hosts as each batch is
+        reached, so that a group of patterns is expanded lazily.
+        """
+        total = len(hosts)
+        size = resolve_count(self.batch_size, total)
+        if size is None:
+            if total:
+                yield hosts
+            return
+        # A percentage of a small group still converges one host at a time
+        size = max(1, size)
+        remaining = iter(hosts)
+        for _ in range(0, total, size):
+            yield list(itertools.islice(remaining, size))
+
+    def in_flight(self, total: int) -> int:
+        """
+        Maximum number of hosts running at once, out of a group of `total`.
+        """
+        limit = resolve_count(self.max_in_flight, total)
+        return max(1, limit) if limit is not None else max(1, total)
+
+    def failure_limit(self, total: int) -> Optional[int]:
+        return resolve_count(self.max_failures, total)
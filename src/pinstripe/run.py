@@ -0,0 +1,394 @@
+from argparse import Namespace
+from typing import TYPE_CHECKING, Callable, Iterable, Optional
+import queue
+import threading
+import time
+
+from .cancellation import Cancellation
+from .compiler import GraphCycleError, compile_graph, merge_duplicates
+from .context import Context
+from .events import EventBus, NodeEvent, FINISHED
+from .graph import Graph, Node
+from .journal import Journal
+from .reporter import node_outcome
+from .rollout import Rollout
+from .scheduler import Scheduler, make_scheduler
+from .store import ResultStore
+from .ssh import SshConnectionPool
+from .transport import LocalTransport
+from .ops.facts.cache import FactCache
+from .ops.facts.system import SystemProvider
+
+if TYPE_CHECKING:
+    from .agent_transport import AgentTransport
+
+
+def fail_fast_reason(limit: int) -> str:
+    return f"Stopped after {limit} failed nodes"
+
+
+class FailFast:
+    """
+    EventBus listener cancelling a run once `limit` Nodes have failed.
+    """
+
+    def __init__(self, limit: int, cancellation: Cancellation) -> None:
+        self.limit = limit
+        self.cancellation = cancellation
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, event: NodeEvent):
+        if event.state != FINISHED or node_outcome(event.node, event.node._result) != "FAILED":
+            return
+        with self._lock:
+            self._failures += 1
+            if self._failures < self.limit:
+                return
+        self.cancellation.cancel()
+
+
+class PlaybookRun:
+    """
+    The scheduler, connections and fact cache used to run a playbook over a
+    set of hosts, configured from the parsed command line options.
+    """
+
+    def __init__(
+        self,
+        playbook_fn: Callable[[Context], None],
+        hosts: Iterable[str],
+        options: Namespace,
+        events: EventBus,
+        journal: Optional[Journal] = None,
+        cancellation: Optional[Cancellation] = None,
+        results: Optional[ResultStore] = None,
+        scheduler: Optional[Scheduler] = None,
+        ssh_pool: Optional[SshConnectionPool] = None,
+        fact_cache: Optional[FactCache] = None,
+        stop: Optional[Cancellation] = None,
+    ) -> None:
+        self.playbook_fn = playbook_fn
+        # Hosts given as patterns or a file are expanded lazily as they start
+        self.hosts = hosts if hasattr(hosts, "__len__") else list(hosts)
+        self.events = events
+        self.journal = journal
+        """
+        Journal recording the Nodes which finish, and restoring those an
+        earlier run of the playbook completed.
+        """
+
+        self.results = results
+        """
+        Store receiving the full Result of every finished Node.
+        """
+
+        self.retain = options.retain
+        """
+        Which finished Nodes keep their full Result in memory: "all",
+        "summary" to reduce successful Results to summaries once their
+        dependents have read them, or "failed" to also release the Nodes of
+        each finished host except those which failed.
+        """
+
+        # A daemon shares its scheduler, connections and facts between runs
+        self.scheduler = scheduler or make_scheduler(options.scheduler, options.workers)
+        self._owns_ssh_pool = ssh_pool is None
+        self.ssh_pool = ssh_pool or SshConnectionPool(
+            idle_timeout=options.ssh_idle_timeout,
+            max_channels=options.ssh_max_channels,
+            ssh_command=options.ssh_command,
+        )
+        self.fact_cache = fact_cache or FactCache(options.fact_cache, refresh=options.refresh_facts)
+        self.node_timeout = options.node_timeout
+        self.host_timeout = options.host_timeout
+        if cancellation is None:
+            cancellation = Cancellation()
+            if options.fail_fast:
+                cancellation.reason = fail_fast_reason(options.fail_fast)
+                events.listen(FailFast(options.fail_fast, cancellation))
+        self.cancellation = cancellation
+        """
+        Cancels the Nodes not yet running and the hosts not yet started,
+        once a fail fast limit is reached. A Cancellation given by the caller
+        is cancelled by the caller, e.g. when it shares it with other
+        processes of the run.
+        """
+        self.stop = stop
+        """
+        Cancelled by the caller to stop starting hosts, leaving the running
+        hosts to finish, e.g. once the failed hosts of every process of the
+        run exceed the failure limit of the Rollout.
+        """
+        self.agent_python = options.agent_python if options.agent else None
+        self.agents: list["AgentTransport"] = []
+        self.graph = Graph()
+        """
+        Owner of the Nodes of every host.
+        """
+
+        self.failed_hosts: list[str] = []
+        """
+        Hosts with a failed Node, as counted by a Rollout.
+        """
+
+        self.not_started: list[str] = []
+        """
+        Hosts left out once a Rollout exceeded its failure limit, or the run
+        was cancelled.
+        """
+
+        self.stopped = False
+        """
+        True once a Rollout exceeded its failure limit, or the run was
+        cancelled before every host started.
+        """
+
+        self.errors: list[str] = []
+        """
+        Hosts whose playbook could not be compiled, with the reason.
+        """
+
+        self._driver: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._tracking = self.retain == "failed"
+        self._rolling = False
+        self._host_nodes: dict[str, list[Node]] = {}
+        self._consumers: dict[Node, list] = {}
+        self._remaining: dict[str, int] = {}
+        self._failed: dict[str, bool] = {}
+        self._completed: "queue.SimpleQueue[str]" = queue.SimpleQueue()
+
+    def start(self, rollout: Optional[Rollout] = None):
+        """
+        Build the playbook of each host in the background, starting its Nodes
+        in priority order as soon as it is built, so that the first hosts
+        converge while the playbooks of the rest are still being built.
+        Hosts whose Nodes depend on each other are recorded in `errors`.
+
+        With a limited Rollout, hosts are instead started as earlier hosts
+        finish.
+        """
+        if self.journal:
+            self.events.listen(self.journal.record)
+        if self.results:
+            self.events.listen(self.results.record)
+        if rollout and rollout.is_limited:
+            self._tracking = self._rolling = True
+            target, args = self._roll, (rollout,)
+        else:
+            target, args = self._stream, ()
+        if self._tracking:
+            self.events.listen(self._track)
+        if self.retain != "all":
+            # After the listeners which read the full Result
+            self.events.listen(self._compact)
+        self._driver = threading.Thread(target=target, args=args, daemon=True)
+        self._driver.start()
+
+    def _build(self, host: str):
+        if host == "localhost":
+            transport = LocalTransport()
+        elif self.agent_python:
+            from .agent_transport import AgentTransport
+            transport = AgentTransport(
+                self.ssh_pool.transport(host), python=self.agent_python, connect_timeout=self.ssh_pool.connect_timeout
+            )
+            self.agents.append(transport)
+        else:
+            transport = self.ssh_pool.transport(host)
+        deadline = time.monotonic() + self.host_timeout if self.host_timeout else None
+        context = Context(
+            host=host, scheduler=self.scheduler, transport=transport, events=self.events, graph=self.graph,
+            deadline=deadline, node_timeout=self.node_timeout, cancellation=self.cancellation,
+        )
+        SystemProvider(context).register(context.facts)
+        context.facts.use_cache(self.fact_cache)
+        self.playbook_fn(context)
+
+    def _start_host(self, host: str) -> bool:
+        """
+        Build and start the Nodes of a host, returning False if its graph
+        cannot be compiled.
+        """
+        first = len(self.graph.nodes)
+        self._build(host)
+        self.graph.nodes[first:] = merge_duplicates(self.graph.nodes[first:])
+        try:
+            compiled = compile_graph(self.graph.nodes[first:])
+        except GraphCycleError as e:
+            # Never started, so dropped rather than waited on
+            del self.graph.nodes[first:]
+            self.errors.append(f"{host}: {e}")
+            return False
+        compiled.prioritize()
+        if self.retain != "all":
+            self._count_consumers(compiled.nodes)
+        if self._tracking:
+            with self._lock:
+                self._remaining[host] = len(compiled.nodes)
+                self._failed[host] = False
+        if self.retain == "failed":
+            # Held by the run until the host finishes, rather than the Graph
+            with self._lock:
+                self._host_nodes[host] = compiled.nodes
+            del self.graph.nodes[first:]
+        if self.journal:
+            self.journal.restore(compiled.nodes)
+        for node in compiled.start_order():
+            node.start()
+        return True
+
+    def _track(self, event: NodeEvent):
+        if event.state != FINISHED:
+            return
+        node: Node = event.node
+        host = node._context.host
+        with self._lock:
+            if host not in self._remaining:
+                return
+            if node_outcome(node, node._result) == "FAILED":
+                self._failed[host] = True
+            self._remaining[host] -= 1
+            if self._remaining[host]:
+                return
+            del self._remaining[host]
+            if not self._rolling:
+                del self._failed[host]
+        if self.retain == "failed":
+            self._release(host)
+        if self._rolling:
+            self._completed.put(host)
+
+    def _release(self, host: str):
+        """
+        Drop the Nodes of a finished host, except those which failed.
+        """
+        with self._lock:
+            nodes = self._host_nodes.pop(host, ())
+            failed = [
+                node for node in nodes
+                if node._result is not None and node_outcome(node, node._result) == "FAILED"
+            ]
+            if failed:
+                self._host_nodes[host] = failed
+        if nodes:
+            nodes[0]._context.detach_nodes()
+
+    def _count_consumers(self, nodes: list[Node]):
+        """
+        Count the Nodes which read the Result of each Node, so that it can
+        be compacted once they have all finished.
+        """
+        with self._lock:
+            for node in nodes:
+                self._consumers.setdefault(node, [0, False])
+                for edge in node._depends_on:
+                    for dependency in edge.dependencies():
+                        if isinstance(dependency, Node):
+                            self._consumers.setdefault(dependency, [0, False])[0] += 1
+
+    def _compact(self, event: NodeEvent):
+        """
+        Replace the successful Results which no Node is left to read with
+        summaries without their output.
+        """
+        if event.state != FINISHED:
+            return
+        node: Node = event.node
+        compact = []
+        with self._lock:
+            for edge in node._depends_on:
+                for dependency in edge.dependencies():
+                    entry = self._consumers.get(dependency)
+                    if entry is None:
+                        continue
+                    entry[0] -= 1
+                    if entry[0] <= 0 and entry[1]:
+                        del self._consumers[dependency]
+                        compact.append(dependency)
+            entry = self._consumers.get(node)
+            if entry is not None:
+                # Published once the listeners reading the full Result have run
+                entry[1] = True
+                if entry[0] <= 0:
+                    del self._consumers[node]
+                    compact.append(node)
+        for node in compact:
+            result = node._result
+            if result.ok:
+                node._result = result.summary()
+
+    def _stream(self):
+        hosts = iter(self.hosts)
+        for host in hosts:
+            if self._halted():
+                self.stopped = True
+                self.not_started = [host, *hosts]
+                return
+            if not self._start_host(host):
+                self.failed_hosts.append(host)
+
+    def _roll(self, rollout: Rollout):
+        total = len(self.hosts)
+        in_flight = rollout.in_flight(total)
+        failure_limit = rollout.failure_limit(total)
+        batches = rollout.batches(self.hosts)
+        for batch in batches:
+            pending = iter(batch)
+            host = next(pending, None)
+            running = 0
+            while host is not None or running:
+                if self._halted():
+                    self.stopped = True
+                while host is not None and running < in_flight and not self.stopped:
+                    if self._start_host(host):
+                        running += 1
+                    else:
+                        self._host_failed(host, failure_limit)
+                    host = next(pending, None)
+                if not running:
+                    break
+                finished = self._completed.get()
+                running -= 1
+                with self._lock:
+                    failed = self._failed.pop(finished)
+                if failed:
+                    self._host_failed(finished, failure_limit)
+            if self.stopped:
+                rest = [] if host is None else [host, *pending]
+                self.not_started = rest + [host for batch in batches for host in batch]
+                return
+
+    def _halted(self) -> bool:
+        return self.cancellation.is_cancelled or (self.stop is not None and self.stop.is_cancelled)
+
+    def _host_failed(self, host: str, failure_limit: Optional[int]):
+        self.failed_hosts.append(host)
+        if failure_limit is not None and len(self.failed_hosts) > failure_limit:
+            self.stopped = True
+
+    def wait(self):
+        """
+        Wait for every Node of the run to finish.
+        """
+        if self._driver:
+            self._driver.join()
+        for node in self.graph.nodes:
+            node.wait()
+        with self._lock:
+            hosts = list(self._host_nodes.values())
+        for nodes in hosts:
+            for node in nodes:
+                node.wait()
+
+    def close(self):
+        for agent in self.agents:
+            agent.close()
+        if self.journal:
+            self.journal.close()
+        if self.results:
+            self.results.close()
+        self.fact_cache.save()
+        if self._owns_ssh_pool:
+            self.ssh_pool.close()
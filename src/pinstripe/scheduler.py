@@ -0,0 +1,321 @@
+from typing import TYPE_CHECKING, Optional
+import itertools
+import math
+import queue
+import threading
+
+if TYPE_CHECKING:
+    import asyncio
+    from .graph import Node
+
+
+class Scheduler:
+    """
+    Decides when and on which thread a Node runs. Nodes call start() on
+    their Context's scheduler and notify it through finished() once their
+    Result has been set.
+    """
+
+    def start(self, node: "Node"):
+        raise NotImplementedError()
+
+    def finished(self, node: "Node"):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class ThreadScheduler(Scheduler):
+    """
+    Runs every Node on its own thread, which blocks while waiting on the
+    dependency edges of the Node.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    def start(self, node: "Node"):
+        with self._lock:
+            if not node._mark_scheduled():
+                return
+        for edge in node._depends_on:
+            for dependency in edge.dependencies():
+                dependency.start()
+        threading.Thread(target=node.run, daemon=True).start()
+
+
+class PoolScheduler(Scheduler):
+    """
+    Runs Nodes on a fixed-size pool of worker threads. A Node is only
+    queued once all of its dependencies have finished, so workers never
+    sit idle waiting on edges. Ready Nodes with the highest priority, i.e.
+    the longest chain of dependents, are run first.
+    """
+
+    DEFAULT_WORKERS = 16
+
+    def __init__(self, workers: int = DEFAULT_WORKERS) -> None:
+        self.workers = max(1, workers)
+        """
+        Maximum number of worker threads.
+        """
+
+        self._queue: "queue.PriorityQueue[tuple[float, int, Optional[Node]]]" = queue.PriorityQueue()
+        """
+        Nodes whose dependencies have all finished, keyed by descending
+        priority and then submission order.
+        """
+
+        self._sequence = itertools.count()
+
+        self._lock = threading.Lock()
+        """
+        Lock guarding the pending counts and dependents of scheduled Nodes.
+        """
+
+        self._threads: list[threading.Thread] = []
+        """
+        Worker threads, created lazily as Nodes become ready.
+        """
+
+        self._local = threading.local()
+        """
+        Finished Nodes whose dependents are yet to be released by the
+        current thread, which skipping dependents adds to.
+        """
+
+    def start(self, node: "Node"):
+        """
+        Schedule the Node and all of its transitive dependencies, queueing
+        those that are ready to run.
+        """
+        ready: list["Node"] = []
+        stack = [node]
+        with self._lock:
+            while stack:
+                cursor = stack.pop()
+                if not cursor._mark_scheduled():
+                    continue
+                pending = 0
+                for edge in cursor._depends_on:
+                    for dependency in edge.dependencies():
+                        if dependency.is_done:
+                            continue
+                        pending += 1
+                        dependency.add_dependent(cursor)
+                        stack.append(dependency)
+                cursor._pending = pending
+                if not pending:
+                    ready.append(cursor)
+        for cursor in ready:
+            self._submit(cursor)
+
+    def finished(self, node: "Node"):
+        backlog = getattr(self._local, "backlog", None)
+        if backlog is not None:
+            # Skipping a dependent finishes it on this thread, so release its
+            # own dependents in the loop below rather than recursing
+            backlog.append(node)
+            return
+        self._local.backlog = backlog = [node]
+        try:
+            while backlog:
+                self._release(backlog.pop())
+        finally:
+            self._local.backlog = None
+
+    def _release(self, node: "Node"):
+        """
+        Queue the dependents of a finished Node which are now ready, and
+        skip at once those with an edge to it whose predicate fails.
+        """
+        dependents: list[tuple["Node", bool]] = []
+        with self._lock:
+            for dependent in node._dependents:
+                dependent._pending -= 1
+                dependents.append((dependent, not dependent._pending))
+            node._dependents = ()
+        for dependent, ready in dependents:
+            if dependent.is_done:
+                continue
+            edge = _failed_edge(dependent, node)
+            if edge is not None:
+                dependent._skip(edge)
+            elif ready:
+                self._submit(dependent)
+
+    def shutdown(self):
+        with self._lock:
+            threads = self._threads
+            self._threads = []
+        for _ in threads:
+            self._queue.put((math.inf, next(self._sequence), None))
+        for thread in threads:
+            thread.join()
+
+    def _submit(self, node: "Node"):
+        self._queue.put((-node._priority, next(self._sequence), node))
+        with self._lock:
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def _work(self):
+        while True:
+            _, _, node = self._queue.get()
+            if node is None:
+                return
+            node.run()
+
+
+def _failed_edge(dependent: "Node", node: "Node"):
+    """
+    The edge from the dependent to the finished Node whose predicate fails,
+    if its other dependencies have finished too.
+    """
+    for edge in dependent._depends_on:
+        if edge.right is not node or not all(d.is_done for d in edge.dependencies()):
+            continue
+        try:
+            passed = edge.evaluate()
+        except Exception:
+            # Runs on the thread of the finished Node, so leave the error to
+            # the dependent, which fails when it evaluates the edge itself
+            return None
+        if not passed:
+            return edge
+    return None
+
+
+class AsyncScheduler(Scheduler):
+    """
+    Runs Nodes as coroutines on an asyncio event loop owned by a background
+    thread. Nodes which implement execute_async() (such as Command) spawn
+    their subprocesses without blocking the loop; all other Nodes are run
+    on an executor of `workers` threads through the default adapter.
+    """
+
+    def __init__(self, workers: int = PoolScheduler.DEFAULT_WORKERS) -> None:
+        self.workers = max(1, workers)
+        """
+        Number of executor threads available to blocking execute() calls.
+        """
+
+        self._loop: Optional["asyncio.AbstractEventLoop"] = None
+        """
+        Event loop running the Node coroutines, created on first use.
+        """
+
+        self._thread: Optional[threading.Thread] = None
+        """
+        Thread running the event loop.
+        """
+
+        self._futures: dict["Node", "asyncio.Future"] = {}
+        """
+        Completion futures for Nodes awaited by other Nodes, only accessed
+        on the event loop.
+        """
+
+        self._tasks: set["asyncio.Task"] = set()
+        """
+        Strong references to running Node coroutines.
+        """
+
+        self._lock = threading.Lock()
+        """
+        Lock guarding loop creation and the scheduled marker of Nodes.
+        """
+
+    def start(self, node: "Node"):
+        started: list["Node"] = []
+        stack = [node]
+        with self._lock:
+            loop = self._ensure_loop()
+            while stack:
+                cursor = stack.pop()
+                if not cursor._mark_scheduled():
+                    continue
+                started.append(cursor)
+                for edge in cursor._depends_on:
+                    stack.extend(edge.dependencies())
+        for cursor in started:
+            loop.call_soon_threadsafe(self._spawn, cursor)
+
+    def finished(self, node: "Node"):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._resolve, node)
+
+    def shutdown(self):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    def _ensure_loop(self) -> "asyncio.AbstractEventLoop":
+        if not self._loop:
+            # Imported on first use, as asyncio dominates the import time
+            import asyncio
+            from concurrent.futures import ThreadPoolExecutor
+            self._loop = asyncio.new_event_loop()
+            self._loop.set_default_executor(ThreadPoolExecutor(self.workers))
+            self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+            self._thread.start()
+        return self._loop
+
+    def _spawn(self, node: "Node"):
+        task = self._loop.create_task(self._drive(node))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drive(self, node: "Node"):
+        dependencies = [
+            self._future(dependency)
+            for edge in node._depends_on
+            for dependency in edge.dependencies()
+        ]
+        if dependencies:
+            import asyncio
+            await asyncio.gather(*dependencies)
+        await node.run_async()
+
+    def _future(self, node: "Node") -> "asyncio.Future":
+        if node not in self._futures:
+            self._futures[node] = self._loop.create_future()
+        future = self._futures[node]
+        if node.is_done and not future.done():
+            future.set_result(None)
+        return future
+
+    def _resolve(self, node: "Node"):
+        future = self._futures.pop(node, None)
+        if future and not future.done():
+            future.set_result(None)
+
+
+_default_scheduler: Optional[Scheduler] = None
+
+
+def default_scheduler() -> Scheduler:
+    """
+    Return the process-wide Scheduler used by Contexts created without one.
+    """
+    global _default_scheduler
+    if _default_scheduler is None:
+        _default_scheduler = PoolScheduler()
+    return _default_scheduler
+
+
+def make_scheduler(name: str, workers: int = PoolScheduler.DEFAULT_WORKERS) -> Scheduler:
+    if name == "thread":
+        return ThreadScheduler()
+    if name == "pool":
+        return PoolScheduler(workers)
+    if name == "asyncio":
+        return AsyncScheduler(workers)
+    raise ValueError(f"Unknown scheduler: {name}")
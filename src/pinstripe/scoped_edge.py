@@ -3,31 +3,100 @@ from .result import Result
 from .ops.fact_registry import FactRegistry
 
 
-class ScopedEdge(Edge):
-    def __init__(
-        self,
-        facts: FactRegistry,
-        match: dict[str, str],
-        left: Node,
-        right: Node,
-    ) -> None:
-        self.facts = facts
-        self.match = match
-        for key in self.match.keys():
-            self.facts.needs_fact(key)
-        super().__init__(left, right)
+ALWAYS = lambda result: True
+
+
+class FactsEdge(Edge):
+    """
+    Edge from a ScopeGate to the providers of the facts in its scope, so
+    that the gate waits for those facts only rather than for every fact
+    the host needs.
+    """
+
+    __slots__ = ("names",)
+
+    def __init__(self, left: Node, facts: FactRegistry, names: list[str]) -> None:
+        super().__init__(left, facts, predicate=ALWAYS)
+        self.names = names
+
+    def dependencies(self) -> list[Node]:
+        # Providers may be registered after the scope is declared
+        facts: FactRegistry = self.right
+        return [facts._fact_providers[name] for name in self.names if facts.has_provider(name)]
 
     def start(self):
-        self.facts.start()
+        for provider in self.dependencies():
+            provider.start()
 
     def wait(self) -> Result:
-        for k in self.match.keys():
-            expected = self.match[k]
-            actual = self.facts.get(k)
+        for provider in self.dependencies():
+            provider.wait()
+        return Result(ok=True)
+
+
+class ScopeGate(Node['ScopeGate', bool]):
+    """
+    Root Node of a scoped Context, which compares the facts of the host
+    with the scope once they are known. If they do not match, every Node
+    of the Context and its children is finished as skipped at once,
+    without running or waiting on anything.
+    """
+
+    __slots__ = ()
+
+    INTERNAL = True
+
+    def __init__(self, context):
+        scope = ", ".join(f"{name}={value}" for name, value in context.scope.items())
+        super().__init__(context, label=f"Scope: {scope}")
+        for name in context.scope:
+            context.facts.needs_fact(name)
+        self._depends_on = [FactsEdge(self, context.facts, list(context.scope))]
+        if not context.parent.is_root:
+            # Skipped along with the subtree of the parent if it does not match
+            self._depends_on.append(Edge(self, context.parent.root_node))
+
+    def execute(self, *results: Result) -> Result[bool]:
+        facts = self._context.facts
+        for name, expected in self._context.scope.items():
+            actual = facts.get(name)
             if expected != actual:
-                return Result(
+                result = Result(
                     ok=True,
                     skipped=True,
                     reason=f"Fact does not match scope ({actual} (actual) != {expected} (expected))",
                 )
+                self._skip_subtree(result)
+                return result
+        return Result(ok=True, value=True)
+
+    def _skip_subtree(self, result: Result):
+        stack = [self._context]
+        while stack:
+            context = stack.pop()
+            stack.extend(context.children)
+            for node in context.nodes:
+                if node is not self:
+                    node._settle(result)
+
+
+class ScopedEdge(Edge):
+    """
+    Edge from a Node of a scoped Context, which yields the skipped Result
+    of the ScopeGate of the Context if the scope does not match.
+    """
+
+    __slots__ = ("gate",)
+
+    def __init__(self, gate: ScopeGate, left: Node, right: Node) -> None:
+        self.gate = gate
+        super().__init__(left, right)
+
+    def dependencies(self) -> list[Node]:
+        return [self.gate, self.right]
+
+    def wait(self) -> Result:
+        result = self.gate.wait()
+        if result.skipped:
+            return result
         return super().wait()
@@ -0,0 +1,281 @@
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Optional
+import contextlib
+import hashlib
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+import uuid
+
+from .transport import Transport
+from .types import CommandT
+
+if TYPE_CHECKING:
+    import asyncio
+
+RUN_SCRIPT = 'pidfile=$1; shift; echo $$ > "$pidfile"; "$@"; rc=$?; rm -f "$pidfile"; exit $rc'
+"""
+Shell program run on the host around each command, recording the pid of
+the shell running it in the file named by its first argument, so that
+kill() can reach the command once the channel is closed.
+"""
+
+KILL_SCRIPT = """
+tree() {
+    kill -STOP "$1" 2>/dev/null
+    for child in $(ps -A -o pid= -o ppid= | awk -v parent="$1" '$2 == parent { print $1 }'); do
+        tree "$child"
+    done
+    kill -KILL "$1" 2>/dev/null
+}
+pid=$(cat "$1" 2>/dev/null) && tree "$pid"
+rm -f "$1"
+"""
+"""
+Shell program killing the process recorded in the file named by its first
+argument along with its descendants, stopping each before listing its
+children so that none are started in the meantime.
+"""
+
+
+class SshError(OSError):
+    """
+    Raised when the master connection to a host cannot be established.
+    """
+
+
+class _ChannelProcess(subprocess.Popen):
+    """
+    Popen which returns its channel slot to the host once the process has
+    been reaped.
+    """
+
+    def __init__(self, args: list[str], release: Callable[[], None], **kwargs) -> None:
+        self._release = release
+        try:
+            super().__init__(args, **kwargs)
+        except BaseException:
+            self._release_once()
+            raise
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        try:
+            return super().wait(timeout)
+        finally:
+            if self.returncode is not None:
+                self._release_once()
+
+    def poll(self) -> Optional[int]:
+        rc = super().poll()
+        if rc is not None:
+            self._release_once()
+        return rc
+
+    def _release_once(self):
+        release, self._release = self._release, None
+        if release:
+            release()
+
+
+class SshTransport(Transport):
+    """
+    Runs commands over a single persistent OpenSSH master connection to the
+    host, with at most `max_channels` commands multiplexed on it at once.
+    """
+
+    def __init__(self, host: str, pool: "SshConnectionPool") -> None:
+        super().__init__(host)
+        self.pool = pool
+        self.control_path = os.path.join(
+            pool.control_dir, hashlib.sha1(host.encode("utf-8")).hexdigest()[:16]
+        )
+        self._connect_lock = threading.Lock()
+        self._connected = False
+        self._error: Optional[str] = None
+        self._channels = threading.BoundedSemaphore(pool.max_channels)
+        self._async_channels: Optional[tuple["asyncio.AbstractEventLoop", "asyncio.Semaphore"]] = None
+
+    def _ssh(self, *args: str) -> list[str]:
+        return [
+            self.pool.ssh_command,
+            "-o", f"ControlPath={self.control_path}",
+            "-o", f"ControlPersist={self.pool.idle_timeout}",
+            *args,
+        ]
+
+    def connect(self):
+        """
+        Start the master connection for the host, raising SshError if ssh
+        fails, e.g. because the host cannot be reached, then and for every
+        later command. If it takes too long, commands fall back to opening
+        their own connections.
+        """
+        with self._connect_lock:
+            if self._error is not None:
+                raise SshError(self._error)
+            if self._connected:
+                return
+            try:
+                proc = subprocess.run(
+                    self._ssh("-o", "ControlMaster=yes", "-N", "-f", self.host),
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=self.pool.connect_timeout,
+                )
+            except subprocess.TimeoutExpired:
+                # Commands open their own connections, bounded by their deadlines
+                pass
+            else:
+                if proc.returncode != 0:
+                    self._error = f"Cannot connect to {self.host}: ssh exited with code {proc.returncode}"
+                    raise SshError(self._error)
+            self._connected = True
+
+    def argv(self, cmd: CommandT) -> list[str]:
+        if type(cmd) == str:
+            cmd = ["/bin/sh", "-c", cmd]
+        return self._ssh("-o", "ControlMaster=auto", self.host, shlex.join(cmd))
+
+    def _run_argv(self, cmd: CommandT, pidfile: str) -> list[str]:
+        if type(cmd) == str:
+            cmd = ["/bin/sh", "-c", cmd]
+        return self.argv(["/bin/sh", "-c", RUN_SCRIPT, "sh", pidfile, *cmd])
+
+    def popen(self, cmd: CommandT, stdin: bool = False, timeout: Optional[float] = None) -> subprocess.Popen:
+        self.connect()
+        pidfile = f"/tmp/pinstripe-{uuid.uuid4().hex}.pid"
+        self._channels.acquire()
+        proc = _ChannelProcess(
+            self._run_argv(cmd, pidfile),
+            self._channels.release,
+            stdin=subprocess.PIPE if stdin else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            encoding="utf-8",
+        )
+        proc.pidfile = pidfile
+        return proc
+
+    async def popen_async(self, cmd: CommandT, timeout: Optional[float] = None) -> "asyncio.subprocess.Process":
+        import asyncio
+        pidfile = f"/tmp/pinstripe-{uuid.uuid4().hex}.pid"
+        proc = await asyncio.create_subprocess_exec(
+            *self._run_argv(cmd, pidfile), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        proc.pidfile = pidfile
+        return proc
+
+    def kill(self, proc):
+        # Closing the channel leaves the command running on the host, so it
+        # is killed over the master connection, without holding up the caller
+        threading.Thread(target=self._kill_remote, args=(proc.pidfile,), daemon=True).start()
+        # The ssh client holds the channel, and may need the terminal to
+        # authenticate, so it keeps the session of the caller
+        with contextlib.suppress(ProcessLookupError):
+            proc.kill()
+
+    def _kill_remote(self, pidfile: str):
+        with contextlib.suppress(OSError, subprocess.TimeoutExpired):
+            subprocess.run(
+                self._ssh(
+                    "-o", "ControlMaster=no", self.host, shlex.join(["/bin/sh", "-c", KILL_SCRIPT, "sh", pidfile])
+                ),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=self.pool.connect_timeout,
+            )
+
+    @contextlib.asynccontextmanager
+    async def async_channel(self) -> AsyncIterator[None]:
+        import asyncio
+        loop = asyncio.get_running_loop()
+        # A pool kept by a daemon outlives the event loop of each run
+        if not self._async_channels or self._async_channels[0] is not loop:
+            self._async_channels = (loop, asyncio.Semaphore(self.pool.max_channels))
+        async with self._async_channels[1]:
+            yield
+
+    def close(self):
+        with self._connect_lock:
+            if not self._connected:
+                return
+            subprocess.run(
+                self._ssh("-O", "exit", self.host),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            self._connected = False
+
+
+class SshConnectionPool:
+    """
+    Keeps one SshTransport, and therefore one master connection, per host.
+    """
+
+    DEFAULT_IDLE_TIMEOUT = 60
+    DEFAULT_MAX_CHANNELS = 10
+    DEFAULT_CONNECT_TIMEOUT = 30
+
+    def __init__(
+        self,
+        idle_timeout: int = DEFAULT_IDLE_TIMEOUT,
+        max_channels: int = DEFAULT_MAX_CHANNELS,
+        ssh_command: str = "ssh",
+    ) -> None:
+        self.idle_timeout = idle_timeout
+        """
+        Seconds a master connection is kept open once it has no channels.
+        """
+
+        self.max_channels = max(1, max_channels)
+        """
+        Maximum number of concurrent commands per host, which should not
+        exceed the MaxSessions setting of the remote sshd.
+        """
+
+        self.ssh_command = ssh_command
+        """
+        Path of the ssh client, which may be replaced by a stand-in script.
+        """
+
+        self.connect_timeout = self.DEFAULT_CONNECT_TIMEOUT
+        """
+        Seconds to wait for a master connection to be established.
+        """
+
+        self.control_dir = tempfile.mkdtemp(prefix="pinstripe-ssh-")
+        """
+        Directory holding the control sockets of the master connections.
+        """
+
+        self._transports: dict[str, SshTransport] = {}
+        self._lock = threading.Lock()
+
+    def transport(self, host: str) -> SshTransport:
+        with self._lock:
+            if host not in self._transports:
+                self._transports[host] = SshTransport(host, self)
+            return self._transports[host]
+
+    def close(self):
+        with self._lock:
+            transports = list(self._transports.values())
+            self._transports = {}
+        for transport in transports:
+            transport.close()
+        shutil.rmtree(self.control_dir, ignore_errors=True)
+
+
+_default_pool: Optional[SshConnectionPool] = None
+
+
+def default_pool() -> SshConnectionPool:
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = SshConnectionPool()
+    return _default_pool
@@ -0,0 +1,160 @@
+from pathlib import Path
+from typing import Optional, Union
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from .events import NodeEvent, FINISHED
+from .graph import Node
+from .reporter import is_reported, node_outcome
+from .result import Result
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    run TEXT NOT NULL,
+    playbook TEXT NOT NULL,
+    host TEXT NOT NULL,
+    label TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    changed INTEGER NOT NULL,
+    rc INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    value TEXT,
+    stdout TEXT NOT NULL,
+    stderr TEXT NOT NULL,
+    stdout_dropped INTEGER NOT NULL,
+    stderr_dropped INTEGER NOT NULL,
+    finished REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_host ON results (run, host);
+CREATE INDEX IF NOT EXISTS results_outcome ON results (run, outcome);
+"""
+
+_COLUMNS = (
+    "run", "playbook", "host", "label", "outcome", "changed", "rc", "reason", "value",
+    "stdout", "stderr", "stdout_dropped", "stderr_dropped", "finished",
+)
+
+_INSERT = f"INSERT INTO results ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+
+_CLOSE = object()
+
+
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+class ResultStore:
+    """
+    SQLite database holding the full Result of every finished Node, output
+    included, so that a run can keep only compact Results in memory and
+    still be inspected once it is over. Rows are written in batches from a
+    background thread; processes of a fan-out run share the database.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, path: Union[str, Path], playbook: str, run: Optional[str] = None) -> None:
+        self.path = Path(path)
+        self.playbook = playbook
+        self.run = run or new_run_id()
+        """
+        Identifier of the run, shared by the rows of every process of the run.
+        """
+
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def record(self, event: NodeEvent):
+        """
+        EventBus listener queueing the Result of each finished Node.
+        """
+        if event.state != FINISHED:
+            return
+        node: Node = event.node
+        result: Result = node._result
+        if not is_reported(node, result):
+            return
+        try:
+            value = json.dumps(node.encode_value(result.value), default=str)
+        except (TypeError, ValueError):
+            value = json.dumps(str(result.value))
+        self._queue.put((
+            self.run, self.playbook, node._context.host, node.label, node_outcome(node, result),
+            int(result.changed), result.rc, result.reason, value, "".join(result.stdout),
+            "".join(result.stderr), result.stdout_dropped, result.stderr_dropped, time.time(),
+        ))
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write, daemon=True)
+                    self._writer.start()
+
+    def _write(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Other processes of the run may hold the write lock for a while
+        db = sqlite3.connect(self.path, timeout=60)
+        try:
+            db.executescript(_SCHEMA)
+            closing = False
+            while not closing:
+                rows = [self._queue.get()]
+                while len(rows) < self.BATCH_SIZE:
+                    try:
+                        rows.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if rows[-1] is _CLOSE:
+                    rows.pop()
+                    closing = True
+                with db:
+                    db.executemany(_INSERT, rows)
+        finally:
+            db.close()
+
+    def close(self):
+        """
+        Write the queued Results and stop the writer thread.
+        """
+        with self._lock:
+            writer = self._writer
+        if writer is not None:
+            self._queue.put(_CLOSE)
+            writer.join()
+            self._writer = None
+
+
+def query_results(
+    path: Union[str, Path],
+    run: Optional[str] = None,
+    host: Optional[str] = None,
+    outcome: Optional[str] = None,
+) -> list[dict]:
+    """
+    Rows of a ResultStore as dicts, in the order the Nodes finished, for the
+    given run or the latest one, optionally only those of a host or with
+    an outcome such as "FAILED".
+    """
+    db = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+    db.row_factory = sqlite3.Row
+    try:
+        if run is None:
+            row = db.execute("SELECT run FROM results ORDER BY finished DESC LIMIT 1").fetchone()
+            if row is None:
+                return []
+            run = row["run"]
+        sql = "SELECT * FROM results WHERE run = ?"
+        params = [run]
+        if host is not None:
+            sql += " AND host = ?"
+            params.append(host)
+        if outcome is not None:
+            sql += " AND outcome = ?"
+            params.append(outcome)
+        return [dict(row) for row in db.execute(sql + " ORDER BY finished", params)]
+    finally:
+        db.close()
@@ -0,0 +1,118 @@
+from pathlib import Path
+import json
+import threading
+import time
+
+from .events import EventBus, NodeEvent, QUEUED, WAITING, RUNNING, FINISHED, SPAN_BEGIN, SPAN_END
+
+
+class Tracer:
+    """
+    Records every event published on an EventBus with its timestamp, for
+    export as Chrome trace events (chrome://tracing, Perfetto) or JSON lines.
+    """
+
+    def __init__(self, events: EventBus) -> None:
+        self._records: list[NodeEvent] = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        events.listen(self._record)
+
+    def _record(self, event: NodeEvent):
+        with self._lock:
+            self._records.append(event)
+
+    def _micros(self, event: NodeEvent) -> float:
+        return round((event.time - self._start) * 1e6, 3)
+
+    def jsonl(self) -> list[dict]:
+        """
+        One entry per recorded event, in the order they were published.
+        """
+        with self._lock:
+            records = list(self._records)
+        return [
+            {
+                "ts": self._micros(event),
+                "host": event.node._context.host,
+                "node_id": event.node._id,
+                "node": str(event.node),
+                "event": event.state,
+                "previous": event.previous,
+                "detail": event.detail,
+            }
+            for event in records
+        ]
+
+    def chrome_trace(self) -> dict:
+        """
+        Trace event document with one process per host and one thread per
+        Node. Each Node shows its queued, waiting and running phases, with
+        its commands and stat lookups nested inside the running phase.
+        """
+        with self._lock:
+            records = list(self._records)
+        pids: dict[str, int] = {}
+        trace: list[dict] = []
+        phase_start: dict[int, NodeEvent] = {}
+        open_spans: dict[tuple[int, str], list[NodeEvent]] = {}
+        for event in records:
+            node = event.node
+            host = node._context.host
+            if host not in pids:
+                pids[host] = len(pids) + 1
+                trace.append({
+                    "name": "process_name", "ph": "M", "pid": pids[host], "tid": 0,
+                    "args": {"name": host},
+                })
+            ids = {"pid": pids[host], "tid": node._id}
+            if event.state == QUEUED:
+                trace.append({
+                    "name": "thread_name", "ph": "M", **ids, "args": {"name": str(node)},
+                })
+            if event.state == SPAN_BEGIN:
+                open_spans.setdefault((node._id, event.detail), []).append(event)
+                continue
+            if event.state == SPAN_END:
+                begun = open_spans.get((node._id, event.detail))
+                if begun:
+                    begin = begun.pop(0)
+                    trace.append(self._complete(event.detail, "span", begin, event, ids))
+                continue
+            if event.state in (QUEUED, WAITING, RUNNING, FINISHED):
+                previous = phase_start.pop(node._id, None)
+                if previous is not None:
+                    trace.append(self._complete(previous.state, "node", previous, event, ids))
+                if event.state != FINISHED:
+                    phase_start[node._id] = event
+                else:
+                    result = node._result
+                    trace.append({
+                        "name": "finished", "cat": "node", "ph": "i", "s": "t",
+                        "ts": self._micros(event), **ids,
+                        "args": {
+                            "ok": result.ok, "changed": result.changed,
+                            "skipped": result.skipped, "reason": result.reason,
+                        },
+                    })
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def _complete(self, name: str, category: str, begin: NodeEvent, end: NodeEvent, ids: dict) -> dict:
+        start = self._micros(begin)
+        return {
+            "name": name, "cat": category, "ph": "X", "ts": start,
+            "dur": round(self._micros(end) - start, 3), **ids,
+        }
+
+    def write(self, path: str):
+        """
+        Write the Chrome trace to the path, and the JSON lines alongside it
+        to the path with .jsonl appended.
+        """
+        chrome = Path(path)
+        lines = chrome.with_name(chrome.name + ".jsonl")
+        with open(chrome, "w") as f:
+            json.dump(self.chrome_trace(), f)
+        with open(lines, "w") as f:
+            for entry in self.jsonl():
+                f.write(json.dumps(entry) + "\n")
@@ -0,0 +1,156 @@
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Optional
+import contextlib
+import os
+import signal
+import subprocess
+
+from . import native
+from .result import Result
+from .types import CommandT
+
+if TYPE_CHECKING:
+    import asyncio
+    from .ops.stat import StatInfo
+
+
+class Transport:
+    """
+    Runs commands on a single host on behalf of a Context.
+    """
+
+    def __init__(self, host: str) -> None:
+        self.host = host
+
+    def connect(self):
+        """
+        Establish any connection needed before commands can run. Safe to call
+        repeatedly and from several threads.
+        """
+
+    def argv(self, cmd: CommandT) -> list[str]:
+        """
+        Build the local argument vector which runs the command on the host.
+        """
+        if type(cmd) == str:
+            cmd = ["/bin/sh", "-c", cmd]
+        return cmd
+
+    def popen(self, cmd: CommandT, stdin: bool = False, timeout: Optional[float] = None) -> subprocess.Popen:
+        """
+        Start the command with its output piped, and its stdin too if
+        `stdin` is True. `timeout` is the number of seconds left before the
+        deadline of the command, for transports whose commands kill() cannot
+        reach; the caller kills the command once it runs past it.
+        """
+        self.connect()
+        # In a session of its own, so that kill() also reaches its children
+        return subprocess.Popen(
+            self.argv(cmd), stdin=subprocess.PIPE if stdin else None,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding="utf-8", start_new_session=True,
+        )
+
+    async def popen_async(self, cmd: CommandT, timeout: Optional[float] = None) -> "asyncio.subprocess.Process":
+        import asyncio
+        return await asyncio.create_subprocess_exec(
+            *self.argv(cmd), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+
+    def kill(self, proc):
+        """
+        Kill a process returned by popen() or popen_async() which has run
+        past its deadline, along with any children holding its output open.
+        """
+        with contextlib.suppress(ProcessLookupError, PermissionError):
+            os.killpg(proc.pid, signal.SIGKILL)
+
+    @contextlib.asynccontextmanager
+    async def async_channel(self) -> AsyncIterator[None]:
+        """
+        Hold one of the host's command channels for the duration of an
+        asynchronous command.
+        """
+        yield
+
+    def stat(self, paths: list[str]) -> Optional[dict[str, "StatInfo"]]:
+        """
+        Stat the paths without running a command, returning StatInfo for
+        those that exist, or None if the transport has no native support.
+        """
+        return None
+
+    def ensure(self, spec: dict) -> Optional[Result]:
+        """
+        Converge an entity described by Entity.spec() without running a
+        command, or return None if the transport has no native support.
+        """
+        return None
+
+    def facts(self, names: list[str]) -> Optional[dict[str, str]]:
+        """
+        Gather facts without running a command, returning the values of
+        those the transport knows, or None if it has no native support.
+        """
+        return None
+
+    def close(self):
+        pass
+
+
+def stat_infos(stats: dict[str, Optional[tuple]]) -> dict[str, "StatInfo"]:
+    """
+    StatInfo for each path that exists in the result of native.stat_paths().
+    """
+    from .ops.stat import StatInfo
+    infos = {}
+    for path, stat in stats.items():
+        if stat is not None:
+            is_link, mode, owner, size = stat
+            infos[path] = StatInfo(
+                is_link=is_link, mode=mode.zfill(4), owner=owner, path=path, size=size
+            )
+    return infos
+
+
+def ensure_result(ensure: Callable[[dict], dict], spec: dict) -> Optional[Result]:
+    """
+    Converge an entity with an implementation of native.ensure(), or return
+    None if the spec needs the shell, e.g. for a symbolic mode.
+    """
+    from .ops.entity import Convergence
+    if spec.get("mode") and not native.is_octal_mode(spec["mode"]):
+        return None
+    try:
+        report = ensure(spec)
+    except OSError as e:
+        return Result(ok=False, rc=1, reason="Execution failed", stderr=[f"{e}\n"])
+    return Result(ok=True, value=Convergence(**report))
+
+
+class LocalTransport(Transport):
+    """
+    Runs commands as local subprocesses, and performs stats, entity
+    convergence and fact gathering directly with system calls.
+    """
+
+    def __init__(self, host: str = "localhost") -> None:
+        super().__init__(host)
+
+    def stat(self, paths: list[str]) -> Optional[dict[str, "StatInfo"]]:
+        return stat_infos(native.stat_paths(paths))
+
+    def ensure(self, spec: dict) -> Optional[Result]:
+        return ensure_result(native.ensure, spec)
+
+    def facts(self, names: list[str]) -> Optional[dict[str, str]]:
+        return native.facts()
+
+
+def default_transport(host: str) -> Transport:
+    """
+    Return the Transport used by Contexts created without one.
+    """
+    if host == "localhost":
+        return LocalTransport()
+    from .ssh import default_pool
+    return default_pool().transport(host)
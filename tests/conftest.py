@@ -0,0 +1,45 @@
+import pytest
+
+from pinstripe.cli import _parser
+from pinstripe.events import EventBus, NodeEvent, FINISHED
+
+
+@pytest.fixture
+def options(tmp_path):
+    """
+    Parse command line options for a run, with the defaults run_playbook()
+    fills in and a fact cache and journal of its own.
+    """
+    def parse(*argv: str):
+        args = _parser().parse_args([
+            "playbook", "--fact-cache", str(tmp_path / "facts.json"), "--journal-file", str(tmp_path / "journal"), *argv,
+        ])
+        args.workers = args.workers or 4
+        args.ssh_idle_timeout = args.ssh_idle_timeout or 1
+        args.ssh_max_channels = args.ssh_max_channels or 4
+        return args
+    return parse
+
+
+class Finished:
+    """
+    EventBus listener recording the Nodes in the order they finish.
+    """
+
+    def __init__(self, events: EventBus) -> None:
+        self.nodes = []
+        events.listen(self)
+
+    def __call__(self, event: NodeEvent):
+        if event.state == FINISHED:
+            self.nodes.append(event.node)
+
+
+@pytest.fixture
+def events():
+    return EventBus()
+
+
+@pytest.fixture
+def finished(events):
+    return Finished(events)
@@ -0,0 +1,17 @@
+import time
+
+from pinstripe.agent_transport import AgentTransport
+from pinstripe.transport import LocalTransport
+
+
+def test_silent_agent_falls_back_after_the_connect_timeout(tmp_path):
+    python = tmp_path / "python"
+    # Reads the agent source and requests without ever answering
+    python.write_text("#!/bin/sh\nexec 3>&1\nexec cat > /dev/null\n")
+    python.chmod(0o755)
+    transport = AgentTransport(LocalTransport(), python=str(python), connect_timeout=0.5)
+    start = time.monotonic()
+    assert not transport.available
+    assert time.monotonic() - start < 5
+    proc = transport.popen("echo fallback")
+    assert proc.communicate()[0] == "fallback\n"
@@ -0,0 +1,79 @@
+import pytest
+
+from pinstripe.compiler import GraphCycleError, compile_graph, merge_duplicates
+from pinstripe.context import Context
+from pinstripe.graph import Graph
+from pinstripe.run import PlaybookRun
+
+
+@pytest.fixture
+def ctx():
+    return Context(host="localhost", graph=Graph())
+
+
+def test_merge_duplicates_keeps_first(ctx):
+    first = ctx.file("/tmp/pinstripe-test").exists()
+    second = ctx.file("/tmp/pinstripe-test").exists()
+    other = ctx.file("/tmp/pinstripe-other").exists()
+    nodes = merge_duplicates(ctx.graph.nodes)
+    assert first in nodes and other in nodes
+    assert second not in nodes
+    assert second not in ctx.nodes
+
+
+def test_merge_duplicates_moves_edges(ctx):
+    first = ctx.file("/tmp/pinstripe-test").exists()
+    second = ctx.file("/tmp/pinstripe-test").exists()
+    dependent = second.then(ctx.run("true"))
+    merge_duplicates(ctx.graph.nodes)
+    assert [edge.right for edge in dependent._depends_on if edge.right is not ctx.root_node] == [first]
+
+
+def test_merge_duplicates_leaves_commands(ctx):
+    first = ctx.run("true")
+    second = ctx.run("true")
+    assert merge_duplicates(ctx.graph.nodes) == ctx.graph.nodes
+    assert first in ctx.nodes and second in ctx.nodes
+
+
+def test_merge_duplicates_removes_scoped_duplicate_from_context(ctx):
+    scoped = ctx.scoped(os="darwin")
+    first = scoped.file("/tmp/pinstripe-test").exists()
+    second = scoped.file("/tmp/pinstripe-test").exists()
+    merge_duplicates(ctx.graph.nodes)
+    assert first in scoped.nodes
+    assert second not in scoped.nodes
+
+
+def test_skipped_scope_finishes_each_node_once(options, events, finished):
+    def playbook(ctx):
+        scoped = ctx.scoped(os="no-such-os")
+        scoped.file("/tmp/pinstripe-test").exists()
+        scoped.file("/tmp/pinstripe-test").exists()
+        ctx.run("sleep 0.2")
+
+    run = PlaybookRun(playbook, ["localhost"], options("--retain", "failed"), events)
+    run.start()
+    run.wait()
+    run.close()
+    labels = [node.label for node in finished.nodes]
+    assert labels.count("File: /tmp/pinstripe-test") == 1
+    assert len(finished.nodes) == len(set(finished.nodes))
+    assert not run._host_nodes
+
+
+def test_compile_graph_orders_dependencies_first(ctx):
+    last = ctx.run("true").then(ctx.run("true")).then(ctx.run("true"))
+    compiled = compile_graph([last])
+    order = [compiled.nodes[index] for index in compiled.order]
+    assert order[0] is ctx.root_node
+    assert order[-1] is last
+    assert compiled.critical_path()[-1] is last
+
+
+def test_compile_graph_detects_cycle(ctx):
+    first = ctx.run("true")
+    second = first.then(ctx.run("true"))
+    first.depends_on(second)
+    with pytest.raises(GraphCycleError):
+        compile_graph([first])
@@ -0,0 +1,36 @@
+import io
+
+from pinstripe.fanout import FanOut
+from pinstripe.playbook import playbook
+from pinstripe.reporter import ProgressReporter
+from pinstripe.rollout import Rollout
+
+
+def local_playbook(ctx):
+    ctx.run("true")
+
+
+playbook("test-fanout", local_playbook)
+
+
+def fan_out(name, hosts, options, events) -> FanOut:
+    args = options("--processes", "2")
+    reporter = ProgressReporter(events, io.StringIO())
+    run = FanOut(name, hosts, args, events, reporter, Rollout())
+    run.start()
+    reporter.run()
+    run.join()
+    return run
+
+
+def test_fan_out_runs_every_host(options, events, finished):
+    run = fan_out("test-fanout", ["localhost", "localhost"], options, events)
+    assert not run.errors
+    assert [node.label for node in finished.nodes].count("Command: true") == 2
+
+
+def test_failed_worker_fails_the_run(options, events):
+    run = fan_out("no-such-playbook", ["localhost", "localhost"], options, events)
+    assert len(run.errors) == 2
+    assert "Playbook not found" in run.errors[0]
+    assert run.not_started == ["localhost", "localhost"]
@@ -0,0 +1,57 @@
+import itertools
+
+import pytest
+
+from pinstripe.hosts import DEFAULT_GROUP_NAME
+from pinstripe.inventory import (
+    HostPatterns, HostShard, count, expand, is_pattern, load_inventory, parse_lines, parse_shard,
+)
+
+
+@pytest.mark.parametrize("pattern, hosts", [
+    ("web[001-003].dc1", ["web001.dc1", "web002.dc1", "web003.dc1"]),
+    ("web[8-10]", ["web8", "web9", "web10"]),
+    ("db[1-2,7][a-b]", ["db1a", "db1b", "db2a", "db2b", "db7a", "db7b"]),
+    ("[a-c]", ["a", "b", "c"]),
+    ("plain.example.com", ["plain.example.com"]),
+    ("[::1]", ["[::1]"]),
+])
+def test_expand(pattern, hosts):
+    assert list(expand(pattern)) == hosts
+    assert count(pattern) == len(hosts)
+    assert is_pattern(pattern) == (hosts != [pattern])
+
+
+def test_large_patterns_expand_lazily():
+    hosts = HostPatterns(["web[000000001-999999999].dc1", "db1"])
+    assert len(hosts) == 999999999 + 1
+    assert list(itertools.islice(hosts, 2)) == ["web000000001.dc1", "web000000002.dc1"]
+
+
+def test_parse_lines_skips_blank_lines_and_comments():
+    assert parse_lines("web[1-2]  # frontends\n\n# db\ndb1\n") == ["web[1-2]", "db1"]
+
+
+def test_shards_split_the_hosts():
+    hosts = HostPatterns(["web[1-10]"])
+    shards = [HostShard(hosts, *parse_shard(f"{index}/3")) for index in (1, 2, 3)]
+    assert [len(shard) for shard in shards] == [4, 3, 3]
+    assert sorted(host for shard in shards for host in shard) == sorted(hosts)
+    assert list(shards[1]) == ["web2", "web5", "web8"]
+
+
+@pytest.mark.parametrize("value", ["3", "0/3", "4/3"])
+def test_invalid_shards_are_rejected(value):
+    with pytest.raises(ValueError):
+        parse_shard(value)
+
+
+def test_load_inventory(tmp_path):
+    path = tmp_path / "inventory"
+    path.write_text("bastion\n[web]\nweb[1-2]\n[db]  # primary first\ndb[1-2]\n")
+    groups = load_inventory(path)
+    assert {name: list(hosts) for name, hosts in groups.items()} == {
+        DEFAULT_GROUP_NAME: ["bastion"],
+        "web": ["web1", "web2"],
+        "db": ["db1", "db2"],
+    }
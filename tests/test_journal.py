@@ -0,0 +1,30 @@
+import io
+
+from pinstripe.cli import run_playbook
+from pinstripe.playbook import playbook
+
+
+def journaled_run(options, marker, *argv) -> int:
+    def journaled_playbook(ctx):
+        ctx.run(f"echo ran >> {marker}").then(ctx.run("false"))
+
+    playbook("test-journal", journaled_playbook)
+    args = options(*argv)
+    args.playbook = "test-journal"
+    return run_playbook(args, out=io.StringIO(), err=io.StringIO())
+
+
+def test_journal_is_off_by_default(options, tmp_path):
+    assert journaled_run(options, tmp_path / "marker") != 0
+    assert not (tmp_path / "journal").exists()
+
+
+def test_resume_skips_the_journaled_nodes(options, tmp_path):
+    marker = tmp_path / "marker"
+    assert journaled_run(options, marker, "--journal") != 0
+    assert (tmp_path / "journal").exists()
+    assert journaled_run(options, marker, "--resume") != 0
+    assert marker.read_text() == "ran\n"
+    # Without --resume, the journal starts over
+    assert journaled_run(options, marker, "--journal") != 0
+    assert marker.read_text() == "ran\nran\n"
@@ -0,0 +1,33 @@
+import io
+
+from pinstripe.cli import run_playbook
+from pinstripe.hosts import HOST_GROUPS
+from pinstripe.playbook import PLAYBOOK_REFS, discover, load_playbook, playbook, playbook_names
+
+
+def manifest(directory, module):
+    directory.mkdir()
+    (directory / f"{module}.py").write_text(f"def deploy(ctx):\n    return {module!r}\n")
+    path = directory / "pinstripe.cfg"
+    path.write_text(f"[playbooks]\ndeploy = {module}:deploy\n")
+    return path
+
+
+def test_runs_discover_playbooks_of_their_own(tmp_path):
+    first = discover(manifest(tmp_path / "first", "pinstripe_test_first"), {})
+    second = discover(manifest(tmp_path / "second", "pinstripe_test_second"), {})
+    assert load_playbook("deploy", first)(None) == "pinstripe_test_first"
+    assert load_playbook("deploy", second)(None) == "pinstripe_test_second"
+    assert "deploy" not in PLAYBOOK_REFS
+    assert "deploy" in playbook_names(first)
+    assert load_playbook("deploy") is None
+
+
+def test_inventory_only_adds_hostgroups_to_its_run(options, tmp_path):
+    playbook("test-inventory", lambda ctx: ctx.run("true"))
+    inventory = tmp_path / "inventory"
+    inventory.write_text("[test-inventory-group]\nlocalhost\n")
+    args = options("--inventory", str(inventory))
+    args.playbook, args.hostgroup = "test-inventory", "test-inventory-group"
+    assert run_playbook(args, out=io.StringIO(), err=io.StringIO()) == 0
+    assert "test-inventory-group" not in HOST_GROUPS
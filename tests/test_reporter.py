@@ -0,0 +1,48 @@
+import io
+
+from pinstripe.context import Context
+from pinstripe.graph import Graph
+from pinstripe.reporter import ProgressReporter, is_reported, node_outcome
+from pinstripe.result import Result
+from pinstripe.run import PlaybookRun
+
+
+def test_node_outcome():
+    ctx = Context(host="localhost", graph=Graph())
+    node = ctx.run("true")
+    assert node_outcome(node, Result(ok=True)) == "OK"
+    assert node_outcome(node, Result(ok=True, skipped=True)) == "SKIPPED"
+    assert node_outcome(node, Result(ok=False)) == "FAILED"
+    node.ignore_failures()
+    assert node_outcome(node, Result(ok=False)) == "SOFT-FAILED"
+
+
+def test_internal_nodes_are_reported_once_failed():
+    ctx = Context(host="localhost", graph=Graph())
+    assert is_reported(ctx.run("true"))
+    assert not is_reported(ctx.root_node)
+    assert not is_reported(ctx.root_node, Result(ok=True))
+    assert is_reported(ctx.root_node, Result(ok=False))
+
+
+def test_reporter_leaves_out_internal_nodes(options, events):
+    out = io.StringIO()
+    reporter = ProgressReporter(events, out)
+
+    def playbook(ctx):
+        ctx.scoped(os="no-such-os").file("/tmp/pinstripe-test").exists()
+        ctx.run("true")
+
+    run = PlaybookRun(playbook, ["localhost"], options(), events)
+    run.start()
+    reporter.expect(1)
+    run.wait()
+    reporter.producer_done()
+    reporter.run()
+    run.close()
+    output = out.getvalue()
+    assert "[OK] Command: true" in output
+    assert "[SKIPPED] File: /tmp/pinstripe-test" in output
+    assert "Scope:" not in output
+    assert "StatCache" not in output
+    assert reporter.counts["SKIPPED"] == 1
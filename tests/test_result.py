@@ -0,0 +1,14 @@
+from pinstripe.result import Result
+
+
+def test_output_without_lines_is_a_list_of_its_own():
+    first, second = Result(ok=True), Result(ok=True)
+    first.stdout.append("line\n")
+    assert first.stdout == ["line\n"]
+    assert second.stdout == [] and second.stderr == []
+
+
+def test_summary_counts_the_output_as_dropped():
+    summary = Result(ok=True, stdout=["a\n", "b\n"], stderr=["c\n"], stdout_dropped=1).summary()
+    assert (summary.stdout, summary.stderr) == ([], [])
+    assert (summary.stdout_dropped, summary.stderr_dropped) == (3, 1)
@@ -0,0 +1,70 @@
+import pytest
+
+from pinstripe.rollout import Rollout, parse_count, resolve_count
+
+
+def test_parse_count():
+    assert parse_count(None) is None
+    assert parse_count("3") == 3
+    assert parse_count(" 25% ") == "25%"
+    with pytest.raises(ValueError):
+        parse_count(-1)
+    with pytest.raises(ValueError):
+        parse_count("150%")
+
+
+def test_resolve_count():
+    assert resolve_count(None, 10) is None
+    assert resolve_count(4, 10) == 4
+    assert resolve_count("25%", 10) == 2
+
+
+@pytest.mark.parametrize("batch_size, sizes", [
+    (None, [10]),
+    (3, [3, 3, 3, 1]),
+    ("10%", [1] * 10),
+    ("5%", [1] * 10),
+    (0, [1] * 10),
+])
+def test_batches(batch_size, sizes):
+    hosts = [f"h{i}" for i in range(10)]
+    batches = [list(batch) for batch in Rollout(batch_size=batch_size).batches(hosts)]
+    assert [len(batch) for batch in batches] == sizes
+    assert [host for batch in batches for host in batch] == hosts
+
+
+def test_in_flight_is_at_least_one():
+    assert Rollout(max_in_flight="5%").in_flight(10) == 1
+    assert Rollout().in_flight(10) == 10
+    assert Rollout().in_flight(0) == 1
+
+
+@pytest.mark.parametrize("max_in_flight, parts", [(20, 3), (5, 3), (4, 4), (7, 2)])
+def test_split_in_flight_adds_up(max_in_flight, parts):
+    shares = [rollout.max_in_flight for rollout in Rollout(max_in_flight=max_in_flight).split(parts, 100)]
+    assert len(shares) == parts
+    assert sum(shares) == max_in_flight
+    assert shares == sorted(shares, reverse=True)
+
+
+def test_split_batch_size_adds_up():
+    shares = [rollout.batch_size for rollout in Rollout(batch_size=10).split(4, 100)]
+    assert shares == [3, 3, 2, 2]
+
+
+def test_split_keeps_percentages():
+    rollouts = Rollout("10%", "20%").split(3, 100)
+    assert [(rollout.batch_size, rollout.max_in_flight) for rollout in rollouts] == [("10%", "20%")] * 3
+
+
+def test_split_rejects_counts_lower_than_parts():
+    with pytest.raises(ValueError):
+        Rollout(max_in_flight=2).split(3, 100)
+    with pytest.raises(ValueError):
+        Rollout(batch_size=1).split(2, 100)
+
+
+def test_split_gives_every_shard_the_failure_limit_of_the_group():
+    assert [rollout.max_failures for rollout in Rollout(max_failures=1).split(4, 100)] == [1] * 4
+    assert [rollout.max_failures for rollout in Rollout(max_failures="10%").split(4, 100)] == [10] * 4
+    assert [rollout.max_failures for rollout in Rollout().split(2, 100)] == [None, None]
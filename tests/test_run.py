@@ -0,0 +1,86 @@
+from pinstripe.events import FINISHED
+from pinstripe.rollout import Rollout
+from pinstripe.run import PlaybookRun
+
+
+def run_playbook(playbook, options, events, hosts=("localhost",)) -> PlaybookRun:
+    run = PlaybookRun(playbook, list(hosts), options, events)
+    run.start(Rollout(options.batch_size, options.max_in_flight, options.max_failures))
+    run.wait()
+    run.close()
+    return run
+
+
+def test_host_released_once_every_node_finished(options, events, finished):
+    released = []
+
+    def playbook(ctx):
+        scoped = ctx.scoped(os="no-such-os")
+        scoped.file("/tmp/pinstripe-test").exists()
+        scoped.file("/tmp/pinstripe-test").exists()
+        ctx.run("sleep 0.2").then(ctx.run("false"))
+
+    run = PlaybookRun(playbook, ["localhost"], options("--retain", "failed"), events)
+    release = run._release
+
+    def check(host):
+        released.append([node for node in run._host_nodes[host] if not node.is_done])
+        release(host)
+
+    run._release = check
+    run.start()
+    run.wait()
+    run.close()
+    assert released == [[]]
+    assert [node.label for node in run._host_nodes["localhost"]] == ["Command: false"]
+
+
+def test_release_keeps_only_failed_nodes(options, events):
+    def playbook(ctx):
+        ctx.run("false").ignore_failures()
+        ctx.run("false")
+        ctx.run("true")
+
+    run = run_playbook(playbook, options("--retain", "failed"), events)
+    kept = run._host_nodes["localhost"]
+    assert [node.label for node in kept] == ["Command: false"]
+    assert not kept[0].can_fail
+    assert kept[0]._context.nodes == []
+
+
+def test_release_skips_unfinished_nodes(options, events):
+    def playbook(ctx):
+        ctx.run("true")
+
+    run = PlaybookRun(playbook, ["localhost"], options("--retain", "failed"), events)
+    run._start_host("localhost")
+    # Released before its Nodes had a chance to finish
+    run._release("localhost")
+    run.wait()
+    run.close()
+
+
+def test_listener_error_does_not_finish_node_again(options, events, finished):
+    def fail(event):
+        if event.state == FINISHED and event.node.label == "Command: true":
+            raise RuntimeError("listener")
+
+    events.listen(fail)
+
+    def playbook(ctx):
+        ctx.run("true").then(ctx.run("echo after"))
+
+    run_playbook(playbook, options(), events)
+    labels = [node.label for node in finished.nodes]
+    assert labels.count("Command: true") == 1
+    assert "Command: echo after" in labels
+
+
+def test_rollout_counts_each_host_once(options, events, finished):
+    def playbook(ctx):
+        ctx.run("true")
+
+    run = run_playbook(playbook, options("--max-in-flight", "1"), events, hosts=["localhost"] * 3)
+    assert not run._remaining
+    assert not run.failed_hosts
+    assert not run.not_started
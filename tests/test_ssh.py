@@ -0,0 +1,76 @@
+import os
+import time
+
+import pytest
+
+from pinstripe.ssh import SshConnectionPool, SshError
+
+SSH = """#!/bin/sh
+# Stand-in for ssh running the command locally
+while [ $# -gt 0 ]; do
+  case "$1" in
+    -o|-O|-S) shift 2 ;;
+    -N) exit {master} ;;
+    -*) shift ;;
+    *) break ;;
+  esac
+done
+shift
+exec /bin/sh -c "$*"
+"""
+
+
+def stand_in(tmp_path, master=0):
+    path = tmp_path / "ssh"
+    path.write_text(SSH.format(master=master))
+    path.chmod(0o755)
+    return SshConnectionPool(ssh_command=str(path))
+
+
+def running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    with open(f"/proc/{pid}/stat") as f:
+        return f.read().split(") ")[-1][0] != "Z"
+
+
+def test_kill_reaches_the_remote_command(tmp_path):
+    pool = stand_in(tmp_path)
+    transport = pool.transport("host")
+    pids = tmp_path / "pids"
+    proc = transport.popen(f"sleep 30 & echo $! > {pids}; wait")
+    for _ in range(100):
+        if pids.exists() and pids.read_text():
+            break
+        time.sleep(0.05)
+    pid = int(pids.read_text())
+    transport.kill(proc)
+    proc.wait()
+    for _ in range(100):
+        if not running(pid):
+            break
+        time.sleep(0.05)
+    assert not running(pid)
+    assert not os.path.exists(proc.pidfile)
+    pool.close()
+
+
+def test_output_and_exit_code_pass_through(tmp_path):
+    pool = stand_in(tmp_path)
+    proc = pool.transport("host").popen(["sh", "-c", "echo out; echo err >&2; exit 3"])
+    stdout, stderr = proc.communicate()
+    assert (stdout, stderr, proc.returncode) == ("out\n", "err\n", 3)
+    assert not os.path.exists(proc.pidfile)
+    pool.close()
+
+
+def test_failed_master_raises(tmp_path):
+    pool = stand_in(tmp_path, master=255)
+    transport = pool.transport("host")
+    with pytest.raises(SshError, match="ssh exited with code 255"):
+        transport.popen("true")
+    with pytest.raises(SshError):
+        transport.connect()
+    pool.close()
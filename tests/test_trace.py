@@ -0,0 +1,19 @@
+import json
+
+from pinstripe.trace import Tracer
+
+from test_run import run_playbook
+
+
+def test_trace_is_written_to_the_given_path(options, events, tmp_path):
+    tracer = Tracer(events)
+
+    def playbook(ctx):
+        ctx.run("true")
+
+    run_playbook(playbook, options(), events)
+    path = tmp_path / "run.trace"
+    tracer.write(str(path))
+    assert json.loads(path.read_text())["traceEvents"]
+    lines = (tmp_path / "run.trace.jsonl").read_text().splitlines()
+    assert any(json.loads(line)["node"] == "Command: true" for line in lines)
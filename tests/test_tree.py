@@ -0,0 +1,30 @@
+from pinstripe.ops.tree import Tree
+
+from test_run import run_playbook
+
+NAMES = ["plain", "new\nline", "back\\slash", "sp ace", "sub/file"]
+
+
+def sync(local, remote, options, events, finished):
+    def playbook(ctx):
+        ctx.tree(local, remote)
+
+    run_playbook(playbook, options(), events)
+    [tree] = [node for node in finished.nodes if isinstance(node, Tree)]
+    assert tree._result.ok, tree._result.reason
+    return tree._result.value
+
+
+def test_tree_syncs_paths_with_any_character(options, events, finished, tmp_path):
+    local, remote = tmp_path / "local", tmp_path / "remote"
+    for name in NAMES:
+        (local / name).parent.mkdir(parents=True, exist_ok=True)
+        (local / name).write_text(name)
+    assert sync(local, remote, options, events, finished).paths("created") == sorted(NAMES)
+    assert all((remote / name).read_text() == name for name in NAMES)
+
+    (local / "new\nline").write_text("changed")
+    finished.nodes.clear()
+    value = sync(local, remote, options, events, finished)
+    assert value.paths("updated") == ["new\nline"]
+    assert value.paths("unchanged") == sorted(set(NAMES) - {"new\nline"})